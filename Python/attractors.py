@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from simulator import modelInteractions, deterministic, buildNetwork, nextStates, geneMask, allStates, stateIndex
+from utils import ifthenelse
+
+##############################################
+## ATTRACTORS OF A SOLVED MODEL             ##
+##############################################
+
+## States are indexed as in allStates (first gene on the most   ##
+## significant bit), and written as character strings of 0's    ##
+## and 1's in the order of C                                    ##
+## Synchronous transitions: every state has one successor, the  ##
+## attractors are the cycles of the transition function, and    ##
+## the basins form a partition of the state space               ##
+## Asynchronous transitions (at most one gene is updated, see   ##
+## transition_condition_async): the attractors are the terminal ##
+## strongly connected components of the transition graph, and   ##
+## the basin of an attractor is the set of states from which    ##
+## it is reachable (basins may overlap)                         ##
+## Fixed points are the same for both types of transitions      ##
+
+## Largest networks which state space is explored for each ##
+## type of transition (otherwise, fixed points are         ##
+## enumerated with the solver)                             ##
+maxGenes = {"synchronous": 20, "asynchronous": 16}
+## Number of states of which successors are computed at once ##
+chunkSize = 2**16
+
+## Character string of a state ##
+stateString = lambda x : "".join([str(int(v)) for v in x])
+
+#' Compute the synchronous successor of every state
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param ngenes number of genes
+#' @param ko Boolean array of knocked-down genes
+#' @param fe Boolean array of forced expressed genes
+#' @return succ array of the index of the successor of each state
+def syncSuccessors(network, ngenes, ko, fe):
+	N = 2**ngenes
+	succ = np.empty(N, dtype=np.int64)
+	for start in range(0, N, chunkSize):
+		stop = min(N, start+chunkSize)
+		succ[start:stop] = stateIndex(nextStates(network, allStates(ngenes, start, stop), ko=ko, fe=fe))
+	return(succ)
+
+#' Compute the asynchronous successors of every state: the
+#' state where gene g is updated, for each gene g which value changes
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param ngenes number of genes
+#' @param ko Boolean array of knocked-down genes
+#' @param fe Boolean array of forced expressed genes
+#' @return succ array (|genes| x number of states) of the index of the
+#' successor where each gene is updated, or -1 if the value of the gene
+#' does not change
+def asyncSuccessors(network, ngenes, ko, fe):
+	N = 2**ngenes
+	succ = np.empty((ngenes, N), dtype=np.int64)
+	bits = np.int64(1) << np.arange(ngenes-1, -1, -1, dtype=np.int64)
+	for start in range(0, N, chunkSize):
+		stop = min(N, start+chunkSize)
+		Q = allStates(ngenes, start, stop)
+		changed = nextStates(network, Q, ko=ko, fe=fe) != Q
+		k = np.arange(start, stop, dtype=np.int64)
+		for g in range(ngenes):
+			succ[g, start:stop] = np.where(changed[:, g], k ^ bits[g], -1)
+	return(succ)
+
+#' Find the cycles of a transition function and their basins, by
+#' pointer doubling: after ngenes doublings, every state is mapped
+#' to a state of its cycle, and to the smallest state of this cycle
+#'
+#' @param succ array of the index of the successor of each state
+#' @param ngenes number of genes
+#' @return res list of [cycle, basin size] where cycle is the list of
+#' state indices of the cycle, starting from the smallest one
+def syncAttractors(succ, ngenes):
+	jump = succ.copy()
+	smallest = np.minimum(np.arange(len(succ), dtype=np.int64), succ)
+	for _ in range(ngenes):
+		smallest = np.minimum(smallest, smallest[jump])
+		jump = jump[jump]
+	representative = smallest[jump]
+	basins = np.bincount(representative, minlength=len(succ))
+	res = []
+	for x in np.nonzero(basins)[0]:
+		cycle = [int(x)]
+		while (succ[cycle[-1]] != x):
+			cycle.append(int(succ[cycle[-1]]))
+		res.append([cycle, int(basins[x])])
+	return(res)
+
+#' Find the strongly connected components of a graph (iterative
+#' version of Tarjan's algorithm)
+#'
+#' @param adj list of the successors of each node
+#' @return comp list of the component of each node
+def stronglyConnectedComponents(adj):
+	N = len(adj)
+	index, low, comp = [-1]*N, [0]*N, [-1]*N
+	onstack = [False]*N
+	stack = []
+	counter, ncomp = 0, 0
+	for v0 in range(N):
+		if (index[v0] != -1):
+			continue
+		work = [[v0, 0]]
+		while (work):
+			[v, i] = work[-1]
+			if (index[v] == -1):
+				index[v] = low[v] = counter
+				counter += 1
+				stack.append(v)
+				onstack[v] = True
+			recurse = False
+			for j in range(i, len(adj[v])):
+				w = adj[v][j]
+				if (index[w] == -1):
+					work[-1][1] = j+1
+					work.append([w, 0])
+					recurse = True
+					break
+				elif (onstack[w]):
+					low[v] = min(low[v], index[w])
+			if (recurse):
+				continue
+			work.pop()
+			if (work):
+				u = work[-1][0]
+				low[u] = min(low[u], low[v])
+			if (low[v] == index[v]):
+				while (True):
+					w = stack.pop()
+					onstack[w] = False
+					comp[w] = ncomp
+					if (w == v):
+						break
+				ncomp += 1
+	return(comp)
+
+#' Find the terminal strongly connected components of the
+#' asynchronous transition graph and their basins
+#'
+#' @param succ array of asynchronous successors (see asyncSuccessors)
+#' @return res list of [attractor, basin size] where attractor is the
+#' sorted list of state indices of the component, and the basin is
+#' the set of states from which the component is reachable
+def asyncAttractors(succ):
+	[ngenes, N] = succ.shape
+	adj = [[] for _ in range(N)]
+	for g in range(ngenes):
+		idx = np.nonzero(succ[g] >= 0)[0]
+		for [x, y] in zip(idx.tolist(), succ[g, idx].tolist()):
+			adj[x].append(y)
+	comp = np.array(stronglyConnectedComponents(adj), dtype=np.int64)
+	## A component is terminal if no transition leaves it ##
+	terminal = np.ones(comp.max()+1, dtype=bool)
+	for g in range(ngenes):
+		idx = np.nonzero(succ[g] >= 0)[0]
+		terminal[comp[idx][comp[succ[g, idx]] != comp[idx]]] = False
+	## Successor, or the state itself if there is none ##
+	safe = np.where(succ >= 0, succ, np.arange(N, dtype=np.int64))
+	res = []
+	for c in np.nonzero(terminal)[0]:
+		states = np.nonzero(comp == c)[0]
+		reach = comp == c
+		while (True):
+			new = reach | reach[safe].any(axis=0)
+			if ((new == reach).all()):
+				break
+			reach = new
+		res.append([states.tolist(), int(reach.sum())])
+	return(sorted(res))
+
+#' Enumerate the fixed points of a model with the solver
+#'
+#' @param C the list of nodes
+#' @param I the list of interactions of the model
+#' @param grfs the list of selected regulation conditions for each node
+#' @param KO list of knocked-down genes
+#' @param FE list of forced expressed genes
+#' @param solmax maximum number of fixed points to enumerate (None for all)
+#' @return fixpoints list of fixed points (character strings)
+def fixpointsSAT(C, I, grfs, KO=[], FE=[], solmax=None):
+	from z3 import Solver, BitVec, BitVecVal, If, sat
+	from grn_inference import regulatorSlice
+	from simulator import interactionDicts
+	from shortcuts import prepreCompute, preCompute, diCompute, rule18, rule19
+	from utils import extract1BV, sliceBV, true, false
+	ngenes = len(C)
+	s = Solver()
+	q = BitVec("q_fixpoint", ngenes)
+	regInt = interactionDicts(C, I)
+	for g in range(ngenes):
+		qg = extract1BV(q, g)
+		## Forced expression prevails over knock-down (as in ##
+		## grn_solver and nextStates)                         ##
+		if (C[g] in FE):
+			s.add(qg == true)
+			continue
+		if (C[g] in KO):
+			s.add(qg == false)
+			continue
+		regIntg = regInt[g]
+		sl = regulatorSlice(g, regIntg, ngenes)
+		[a, r] = [sliceBV(BitVecVal(sum([1 << k for k in keys]), ngenes), sl) for keys in [regIntg[0].keys(), regIntg[1].keys()]]
+		qsl = sliceBV(q, sl)
+		## Threshold regulation conditions only constrain the current state ##
+		## (see transition_relation)                                        ##
+		if (grfs[g] in [18, 19]):
+			s.add(ifthenelse(grfs[g] == 18, rule18, rule19)(qsl, a, r, sl.index(g)))
+		else:
+			s.add(qg == If(diCompute.get(grfs[g])(*preCompute(qsl, prepreCompute(a, r))), true, false))
+	fixpoints = []
+	while ((solmax == None or len(fixpoints) < solmax) and s.check() == sat):
+		x = s.model()[q].as_long()
+		fixpoints.append("".join([str((x >> g) & 1) for g in range(ngenes)]))
+		s.add(q != BitVecVal(x, ngenes))
+	return(sorted(fixpoints))
+
+#' Enumerate the attractors of a model found by the solver
+#'
+#' @param modelID integer identifier of model in resList
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param KO list of knocked-down genes
+#' @param FE list of forced expressed genes
+#' @param method "exhaustive" (exploration of the whole state space),
+#'               "sat" (enumeration of fixed points with the solver), or None
+#'               (exhaustive if the network has at most maxGenes[typeT] genes and
+#'               no threshold regulation condition, else sat)
+#' @param solmax maximum number of fixed points to enumerate with method "sat"
+#' @return attractors list of [states, basin size] where states is the list of
+#'                    states of the attractor (in the order of the cycle for
+#'                    synchronous transitions), and basin size is None with method "sat"
+#'                    (cyclic attractors are not enumerated)
+def attractors(modelID, C, resList, Idef, Iopt, typeT="synchronous", KO=[], FE=[], method=None, solmax=None):
+	if (not (typeT in maxGenes.keys())):
+		raise ValueError("Wrong transition type: " + str(typeT))
+	[I, grfs] = modelInteractions(modelID, C, resList, Idef, Iopt)
+	ngenes = len(C)
+	if (method == None):
+		method = ifthenelse(ngenes <= maxGenes[typeT] and deterministic(grfs), "exhaustive", "sat")
+	if (method == "sat"):
+		return([[[x], None] for x in fixpointsSAT(C, I, grfs, KO=KO, FE=FE, solmax=solmax)])
+	if (method != "exhaustive"):
+		raise ValueError("Wrong method: " + str(method))
+	if (not deterministic(grfs)):
+		raise ValueError("Threshold regulation conditions (18, 19) cannot be simulated")
+	network = buildNetwork(C, I, grfs)
+	[ko, fe] = [geneMask(C, KO), geneMask(C, FE)]
+	if (typeT == "synchronous"):
+		res = syncAttractors(syncSuccessors(network, ngenes, ko, fe), ngenes)
+	else:
+		res = asyncAttractors(asyncSuccessors(network, ngenes, ko, fe))
+	return([[[stateString(allStates(ngenes, x, x+1)[0]) for x in states], basin] for [states, basin] in res])
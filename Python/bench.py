@@ -0,0 +1,214 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from time import time
+from multiprocessing import Pool
+from global_paths import path_to_results
+
+##############################################
+## BENCHMARK ON THE EXAMPLE MODELS          ##
+##############################################
+
+## Usage (in the "Python" folder):                           ##
+## python -m bench [--models toy,collombet] [--solmax 10]    ##
+## [--uniqueness interactions] [--length 20] [--kwargs DICT] ##
+## [--output bench] [--baseline FILE] [--tolerance 0.2]      ##
+## [--saveBaseline FILE]                                     ##
+
+## Benchmarks: [name, model file, experiments file] (in the ##
+## folder path_to_models)                                    ##
+## The model in examples/models/complete is a RE:IN file,    ##
+## and cannot be read by readREINfile                        ##
+benchmarks = [
+	["toy", "toy/model_expanded.net", "toy/observations.spec"],
+	["toy_pert", "toy/model_expanded_pert.net", "toy/observations_pert.spec"],
+	["collombet", "collombet/model_expanded.net", "collombet/observations.spec"],
+	["pluripotency", "pluripotency/model_expanded.net", "pluripotency/observations.spec"],
+]
+## Pluripotency takes several minutes to solve ##
+defaultModels = ["toy", "toy_pert", "collombet"]
+
+## Metrics compared to the baseline, with the minimal  ##
+## difference to be considered as a regression         ##
+## (in seconds, or kilobytes for peak_rss)             ##
+metrics = [["encode_time", 0.5], ["first_model_time", 0.5], ["total_time", 0.5], ["peak_rss", 10240]]
+
+## Columns of the CSV file ##
+columns = ["name", "model", "experiments", "solmax", "uniqueness", "length", "nmodels",
+	"parse_time", "encode_time", "first_model_time", "total_time", "peak_rss",
+	"enumeration_times", "error"]
+
+#' Run one benchmark (in a fresh worker process, so that
+#' the peak resident set size is the one of the benchmark)
+#'
+#' @param args list [name, model, experiments, solmax, uniqueness, length, kwargs]
+#' where uniqueness and length are None to use the values in the model file,
+#' and kwargs is a dictionary of additional arguments to grn_solver
+#' @return record dictionary of measures: number of models, parsing time,
+#' encoding time, time to first model, total time, checking time for each
+#' model (enumeration_times), peak resident set size (in kilobytes), and
+#' error message (None if the benchmark has been run)
+def run_benchmark(args):
+	import resource
+	from models import readREINfile
+	from grn_solver import grn_solver
+	from utils import ifthenelse
+	[name, model, experiments, solmax, uniqueness, length, kwargs] = args
+	record = {"name": name, "model": model, "experiments": experiments, "solmax": solmax,
+		"uniqueness": uniqueness, "length": length, "nmodels": None, "parse_time": None,
+		"encode_time": None, "first_model_time": None, "total_time": None,
+		"peak_rss": None, "enumeration_times": [], "error": None}
+	try:
+		t = time()
+		[C, CRM, lengthM, Idef, Iopt, R, E, typeT, _, KO, FE, uniquenessM,
+			limreg, P, Fixpoint] = readREINfile(model, experiments)
+		record["parse_time"] = time()-t
+		record["length"] = length if (length) else lengthM
+		record["uniqueness"] = uniqueness if (uniqueness) else uniquenessM
+		profile, checkTimes = dict(), []
+		## Only measured by the "smt" backend ##
+		measures = ifthenelse(kwargs.get("backend") == "sat", dict(), dict(profile=profile, checkTimes=checkTimes))
+		measures.update(kwargs)
+		t = time()
+		[resList, _, _] = grn_solver(C, CRM, record["length"], Idef, Iopt, R, E, typeT, solmax,
+			KO, FE, record["uniqueness"], limreg, P, Fixpoint, printSolutions=False,
+			printmain=False, **measures)
+		## Without the time spent in counting terms ##
+		record["total_time"] = time()-t-profile.get("profiling_time", 0.)
+	except Exception as e:
+		record["error"] = type(e).__name__ + ": " + str(e)
+		return(record)
+	record["nmodels"] = len(resList)
+	## Not filled by the "sat" backend ##
+	record["encode_time"] = profile.get("encoding_time")
+	record["enumeration_times"] = checkTimes
+	if (record["encode_time"] != None and checkTimes):
+		record["first_model_time"] = record["encode_time"] + checkTimes[0]
+	record["peak_rss"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	return(record)
+
+#' Run benchmarks
+#'
+#' @param names list of benchmark names (see @benchmarks)
+#' @param solmax maximal number of models to enumerate
+#' @param uniqueness uniqueness condition (None to use the one of the model file)
+#' @param length maximal length of experiments (None to use the one of the model file)
+#' @param kwargs dictionary of additional arguments to grn_solver
+#' @param verbose logical for printing the measures
+#' @return records list of benchmark measures (see run_benchmark)
+def run_benchmarks(names=defaultModels, solmax=10, uniqueness=None, length=None, kwargs={}, verbose=True):
+	records = []
+	for [name, model, experiments] in benchmarks:
+		if (not (name in names)):
+			continue
+		pool = Pool(1)
+		try:
+			record = pool.apply(run_benchmark, ([name, model, experiments, solmax, uniqueness, length, kwargs],))
+		finally:
+			pool.terminate()
+			pool.join()
+		records.append(record)
+		if (verbose):
+			print(formatRecord(record))
+	return(records)
+
+## Formats a measure (None if not available) ##
+formatValue = lambda x : "-" if (x == None) else ("%.2f" % x if (isinstance(x, float)) else str(x))
+
+#' Summary of a benchmark record
+#'
+#' @param record benchmark measures (see run_benchmark)
+#' @return msg character string
+def formatRecord(record):
+	if (record["error"]):
+		return(record["name"] + ": ERROR " + record["error"])
+	return(record["name"] + ": " + ", ".join([key + "=" + formatValue(record[key])
+		for key in ["nmodels", "encode_time", "first_model_time", "total_time", "peak_rss"]]))
+
+## Times for each model are separated by ";" in the CSV file ##
+ifList = lambda x : ";".join(["%.4f" % y for y in x]) if (isinstance(x, list)) else formatValue(x)
+
+#' Write benchmark records in a CSV and a JSON file
+#'
+#' @param records list of benchmark measures (see run_benchmark)
+#' @param title name of the files (without extension) in folder path_to_results
+#' @return None
+def write_records(records, title="bench"):
+	import json
+	import os
+	if (not os.path.isdir(path_to_results)):
+		os.makedirs(path_to_results)
+	with open(path_to_results + title + ".json", "w") as f:
+		json.dump(records, f, indent=2, sort_keys=True)
+	with open(path_to_results + title + ".csv", "w") as f:
+		f.write(",".join(columns) + "\n")
+		for record in records:
+			values = [ifList(record[c]) for c in columns]
+			f.write(",".join(["\"" + v.replace("\"", "'") + "\"" if ("," in v) else v for v in values]) + "\n")
+	return(None)
+
+#' Compare benchmark records to a baseline
+#'
+#' A measure is a regression if it is greater than (1+tolerance) times
+#' the baseline measure, and the difference is greater than the minimal
+#' difference associated with the measure (see @metrics). A different
+#' number of models is also reported
+#'
+#' @param records list of benchmark measures (see run_benchmark)
+#' @param baseline list of benchmark measures of the baseline
+#' @param tolerance relative tolerance
+#' @return regressions list of regression messages
+def compare_baseline(records, baseline, tolerance=0.2):
+	regressions = []
+	baseline = dict([[b["name"], b] for b in baseline])
+	for record in records:
+		b = baseline.get(record["name"])
+		if (b == None or record["error"] or b["error"]):
+			continue
+		if (record["nmodels"] != b["nmodels"] and record["solmax"] == b["solmax"]):
+			regressions.append(record["name"] + ": " + str(record["nmodels"])
+				+ " models instead of " + str(b["nmodels"]))
+		for [key, mindiff] in metrics:
+			x, y = record[key], b[key]
+			if (x == None or y == None):
+				continue
+			if (x > (1+tolerance)*y and x-y > mindiff):
+				regressions.append(record["name"] + ": " + key + " = " + formatValue(x)
+					+ " (baseline: " + formatValue(y) + ", +"
+					+ str(int(100*(x-y)/max(y, 1e-6))) + "%)")
+	return(regressions)
+
+if (__name__ == "__main__"):
+	import json
+	from ast import literal_eval
+	from utils import getArgument
+	argv = sys.argv
+	names = getArgument("models", argv, ",".join(defaultModels)).split(",")
+	for name in names:
+		if (not (name in [b[0] for b in benchmarks])):
+			print("MSG: Unknown benchmark \'" + name + "\' (ignored).")
+	solmax = int(getArgument("solmax", argv, 10))
+	uniqueness = getArgument("uniqueness", argv, None)
+	length = getArgument("length", argv, None)
+	length = int(length) if (length) else None
+	## Only Python literals are accepted (no code is run) ##
+	kwargs = literal_eval(getArgument("kwargs", argv, "{}"))
+	title = getArgument("output", argv, "bench")
+	records = run_benchmarks(names=names, solmax=solmax, uniqueness=uniqueness, length=length, kwargs=kwargs)
+	write_records(records, title=title)
+	print("MSG: Wrote measures in " + path_to_results + title + ".csv/json")
+	saveBaseline = getArgument("saveBaseline", argv, None)
+	if (saveBaseline):
+		with open(saveBaseline, "w") as f:
+			json.dump(records, f, indent=2, sort_keys=True)
+		print("MSG: Saved baseline in " + saveBaseline)
+	baselineFile = getArgument("baseline", argv, None)
+	if (baselineFile):
+		with open(baselineFile, "r") as f:
+			baseline = json.load(f)
+		regressions = compare_baseline(records, baseline, tolerance=float(getArgument("tolerance", argv, 0.2)))
+		for msg in regressions:
+			print("REGRESSION: " + msg)
+		if (regressions):
+			sys.exit(1)
+		print("MSG: No regression against baseline " + baselineFile)
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+import os
+import cPickle as pickle
+from hashlib import sha1
+from global_paths import path_to_models, path_to_results
+
+##############################################
+## CACHE OF PARSED INSTANCES                ##
+##############################################
+
+## An instance of the GRN inference problem (see readREINfile), ##
+## the condition definitions of its experiments file (see       ##
+## readConditions) and the regulator/interaction dictionaries   ##
+## of its genes (see buildInteractionDicts) are stored in a     ##
+## pickle file, named after the hash of the contents of the     ##
+## model and experiments files: an instance is parsed again as  ##
+## soon as one of the files is modified                         ##
+
+path_to_cache = path_to_results + "cache/"
+## To increment when the parsed structures change ##
+cacheVersion = 1
+
+#' Key of an instance in the cache
+#'
+#' @param model model file name (in path_to_models)
+#' @param experiments experiments file name (in path_to_models)
+#' @return key character string: hash of the contents of both files
+def instanceKey(model, experiments):
+	h = sha1("v" + str(cacheVersion))
+	for fname in [model, experiments]:
+		with open(path_to_models + fname, "rb") as f:
+			h.update(sha1(f.read()).hexdigest())
+	return(h.hexdigest())
+
+#' Parse an instance of the GRN inference problem, or read it from the cache
+#'
+#' @param model model file name (in path_to_models)
+#' @param experiments experiments file name (in path_to_models)
+#' @param verbose logical for printing messages
+#' @param cache logical: if set to False, the instance is parsed and the cache
+#'              is neither read nor written
+#' @return res list [instance, condexp, regInt] where instance is the list returned
+#'             by readREINfile, condexp the dictionary of conditions (see readConditions),
+#'             regInt the list of regulator/interaction dictionaries of each gene
+def readInstance(model, experiments, verbose=False, cache=True):
+	from utils import verboseIt
+	fname = path_to_cache + instanceKey(model, experiments) + ".pkl"
+	if (cache and os.path.exists(fname)):
+		try:
+			with open(fname, "rb") as f:
+				res = pickle.load(f)
+			verboseIt("Read instance from cache " + fname, verbose)
+			return(res)
+		except (EOFError, pickle.UnpicklingError, ValueError):
+			verboseIt("Corrupted cache file " + fname + ": parsing the instance again", verbose)
+	from models import readREINfile, readConditions
+	from grn_inference import buildInteractionDicts
+	instance = readREINfile(model, experiments, verbose=verbose)
+	[C, Idef, Iopt] = [instance[0], instance[3], instance[4]]
+	with open(path_to_models + experiments, "r") as f:
+		[_, _, condexp] = readConditions(f)
+	res = [instance, condexp, buildInteractionDicts(C, Idef, Iopt)]
+	if (cache):
+		try:
+			os.makedirs(path_to_cache)
+		except OSError:
+			pass
+		## Concurrent runs never read a partially written file ##
+		tmp = fname + "." + str(os.getpid())
+		with open(tmp, "wb") as f:
+			pickle.dump(res, f, pickle.HIGHEST_PROTOCOL)
+		os.rename(tmp, fname)
+	return(res)
@@ -9,15 +9,12 @@ from global_paths import *
 #' in result list names @resnames
 #'
 #' @param c gene name
-#' @param resnames solver result list names
+#' @param index dictionary solver result list name -> index (see problem.nameIndex)
 #' @param typeP type of perturbation, either KO or FE
 #' @return idx index of the value of perturbed gene variable
 #' in result list, None if does not exist
-def aux_getPerturbationsGRFs(c, resnames, typeP):
-	try:
-		return(resnames.index(typeP + "(" + c + ")"))
-	except:
-		return(None)
+def aux_getPerturbationsGRFs(c, index, typeP):
+	return(index.get(typeP + "(" + c + ")"))
 
 #' Build the boolean functions associated with perturbated gene variables
 #'
@@ -27,7 +24,9 @@ def aux_getPerturbationsGRFs(c, resnames, typeP):
 #' @return res list of boolean functions associated with all perturbed genes 
 #' (of perturbation @typeP) in the GRN
 def getPerturbationsGRFs(C, resnames, typeP):
-	tmp = filterNone([aux_getPerturbationsGRFs(c, resnames, typeP) for c in C])
+	from problem import nameIndex
+	index = nameIndex(resnames)
+	tmp = filterNone([aux_getPerturbationsGRFs(c, index, typeP) for c in C])
 	return([typeP + "_" + getIt(resnames[t], "(", ")") for t in tmp])
 
 ## Get GRFs into readable form ##
@@ -41,14 +40,17 @@ def getPerturbationsGRFs(C, resnames, typeP):
 #' in selected interaction vector
 #' @return grfs list of GRFs for each node of the GRN
 def get_grfs(C, res, regInt):
+	from problem import nameIndex
 	grfs = []
 	sep = "\' = "
 	ko_g = lambda g : "KO_" + C[g]
 	fe_g = lambda g : "FE_" + C[g]
 	## Get regulation template fct no.   ##
 	resnames = [str(x[0]) for x in res]
+	index = nameIndex(resnames)
 	ko = getPerturbationsGRFs(C, resnames, "KO")
 	fe = getPerturbationsGRFs(C, resnames, "FE")
+	[koSet, feSet] = [set(ko), set(fe)]
 	## Write perturbation functions      ##
 	for kog in ko:
 		grfs.append(kog + sep + writePerturbedGene(kog))
@@ -61,13 +63,13 @@ def get_grfs(C, res, regInt):
 		## values: index of corresponding interaction in        ##
 		## optional interaction vector                          ##
 		[regIntActivators, regIntRepressors] = regInt[idx]
-		activators = res[resnames.index('activators_' + C[idx])][1]
-		repressors = res[resnames.index('repressors_' + C[idx])][1]
-		## Get no. for current gene                             ## 
-		r = int(res[resnames.index('grf_' + C[idx])][1])
+		activators = res[index['activators_' + C[idx]]][1]
+		repressors = res[index['repressors_' + C[idx]]][1]
+		## Get no. for current gene                             ## 
+		r = int(res[index['grf_' + C[idx]]][1])
 		## Write corresponding GRF                              ##
-		grf = C[idx] + sep + writePerturbation((ko_g(idx) in ko), 
-				(fe_g(idx) in fe), 
+		grf = C[idx] + sep + writePerturbation((ko_g(idx) in koSet), 
+				(fe_g(idx) in feSet), 
 				diGRF(0).get(r)(activators, repressors, C[idx]),
 				ko_g(idx),
 				fe_g(idx))
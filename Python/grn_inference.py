@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 
 from shortcuts import *
-from utils import default, bv, testValue, equalExcept1BV, verboseIt, evalVec, strList2Str, getIt, testValueVec, ifthenelse, ifthenelseFct, extract1BV
+from utils import default, bv, testValue, equalExcept1BV, verboseIt, evalVec, strList2Str, getIt, testValueVec, ifthenelse, ifthenelseFct, extract1BV, sliceBV, true, false
  
 ######################################
 ## UTILS for GRN inference problem  ##
@@ -22,9 +22,10 @@ from utils import default, bv, testValue, equalExcept1BV, verboseIt, evalVec, st
 #' @param opt logical if set to TRUE the index of the optional
 #' interaction corresponding to the regulator identifier (key) is set as value in
 #' the dictionary, else a default value is set
+#' @param genes optionally, the dictionary gene -> index in C (see problem.nameIndex)
 #' @return res a list containing the activator/interaction 
 #' and repressor/interaction dictionaries
-def buildInteractionDict(Iset, gene, C, regIntActivators=None, regIntRepressors=None, opt=False):
+def buildInteractionDict(Iset, gene, C, regIntActivators=None, regIntRepressors=None, opt=False, genes=None):
     ## Initialization of dictionaries                   ##
     if (regIntActivators==None and regIntRepressors==None):
         regIntActivators = dict()
@@ -33,7 +34,7 @@ def buildInteractionDict(Iset, gene, C, regIntActivators=None, regIntRepressors=
         [regulator, out, sign] = Iset[i]
 	## Look for interactions of type r -> gene   ##
         if (out == gene):
-            idx = C.index(regulator)
+            idx = C.index(regulator) if (genes == None) else genes[regulator]
 	    ## value is the index of the interaction ##
 	    ## if optional                           ##
 	    value = i if (opt) else default
@@ -43,6 +44,140 @@ def buildInteractionDict(Iset, gene, C, regIntActivators=None, regIntRepressors=
                 regIntRepressors.setdefault(idx, value)
     return([regIntActivators, regIntRepressors])
 
+#' Add interactions to the regulator/interaction dictionaries
+#' of their regulated genes, in a single pass over the interactions
+#' (see buildInteractionDict)
+#'
+#' @param regInt list of the activator/interaction and
+#' repressor/interaction dictionaries of each gene
+#' @param Iset interaction set
+#' @param genes dictionary gene -> index in C (see problem.nameIndex)
+#' @param opt logical if set to TRUE the index of the optional
+#' interaction is set as value in the dictionary, else a default value is set
+#' @return regInt updated dictionaries
+def addInteractions(regInt, Iset, genes, opt=False):
+    for i in range(len(Iset)):
+        [regulator, out, sign] = Iset[i]
+        g = genes.get(out)
+        if (g == None):
+            continue
+        value = i if (opt) else default
+        regInt[g][0 if (sign == "+") else 1].setdefault(genes[regulator], value)
+    return(regInt)
+
+#' Build regulator/interaction dictionaries of all genes at once
+#' (same dictionaries as buildInteractionDict for each gene, first
+#' with optional interactions, then with definite interactions, as 
+#' done in grn_solver), in O(|C| + |Idef| + |Iopt|)
+#'
+#' @param C set of genes/nodes
+#' @param Idef set of definite interactions
+#' @param Iopt set of optional interactions
+#' @return regInt list of the activator/interaction and
+#' repressor/interaction dictionaries of each gene (None
+#' if there is no interaction)
+def buildInteractionDicts(C, Idef, Iopt):
+    from problem import nameIndex
+    if (not Idef and not Iopt):
+        return([[None, None] for gene in C])
+    genes = nameIndex(C)
+    regInt = [[dict(), dict()] for gene in C]
+    regInt = addInteractions(regInt, Iopt, genes, opt=True)
+    return(addInteractions(regInt, Idef, genes))
+
+#' Build the list of coordinates on which the transition
+#' condition of a gene depends: the potential regulators of
+#' the gene, the gene itself, and (if there are other genes)
+#' one "phantom" coordinate (None) standing for all other genes.
+#' Since other genes are neither activators nor repressors of
+#' the gene, every template term has the same value on all 
+#' of their coordinates, hence on the phantom coordinate
+#'
+#' @param g index of the gene
+#' @param regIntg activator/interaction and repressor/interaction 
+#' dictionaries for gene g
+#' @param ngenes number of genes/nodes
+#' @return sl list of coordinates (see sliceBV)
+def regulatorSlice(g, regIntg, ngenes):
+    [regIntActivators, regIntRepressors] = regIntg
+    sl = sorted(set(regIntActivators.keys() + regIntRepressors.keys() + [g]))
+    if (len(sl) < ngenes):
+        sl.append(None)
+    return(sl)
+
+#' Give the values of the applied perturbations of a given type in
+#' an experiment, if all perturbable genes have a known value
+#'
+#' @param SETP list of (associated experiment, known perturbations) pairs
+#' @param typeP type of perturbation (KO or FE)
+#' @param genes list of perturbable genes for this type of perturbation
+#' @param name experiment name
+#' @return values sorted tuple of (gene, value) pairs, or None if the
+#' value of a perturbable gene is unknown (or ambiguous)
+def knownPerturbations(SETP, typeP, genes, name):
+    values = set()
+    for [e, p] in SETP:
+        if (e == name):
+            values |= set([(getIt(pp[1], typeP + "(", ")"), pp[2]) for pp in p])
+    if (len(values) != len(genes) or set([x[0] for x in values]) != set(genes)):
+        return(None)
+    return(tuple(sorted(values)))
+
+#' Merge the experiments which trajectories are necessarily the same:
+#' with synchronous transitions and without threshold rules, the 
+#' trajectory is determined by the initial state and the perturbations, 
+#' so that experiments with the same fully known initial state and the same 
+#' fully known perturbations can share the same state variables. The 
+#' observations of merged experiments are gathered, and the fix point 
+#' constraint starts at the earliest fix point step
+#'
+#' @param C set of genes/nodes
+#' @param E set of experiments (see grn_solver)
+#' @param KO knock-down perturbations (see grn_solver)
+#' @param FE forced expression perturbations (see grn_solver)
+#' @param P perturbation list (see grn_solver)
+#' @param R list of allowed regulation conditions for each node
+#' @param typeT type of transition
+#' @param Fixpoint fixpoint constraints (see grn_solver)
+#' @return res list [E, KO, FE, Fixpoint, merged] of updated experiments,
+#' perturbations and fix point constraints, where merged is the list of
+#' [experiment name, list of names of the merged experiments] for each merge
+def mergeSyncExperiments(C, E, KO, FE, P, R, typeT, Fixpoint):
+    if (typeT != "synchronous" or any([any([i >= 18 for i in r]) for r in R])):
+        return([E, KO, FE, Fixpoint, []])
+    DOWN = [C[i] for i in range(len(C)) if ("-" in P[i])]
+    UP = [C[i] for i in range(len(C)) if ("+" in P[i])]
+    ## Perturbations applied in grn_solver  ##
+    pert = filter(lambda x : x[0] and x[2], [[KO, "KO", DOWN], [FE, "FE", UP]])
+    groups, keys = [], dict()
+    for [name, obs] in E:
+        initial = sorted(set([(gene, value) for [n, gene, value] in obs if (n == 0)]))
+        values = [knownPerturbations(SETP, typeP, genes, name) for [SETP, typeP, genes] in pert]
+        known = len(initial) == len(C) and len(set([x[0] for x in initial])) == len(C) and not (None in values)
+        key = [tuple(initial), tuple(values)] if (known) else [name]
+        if (str(key) in keys.keys()):
+            groups[keys.get(str(key))].append(name)
+        else:
+            keys.setdefault(str(key), len(groups))
+            groups.append([name])
+    merged = filter(lambda x : len(x) > 1, groups)
+    if (not merged):
+        return([E, KO, FE, Fixpoint, []])
+    observations = dict(E)
+    newE, newFixpoint = [], []
+    for names in groups:
+        obs = []
+        for name in names:
+            obs += filter(lambda x : not (x in obs), observations.get(name))
+        newE.append([names[0], obs])
+        steps = [f[0] for f in Fixpoint if (f[1] in names)]
+        if (steps):
+            newFixpoint.append([min(steps), names[0]])
+    names = [e[0] for e in newE]
+    newKO = filter(lambda x : x[0] in names, KO)
+    newFE = filter(lambda x : x[0] in names, FE)
+    return([newE, newKO, newFE, newFixpoint, [[x[0], x] for x in merged]])
+
 ######################################
 ##  SMT-CONDITIONS                  ##
 ######################################
@@ -52,6 +187,10 @@ testRS = lambda rs, i : rs == BitVecVal(i, 5)
 ## Returns the string associated with a state variable ##
 ## for step n in experiment exp                        ##
 getState = lambda n, exp : (("q_step%s_" % n) + "%s") % exp
+## Returns the step of the state variable for step n   ##
+## in an experiment with a fix point from step sstep:  ##
+## all steps after the fix point share the same state  ##
+stateStep = lambda n, sstep : ifthenelse(sstep == None, n, min(n, sstep))
 ## Returns bit-vector selecting value x[idx]           ##
 ## for x of size ngenes                                ##
 getCState = lambda x, idx, ngenes : x & bv(idx, ngenes)
@@ -83,10 +222,7 @@ def diff_interactions(s, intVar, model):
 #' @param model a model solution returned by the solver
 #' @return cond uniqueness condition on variables in @var
 def different(s, var, model):
-	cond = False
-	for v in var:
-		cond = Or(cond, v != model[v])
-	return(cond)
+	return(Or([v != model[v] for v in var]))
 
 #_______________________________#
 #  CONDITIONS ON experiments    #
@@ -98,12 +234,11 @@ def different(s, var, model):
 #' @param s solver
 #' @param q state variable list associated with one given experiment
 #' @param n step in which a given state value is known
-#' @param C set of genes/nodes
-#' @param gene gene which state value is known
+#' @param g index of the gene which state value is known
 #' @param value value that appears in the experimental constraints
 #' @return s updated solver with condition q[n](gene) == value
-def experiment_condition(s, q, n, C, gene, value):
-	s.add(testValue(q[n], C.index(gene), BitVecVal(value, 1)))
+def experiment_condition(s, q, n, g, value):
+	s.add(testValue(q[n], g, BitVecVal(value, 1)))
 	return(s)
 
 #____________________________#
@@ -135,16 +270,16 @@ def regulation_condition(s, Rs, R, ngenes):
 #' @param s solver
 #' @param SETP list of (associated experiment, known perturbations) pairs in the experiment file
 #' @param setp perturbation on which the condition should be generated
-#' @param exp_names list of all experiment names in the experiment file
-#' @param SETEXPR list of (gene, value) pairs in the experiment
+#' @param experiments dictionary experiment name -> index (see problem.nameIndex)
+#' @param SETEXPR dictionary perturbable gene -> index in the perturbation variables
 #' @param typeP type of perturbation for the gene/node of interest
 #' @return s updated solver with conditions that definitely set the known values of all perturbed gene
 #' variables in a given experiment
-def perturbation_condition(s, SETP, setp, exp_names, SETEXPR, typeP):
+def perturbation_condition(s, SETP, setp, experiments, SETEXPR, typeP):
     for [e, p] in SETP:
-	p_e = setp[exp_names.index(e)]
+	p_e = setp[experiments[e]]
 	for pp in p:
-		g = SETEXPR.index(getIt(pp[1], typeP + "(", ")"))
+		g = SETEXPR[getIt(pp[1], typeP + "(", ")")]
 		x = pp[2]
 		s.add(testValue(p_e, g, BitVecVal(x, 1)))
     return(s)
@@ -206,6 +341,19 @@ def aux_transition(i, g, q1, res, ngenes, pcg):
 	rulei = If(diCompute.get(i)(aA, aR, nA, nR, naA, naR, nnA, nnR, gc), bv(g, ngenes), buildZERO(ngenes))
 	return(getCState(q1, g, ngenes) == getCState(res(rulei), g, ngenes))
 
+#' Build transition condition on the (1-bit) value of a gene
+#' 
+#' @param i regulation condition number
+#' @param q1g bit-vector of size 1 of the value of the gene in the output state
+#' @param resg wrapper for the updated value of the gene (bit-vector of size 1)
+#' @param pcg pre-computation associated with the gene on its sliced
+#' coordinates (see regulatorSlice)
+#' @return cond transition condition q1[g] == res(rule_i) \in 0, 1
+def aux_transition1BV(i, q1g, resg, pcg):
+	[aA, aR, nA, nR, naA, naR, nnA, nnR, gc] = pcg
+	rulei = If(diCompute.get(i)(aA, aR, nA, nR, naA, naR, nnA, nnR, gc), true, false)
+	return(q1g == resg(rulei))
+
 #' Build synchronous transition condition
 #'
 #' @param Rs regulation condition variable list
@@ -228,9 +376,8 @@ def transition_condition_sync(Rs, g, i, auxtr):
 def transition_condition_async(Rs, g, i, q0, q1, auxtr):
 	return(Implies(equalExcept1BV(q0, q1, g), transition_condition_sync(Rs, g, i, auxtr)))
 
-#' Build the full transition condition for all genes at a given step of the experiment
+#' Build the list of transition conditions for all genes at a given step of the experiment
 #' 
-#' @param s solver
 #' @param n step of the experiment where q0 -> q1
 #' @param length maximal length of experiment
 #' @param q0 input state variable for transition
@@ -239,35 +386,96 @@ def transition_condition_async(Rs, g, i, q0, q1, auxtr):
 #' @param ngenes number of genes/nodes
 #' @param R list of allowed regulation conditions for each node
 #' @param Rs list of regulation condition variables for each node
-#' @param res wrapper for input state variable according to selected regulation condition
+#' @param res wrapper for the value of a gene (bit-vector of size 1) according to 
+#' selected regulation condition: res(x, g)
 #' @param typeT type of transition, either "asynchronous" or "synchronous"
-#' @param regulators list of bit-vectors variables associated with present regulators for each node
-#' @return s updated solver with conditions q0 -> q1
-def transition_condition(s, n, length, q0, q1, preComputation, ngenes, R, Rs, res, typeT, regulators):
+#' @param regulators list of bit-vectors associated with present regulators for each node
+#' (restricted to the coordinates in @slices)
+#' @param slices list of coordinates on which the transition condition depends for each 
+#' node (see regulatorSlice)
+#' @return conds list of conditions q0 -> q1
+def transition_relation(n, length, q0, q1, preComputation, ngenes, R, Rs, res, typeT, regulators, slices):
+	conds = []
 	condAsync = False
 	for g in range(ngenes):
 		pcg = preComputation[g]
-		auxtrr = lambda i : aux_transition(i, g, q1, res, ngenes, pcg)
+		q1g = extract1BV(q1, g)
+		resg = lambda x : res(x, g)
+		auxtrr = lambda i : aux_transition1BV(i, q1g, resg, pcg)
 		[a, r] = regulators[g]
-		auxtr17 = lambda i : ifthenelse(i==18, rule18(q0, a, r, g), rule19(q0, a, r, g))
+		q0g = sliceBV(q0, slices[g])
+		c = slices[g].index(g)
+		auxtr17 = lambda i : ifthenelse(i==18, rule18(q0g, a, r, c), rule19(q0g, a, r, c))
+		## Condition q0[g'] == q1[g'] for g'!=g is the   ##
+		## same for all regulation conditions            ##
+		if (typeT == "asynchronous"):
+			eqExcept = equalExcept1BV(q0, q1, g)
 		for i in R[g]:
 			## Different auxiliary functions are used to generate transition condition ##
 			## when threshold rules are selected                                       ##
 			auxtr = ifthenelse(i<18, auxtrr, auxtr17)
 			if (typeT == "asynchronous"):
-				cond = transition_condition_async(Rs, g, i, q0, q1, auxtr)
+				cond = Implies(eqExcept, transition_condition_sync(Rs, g, i, auxtr))
 			elif (typeT == "synchronous"):
 				cond = transition_condition_sync(Rs, g, i, auxtr)
 			else:
 				print("ERROR: Wrong transition type.")
 				return(None)
-			s.add(cond)
+			conds.append(cond)
 		if (typeT == "asynchronous"):
-			condAsync = Or(condAsync, equalExcept1BV(q0, q1, g))
+			condAsync = Or(condAsync, eqExcept)
 	if (typeT == "asynchronous"):
-		s.add(condAsync)
+		conds.append(condAsync)
+	return(conds)
+
+#' Build the full transition condition for all genes at a given step of the experiment
+#' 
+#' @param s solver
+#' @param n step of the experiment where q0 -> q1
+#' @param length maximal length of experiment
+#' @param q0 input state variable for transition
+#' @param q1 output state variable for transition
+#' @param preComputation list of precomputed terms for each node
+#' @param ngenes number of genes/nodes
+#' @param R list of allowed regulation conditions for each node
+#' @param Rs list of regulation condition variables for each node
+#' @param res wrapper for the value of a gene (bit-vector of size 1) according to 
+#' selected regulation condition: res(x, g)
+#' @param typeT type of transition, either "asynchronous" or "synchronous"
+#' @param regulators list of bit-vectors associated with present regulators for each node
+#' (restricted to the coordinates in @slices)
+#' @param slices list of coordinates on which the transition condition depends for each 
+#' node (see regulatorSlice)
+#' @return s updated solver with conditions q0 -> q1
+def transition_condition(s, n, length, q0, q1, preComputation, ngenes, R, Rs, res, typeT, regulators, slices):
+	conds = transition_relation(n, length, q0, q1, preComputation, ngenes, R, Rs, res, typeT, regulators, slices)
+	if (conds == None):
+		return(None)
+	s.add(conds)
 	return(s)
 
+#' Build the transition relation T(q0, q1) for all genes once, on fresh 
+#' state variables q0 and q1, so that it can be instantiated at every
+#' step of every experiment by substitution instead of being rebuilt
+#'
+#' @param prepreComputation list of pre-precomputed terms for each node
+#' @param ngenes number of genes/nodes
+#' @param R list of allowed regulation conditions for each node
+#' @param Rs list of regulation condition variables for each node
+#' @param res wrapper for the value of a gene according to selected regulation condition
+#' @param typeT type of transition, either "asynchronous" or "synchronous"
+#' @param regulators list of bit-vectors associated with present regulators for each node
+#' (restricted to the coordinates in @slices)
+#' @param slices list of coordinates on which the transition condition depends for each node
+#' @return template list [q0, q1, T] where T is the condition q0 -> q1
+def transition_template(prepreComputation, ngenes, R, Rs, res, typeT, regulators, slices):
+	q0, q1 = BitVec("q_template0_" + typeT, ngenes), BitVec("q_template1_" + typeT, ngenes)
+	preComputation = [preCompute(sliceBV(q0, slices[ci]), prepreComputation[ci]) for ci in range(ngenes)]
+	conds = transition_relation(None, None, q0, q1, preComputation, ngenes, R, Rs, res, typeT, regulators, slices)
+	if (conds == None):
+		return(None)
+	return([q0, q1, And(conds)])
+
 #' Build the full transition condition for all genes for several steps of the experiment
 #' 
 #' @param s solver
@@ -278,30 +486,44 @@ def transition_condition(s, n, length, q0, q1, preComputation, ngenes, R, Rs, re
 #' @param q list of state variables associated with current experiment
 #' @param typeT type of transition, either "asynchronous" or "synchronous"
 #' @param length maximal length of experiment
-#' @param regulators list of bit-vectors variables associated with present regulators for each node
+#' @param regulators list of bit-vectors associated with present regulators for each node
+#' (restricted to the coordinates in @slices)
+#' @param slices list of coordinates on which the transition condition depends for each node
 #' @param ngenes number of genes/nodes
 #' @param R list of allowed regulation conditions for each node
 #' @param Rs list of regulation condition variables for each node
-#' @param res wrapper for input state variable according to selected regulation condition
+#' @param res wrapper for the value of a gene according to selected regulation condition
 #' @param verbose logical if set to TRUE prints status messages
-#' @return s updated solver with conditions q_startstep -> q_(startstep+1) -> ... -> q_endstep
-def to_next_state(s, expname, prepreComputation, startstep, endstep, q, typeT, length, regulators, ngenes, R, Rs, res, verbose):
+#' @param templates dictionary of transition templates (see transition_template) for each 
+#' transition type, filled with the missing templates: it can be shared by calls on different 
+#' experiments as long as @res does not depend on the experiment
+#' @param subst list of pairs (variable in @res, value in the current experiment) substituted
+#' in the templates
+#' @return s updated solver with conditions q_startstep -> q_(startstep+1) -> ... -> q_endstep
+def to_next_state(s, expname, prepreComputation, startstep, endstep, q, typeT, length, regulators, slices, ngenes, R, Rs, res, verbose, templates=None, subst=[]):
 	if (typeT == "fixpoint"):
 		for i in range(startstep, endstep):
 			verboseIt("+++++++ FIXPOINT STEP #" + str(i) + " TO #" + str(i+1), verbose)
                 	verboseIt("@ " + getState(i, expname) + " = " + getState(i+1, expname), verbose)
 			s.add(q[i] == q[i+1])
 	typeT = ifthenelse(typeT == "fixpoint", "synchronous", typeT)
+	if (startstep > endstep):
+		return(s)
+	templates = ifthenelse(templates == None, dict(), templates)
+	if (not (typeT in templates.keys())):
+		templates.setdefault(typeT, transition_template(prepreComputation, ngenes, R, Rs, res, typeT, regulators, slices))
+	if (templates.get(typeT) == None):
+		return(None)
+	[q0, q1, T] = templates.get(typeT)
+	## T(x0, x1) for the current experiment   ##
+	instantiate = lambda x0, x1 : substitute(T, *([(q0, x0), (q1, x1)] + subst))
 	for i in range(startstep, endstep):
 		verboseIt("******* TRAJECTORY STEP #" + str(i) + " TO #" + str(i+1), verbose)
                 verboseIt("@ T(" + getState(i, expname) + ", " + getState(i+1, expname) 
 			+ ") <=> " + typeT + " transition", verbose)
-		preComputation = [preCompute(q[i], prepreComputation[ci]) for ci in range(ngenes)]
-        	s = transition_condition(s, i, length, q[i], q[i+1], preComputation, ngenes, R, Rs, res, typeT, regulators)
+        	s.add(instantiate(q[i], q[i+1]))
 	if (startstep == endstep):
-		preComputation = [preCompute(q[endstep], prepreComputation[ci]) for ci in range(ngenes)]
-        	s = transition_condition(s, endstep, length, q[endstep], q[endstep], 
-			preComputation, ngenes, R, Rs, res, typeT, regulators)
+        	s.add(instantiate(q[endstep], q[endstep]))
 	return(s)
 
 #_______________________________#
@@ -331,6 +553,19 @@ def mustHaveActivator_condition(s, activators, ngenes):
 	s.add(UGT(activators, buildZERO(ngenes)))
 	return(s)
 
+#' Group the optional interactions for the conditions on regulatory modules
+#'
+#' @param Iopt set of optional interactions
+#' @return res list [interactions, targets] of dictionaries: (regulator, regulated gene)
+#' -> index of the first such optional interaction, and regulated gene -> indices of
+#' the optional interactions of this gene
+def crmGroups(Iopt):
+	interactions, targets = dict(), dict()
+	for i in range(len(Iopt)):
+		interactions.setdefault((Iopt[i][0], Iopt[i][1]), i)
+		targets.setdefault(Iopt[i][1], []).append(i)
+	return([interactions, targets])
+
 #' Implements conditions on regulatory modules: 
 #' a TF->RM interaction is selected <-> corresponding RM->gene interaction is selected
 #' 
@@ -339,24 +574,24 @@ def mustHaveActivator_condition(s, activators, ngenes):
 #' @param Idef set of definite interactions
 #' @param Iopt set of optional interactions
 #' @param CRM set of regulatory modules
-#' @param C set of genes/nodes
+#' @param genes dictionary gene -> index in C (see problem.nameIndex)
 #' @return s updated solver with conditions on regulatory modules
-def crmInteractions_condition(s, Is, Idef, Iopt, CRM, C):
+def crmInteractions_condition(s, Is, Idef, Iopt, CRM, genes):
+	## Optional interactions grouped by interaction and by regulated gene ##
+	[interactions, targets] = crmGroups(Iopt)
 	for e in Idef:
-		## Interaction TF->RM is definite    ##
-		if (len(CRM[C.index(e[1])]) > 0):
-			idx = ifthenelseFct(lambda i : Iopt[i][0]==e[1] and Iopt[i][1]==CRM[C.index(e[1])], 
-				lambda i : i, Iopt)
-			if (len(idx) > 0):
-				idx = idx[0]
+		## Interaction TF->RM is definite    ##
+		if (len(CRM[genes[e[1]]]) > 0):
+			idx = interactions.get((e[1], CRM[genes[e[1]]]))
+			if (idx != None):
 				## Selects automatically the associated RM->gene  ##
 				s.add(extract1BV(Is, idx) == 1)
 	for i in range(len(Iopt)):
 		e = Iopt[i]
-		## Interaction RM->gene is optional  ##
-		if (len(CRM[C.index(e[0])]) > 0):
+		## Interaction RM->gene is optional  ##
+		if (len(CRM[genes[e[0]]]) > 0):
 			## Finds all associated TF->RM interactions               ##
-			idx = ifthenelseFct(lambda i : Iopt[i][1]==e[1], lambda i : i, Iopt)
+			idx = targets[e[1]]
 			condAllNot = True
 			for ii in idx:
 				condAllNot = And(condAllNot, extract1BV(Is, ii) == 0)
@@ -378,16 +613,98 @@ def crmInteractions_condition(s, Is, Idef, Iopt, CRM, C):
 #' @param typeT type of transition, either "asynchronous" or "synchronous"
 #' @param length maximum length of experiment
 #' @param regulators list of present regulator bit-vector for each gene
+#' (restricted to the coordinates in @slices)
+#' @param slices list of coordinates on which the transition condition depends for each node
 #' @param ngenes number of genes/nodes
 #' @param R list of allowed regulation conditions for each node
 #' @param Rs list of selected regulation condition bit-vector for each node
-#' @param res wrapper for input state transition
+#' @param res wrapper for the value of a gene according to selected regulation condition
 #' @param verbose logical for printing messages
+#' @param templates dictionary of transition templates (see to_next_state)
+#' @param subst list of substitutions in the templates (see to_next_state)
 #' @return s updated solver with conditions on fix points from step sstep to 
-#' the end of the experiment
-def fixpoint_condition(s, expname, prepreComputation, sstep, q, typeT, length, regulators, ngenes, R, Rs, res, verbose):
+#' the end of the experiment: the states from step sstep to the end of the experiment
+#' are expected to be the same variable (see stateStep), so that only one (synchronous)
+#' self-transition on q[sstep] is needed
+def fixpoint_condition(s, expname, prepreComputation, sstep, q, typeT, length, regulators, slices, ngenes, R, Rs, res, verbose, templates=None, subst=[]):
 	if (sstep < length+1):
-		s = to_next_state(s, expname, prepreComputation, sstep, length, q, 
-			"fixpoint", length, regulators, ngenes, R, Rs, res, verbose)
+		s = to_next_state(s, expname, prepreComputation, sstep, sstep, q, 
+			"fixpoint", length, regulators, slices, ngenes, R, Rs, res, verbose, templates=templates, subst=subst)
 	return(s)
 
+#_______________________________#
+#  CONDITIONS ON lengths        #
+#_______________________________#
+
+#' Step up to which the trajectory of an experiment is first unrolled
+#' in the iterative deepening mode
+#'
+#' @param exp experiment [name, list of [step, gene, value]]
+#' @param sstep step at which starts the fix point condition (None if no fix point)
+#' @param length maximal length of experiment
+#' @return depth last observed step, or @length if the experiment has a fix point 
+#' (the steps after the fix point are then all the same state, see stateStep)
+def experimentDepth(exp, sstep, length):
+	if (sstep != None and sstep <= length):
+		return(length)
+	return(min(length, max([0] + [n for [n, _, _] in exp[1]])))
+
+#' Names of the variables of a list of expressions
+#'
+#' @param exprs list of Z3 expressions
+#' @return names set of names of the (uninterpreted) constants in @exprs
+def constantNames(exprs):
+	names, seen = set(), set()
+	stack = list(exprs)
+	while (stack):
+		e = stack.pop()
+		if (e.get_id() in seen):
+			continue
+		seen.add(e.get_id())
+		if (is_const(e) and e.decl().kind() == Z3_OP_UNINTERPRETED):
+			names.add(str(e))
+		stack += e.children()
+	return(names)
+
+#' Extend by one step the first trajectory which cannot be completed up to the
+#' maximal length of the experiments in a model (iterative deepening mode)
+#'
+#' The missing steps of a trajectory unrolled up to a step lower than @length are
+#' built once in a separate (small) solver, which is checked under the assumption
+#' that the variables of these steps are equal to their values in the model
+#'
+#' @param s solver
+#' @param M model of the solver
+#' @param sc dictionary of the solvers for the missing steps of each trajectory
+#' (for each experiment and unrolled length), filled with the missing solvers
+#' @param tails list of [experiment name, q, res, subst] for each experiment, where q
+#' is the list of state variables of the unrolled steps (extended in place)
+#' @param length maximal length of experiment
+#' @param args list of the other arguments of to_next_state [prepreComputation, typeT, 
+#' regulators, slices, ngenes, R, Rs, verbose, templates]
+#' @return res list [s, extended] of the updated solver and of a logical set to True 
+#' if a trajectory has been extended (then @M is not a model of the full experiments)
+def deepen_condition(s, M, sc, tails, length, args):
+	[prepreComputation, typeT, regulators, slices, ngenes, R, Rs, verbose, templates] = args
+	nextState = lambda s, expname, startstep, endstep, q, res, subst : to_next_state(s, expname, 
+		prepreComputation, startstep, endstep, q, typeT, length, regulators, slices, ngenes, R, Rs, 
+		res, False, templates=templates, subst=subst)
+	values = dict([[d.name(), d() == M[d]] for d in M.decls() if (d.arity() == 0)])
+	## Can the trajectory be completed up to step length? ##
+	def isComplete(expname, q, res, subst):
+		key = expname + "_" + str(len(q))
+		if (not (key in sc.keys())):
+			qq = q + [BitVec(getState(n, expname), ngenes) for n in range(len(q), length+1)]
+			sck = nextState(Solver(), expname, len(q)-1, length, qq, res, subst)
+			## Variables of the unrolled steps and of the model ##
+			names = constantNames(sck.assertions()) - set([str(x) for x in qq[len(q):]])
+			sc.setdefault(key, [sck, names])
+		[sck, names] = sc.get(key)
+		return(sck.check(*[values.get(x) for x in names if (x in values.keys())]) == sat)
+	for [expname, q, res, subst] in tails:
+		if (len(q) <= length and not isComplete(expname, q, res, subst)):
+			verboseIt("Trajectory of \'" + expname + "\' extended to step " + str(len(q)), verbose)
+			q.append(BitVec(getState(len(q), expname), ngenes))
+			s = nextState(s, expname, len(q)-2, len(q)-1, q, res, subst)
+			return([s, True])
+	return([s, False])
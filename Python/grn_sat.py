@@ -0,0 +1,424 @@
+# -*- coding: utf-8 -*-
+
+from z3 import *
+from time import time
+from shortcuts import diCompute
+from utils import verboseIt, printPretty, rev, ifthenelse, getIt, default
+from grn_inference import buildInteractionDicts, crmGroups, getState, stateStep
+from problem import Problem, nameIndex
+
+##############################################
+## PROPOSITIONAL ENCODING OF THE GRN        ##
+## INFERENCE PROBLEM                        ##
+##############################################
+
+## Every bit-vector of the SMT encoding is replaced by  ##
+## a list of Boolean terms (one per gene), and every    ##
+## bit-wise operation by the corresponding Boolean      ##
+## operation on each coordinate, so that the GRF        ##
+## templates in diCompute can be reused as they are.    ##
+## The GRF of each node is one-hot encoded, and the     ##
+## threshold functions are encoded as pseudo-Boolean   ##
+## constraints: the problem is then solved by the SAT   ##
+## core of Z3 (logic QF_FD).                            ##
+
+## For a given gene, the template terms only depend on  ##
+## the coordinates of its potential regulators: all     ##
+## other coordinates evaluate to the same value, hence  ##
+## are represented by one single "phantom" coordinate   ##
+## with no activator and no repressor.                  ##
+
+#______________________________#
+#  Boolean terms               #
+#______________________________#
+
+## Boolean operations with constant folding: constants ##
+## are Python booleans (much cheaper to test than Z3    ##
+## values), other terms are Z3 Boolean expressions      ##
+def mkNot(x):
+	if (isinstance(x, bool)):
+		return(not x)
+	return(Not(x))
+
+def mkAnd(x, y):
+	if (x is False or y is False):
+		return(False)
+	if (x is True):
+		return(y)
+	if (y is True):
+		return(x)
+	return(And(x, y))
+
+def mkOr(x, y):
+	if (x is True or y is True):
+		return(True)
+	if (x is False):
+		return(y)
+	if (y is False):
+		return(x)
+	return(Or(x, y))
+
+def mkAndList(ls):
+	ls = [x for x in ls if (not (x is True))]
+	if (any([x is False for x in ls])):
+		return(False)
+	if (len(ls) < 2):
+		return(ls[0] if (ls) else True)
+	return(And(ls))
+
+def mkOrList(ls):
+	ls = [x for x in ls if (not (x is False))]
+	if (any([x is True for x in ls])):
+		return(True)
+	if (len(ls) < 2):
+		return(ls[0] if (ls) else False)
+	return(Or(ls))
+
+def mkEq(x, y):
+	if (x is True):
+		return(y)
+	if (y is True):
+		return(x)
+	if (x is False):
+		return(mkNot(y))
+	if (y is False):
+		return(mkNot(x))
+	return(x == y)
+
+## Converts a folded term into a Z3 expression          ##
+toZ3 = lambda x : BoolVal(x) if (isinstance(x, bool)) else x
+
+#' Vector of Boolean terms (bit-blasted version of a bit-vector)
+#' that supports the bit-wise operations used in diCompute
+class BoolVec(object):
+	__slots__ = ["bits"]
+
+	def __init__(self, bits):
+		self.bits = bits
+
+	def __and__(self, other):
+		return(BoolVec([mkAnd(x, y) for x, y in zip(self.bits, other.bits)]))
+
+	def __or__(self, other):
+		return(BoolVec([mkOr(x, y) for x, y in zip(self.bits, other.bits)]))
+
+	def __invert__(self):
+		return(BoolVec([mkNot(x) for x in self.bits]))
+
+## Vector where every coordinate is equal to x          ##
+broadcast = lambda x, n : BoolVec([x]*n)
+## Equivalent of castBVinCond: b -> b == 1..1           ##
+castBoolVec = lambda b : mkAndList(b.bits)
+## Equivalent of neg: 1..1 if b != 1..1 else 0..0       ##
+negBoolVec = lambda b : broadcast(mkNot(castBoolVec(b)), len(b.bits))
+
+#______________________________#
+#  Template functions          #
+#______________________________#
+
+#' Pre-computation of template functions knowing the
+#' regulators of a given gene (see shortcuts.prepreCompute)
+#'
+#' @param a list of Boolean terms for present activators (restricted
+#' to the coordinates of the potential regulators + phantom coordinate)
+#' @param r list of Boolean terms for present repressors (same coordinates)
+#' @return res list of pre-computed terms
+def prepreComputeBool(a, r):
+	n = len(a)
+	isInducible = mkOrList(a)
+	isRepressible = mkOrList(r)
+	allActivatorsG = lambda q : BoolVec([mkAnd(isInducible, mkOr(mkNot(a[i]), q[i])) for i in range(n)])
+	allRepressorsG = lambda q : BoolVec([mkAnd(isRepressible, mkOr(mkNot(r[i]), q[i])) for i in range(n)])
+	noActivatorsG = lambda q : BoolVec([mkNot(mkAnd(q[i], a[i])) for i in range(n)])
+	noRepressorsG = lambda q : BoolVec([mkNot(mkAnd(q[i], r[i])) for i in range(n)])
+	indRegG = mkOr(mkNot(isInducible), isRepressible)
+	repRegG = BoolVec([mkAnd(isRepressible, mkNot(a[i])) for i in range(n)])
+	return([allActivatorsG, allRepressorsG, noActivatorsG, noRepressorsG, indRegG, repRegG])
+
+#' Pre-computation of template functions knowing the
+#' regulators of a given gene and the system state
+#' (see shortcuts.preCompute)
+#'
+#' @param q list of Boolean terms for the state (same coordinates as
+#' in prepreComputeBool)
+#' @param prepreComputationG result of prepreComputeBool for the gene
+#' @return res list of arguments of the templates in diCompute
+def preComputeBool(q, prepreComputationG):
+	[allActivatorsG, allRepressorsG, noActivatorsG, noRepressorsG, indRegG, repRegG] = prepreComputationG
+	n = len(q)
+	aA, aR, nA, nR = allActivatorsG(q), allRepressorsG(q), noActivatorsG(q), noRepressorsG(q)
+	naA, naR, nnA, nnR = [negBoolVec(x) for x in [aA, aR, nA, nR]]
+	inducibleRegulationGQ = broadcast(mkOr(indRegG, nnA.bits[0]), n)
+	repressibleRegulationGQ = repRegG & nR
+	getRegFctGQ = lambda x : castBoolVec((x & inducibleRegulationGQ) | repressibleRegulationGQ)
+	return([aA, aR, nA, nR, naA, naR, nnA, nnR, getRegFctGQ])
+
+## Count of active regulators x (list of (activity,     ##
+## presence) Boolean terms) as pseudo-Boolean terms     ##
+activeRegulators = lambda q, x : [mkAnd(q[i], x[i]) for i in range(len(x))]
+
+#' Threshold functions (see shortcuts.rule18 and rule19):
+#' #active activators > #active repressors
+#' (or = and gene is active, if @withGene)
+#'
+#' @param q list of Boolean terms for the state (same coordinates as
+#' in prepreComputeBool)
+#' @param a list of Boolean terms for present activators
+#' @param r list of Boolean terms for present repressors
+#' @param qc Boolean term for the state of the gene itself
+#' @param withGene logical: rule #18 if set to True, else rule #19
+#' @return cond condition
+def ruleThresholdBool(q, a, r, qc, withGene):
+	## sa > sr <=> sa + (n - sr) >= n + 1                   ##
+	terms = [(toZ3(x), 1) for x in activeRegulators(q, a)] + [(toZ3(mkNot(x)), 1) for x in activeRegulators(q, r)]
+	n = len(r)
+	greater = PbGe(terms, n+1)
+	if (not withGene):
+		return(greater)
+	return(Or(greater, And(toZ3(qc), PbGe(terms, n))))
+
+#______________________________#
+#  Conditions                  #
+#______________________________#
+
+#' Build the full transition condition for all genes at a given step
+#' of an experiment (see grn_inference.transition_condition)
+#'
+#' @param s solver
+#' @param q0 state vector (BoolVec of size #nodes) of the input state
+#' @param q1 state vector (BoolVec of size #nodes) of the output state
+#' @param slices list of coordinates of the potential regulators for each node
+#' @param prepreComputation list of pre-precomputed terms for each node
+#' @param regulators list of [activators, repressors] Boolean terms for each node
+#' @param grf list of dictionaries (keys: allowed regulation conditions, values:
+#' one-hot Boolean variables) for each node
+#' @param res wrapper for the value of a node in the output state (perturbations)
+#' @param typeT type of transition, either "asynchronous" or "synchronous"
+#' @return s updated solver with conditions q0 -> q1
+def transition_condition_bool(s, q0, q1, slices, prepreComputation, regulators, grf, res, typeT):
+	ngenes = len(q0.bits)
+	condAsync = []
+	for g in range(ngenes):
+		qg = [q0.bits[i] if (i != None) else False for i in slices[g]]
+		[a, r] = regulators[g]
+		if (typeT == "asynchronous"):
+			equalExcept = mkAndList([mkEq(q0.bits[i], q1.bits[i]) for i in range(ngenes) if (i != g)])
+			condAsync.append(equalExcept)
+		pcg = preComputeBool(qg, prepreComputation[g])
+		for i, rs in grf[g].items():
+			if (i < 18):
+				cond = mkEq(q1.bits[g], res(diCompute.get(i)(*pcg), g))
+			else:
+				cond = ruleThresholdBool(qg, a, r, q0.bits[g], i == 18)
+			cond = Implies(rs, toZ3(cond))
+			if (typeT == "asynchronous"):
+				cond = Implies(toZ3(equalExcept), cond)
+			s.add(cond)
+	if (typeT == "asynchronous"):
+		s.add(toZ3(mkOrList(condAsync)))
+	return(s)
+
+#' Build the transition conditions for several steps of an experiment
+#' (see grn_inference.to_next_state)
+#'
+#' @param s solver
+#' @param startstep starting step of transition
+#' @param endstep ending step of transition
+#' @param q list of state vectors (BoolVec) of the experiment
+#' @param typeT type of transition, either "asynchronous", "synchronous" or "fixpoint"
+#' @param args other arguments of transition_condition_bool
+#' @return s updated solver with conditions q_startstep -> ... -> q_endstep
+def to_next_state_bool(s, startstep, endstep, q, typeT, args):
+	if (typeT == "fixpoint"):
+		for i in range(startstep, endstep):
+			s.add(And([x == y for x, y in zip(q[i].bits, q[i+1].bits)]))
+	typeT = ifthenelse(typeT == "fixpoint", "synchronous", typeT)
+	for i in range(startstep, endstep):
+		s = transition_condition_bool(s, q[i], q[i+1], *(args + [typeT]))
+	if (startstep == endstep):
+		s = transition_condition_bool(s, q[endstep], q[endstep], *(args + [typeT]))
+	return(s)
+
+#' Build the Boolean terms of present regulators of a gene
+#'
+#' @param Is list of Boolean variables for selected optional interactions
+#' @param regInt regulator/interaction dictionary for the gene
+#' @param sl coordinates of the potential regulators of the gene (None for
+#' the phantom coordinate)
+#' @return res list of Boolean terms
+def regulatorTerms(Is, regInt, sl):
+	res = []
+	for i in sl:
+		if (i == None or not (i in regInt.keys())):
+			res.append(False)
+		elif (regInt.get(i) == default):
+			res.append(True)
+		else:
+			res.append(Is[regInt.get(i)])
+	return(res)
+
+## Binary string of a list of Boolean values (MSB first) ##
+## as in the solutions returned by grn_solver            ##
+boolList2Str = lambda ls : "".join([str(int(x)) for x in rev(ls)])
+
+#______________________________#
+#  Solver                      #
+#______________________________#
+
+#' Solve an instance of the GRN inference problem with a
+#' propositional encoding (see grn_solver.grn_solver for the
+#' description of arguments and of the returned value)
+#'
+#' The returned model solutions have the same format as
+#' the ones returned by grn_solver
+def grn_solver_sat(C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint, verbose=False, printSolutions=True, printmain=True, regInt=None):
+	from grn_solver import getPerturbedGenes
+	if (not solmax):
+		solmax = 10
+	s = SolverFor("QF_FD")
+	ngenes = len(C)
+	UP, DOWN = [], []
+	chiUP, chiDOWN = dict(), dict()
+	mustHaveActivator = []
+	for i in range(len(P)):
+		if ("-" in P[i]):
+			DOWN.append(C[i])
+			chiDOWN.setdefault(i, len(DOWN)-1)
+		if ("+" in P[i]):
+			UP.append(C[i])
+			chiUP.setdefault(i, len(UP)-1)
+		if ("!" in P[i]):
+			mustHaveActivator.append(i)
+	## Genes and experiments are looked up by index ##
+	problem = Problem(C, E, Fixpoint)
+	exp_names = [e[0] for e in E]
+	t = time()
+	## Selected optional interactions      ##
+	Is = [Bool("selected_interactions_%d" % i) for i in range(len(Iopt))]
+	## One-hot encoding of the GRFs        ##
+	grf = [dict([[r, Bool("grf_%s_%d" % (C[c], r))] for r in R[c]]) for c in range(ngenes)]
+	for c in range(ngenes):
+		s.add(PbEq([(x, 1) for x in grf[c].values()], 1))
+	## Perturbations                       ##
+	ko = [[Bool("ko_%s_%d" % (e, i)) for i in range(len(DOWN))] for e in exp_names]
+	fe = [[Bool("fe_%s_%d" % (e, i)) for i in range(len(UP))] for e in exp_names]
+	for [SETP, setp, SETEXPR, typeP] in [[KO, ko, DOWN, "KO"], [FE, fe, UP, "FE"]]:
+		if (not SETEXPR):
+			continue
+		SETEXPR = nameIndex(SETEXPR)
+		for [e, p] in SETP:
+			for pp in p:
+				x = setp[problem.experiments[e]][SETEXPR[getIt(pp[1], typeP + "(", ")")]]
+				s.add(ifthenelse(pp[2], x, Not(x)))
+	## Regulatory modules and regulators   ##
+	verboseIt("Computation of interactions", verbose)
+	selected = lambda i : Is[i]
+	if (any([len(c) > 0 for c in CRM])):
+		[interactions, targets] = crmGroups(Iopt)
+		for e in Idef:
+			if (len(CRM[problem.genes[e[1]]]) > 0):
+				idx = interactions.get((e[1], CRM[problem.genes[e[1]]]))
+				if (idx != None):
+					s.add(Is[idx])
+		for i in range(len(Iopt)):
+			if (len(CRM[problem.genes[Iopt[i][0]]]) > 0):
+				idx = targets[Iopt[i][1]]
+				for ii in idx:
+					s.add(Implies(Is[ii], Is[i]))
+				s.add(Implies(And([Not(Is[ii]) for ii in idx]), Not(Is[i])))
+	if (regInt == None):
+		regInt = buildInteractionDicts(C, Idef, Iopt)
+	## Genes without any interaction ##
+	regInt = [ifthenelse(r[0] == None, [dict(), dict()], r) for r in regInt]
+	slices, regulators = [], []
+	for idx, gene in enumerate(C):
+		[regIntActivators, regIntRepressors] = regInt[idx]
+		sl = sorted(set(regIntActivators.keys() + regIntRepressors.keys()))
+		## Phantom coordinate for non-regulators ##
+		if (len(sl) < ngenes):
+			sl.append(None)
+		slices.append(sl)
+		regulators.append([regulatorTerms(Is, regIntActivators, sl), regulatorTerms(Is, regIntRepressors, sl)])
+		if (idx in mustHaveActivator):
+			s.add(toZ3(mkOrList(regulators[idx][0])))
+	prepreComputation = [prepreComputeBool(a, r) for [a, r] in regulators]
+	#____________________________________________________#
+	#  Conditions on experiments                         #
+	#____________________________________________________#
+	verboseIt("Conditions on experiments", verbose)
+	stateVar = []
+	for k, exp in enumerate(E):
+		verboseIt("--------- EXPERIMENT \'" + exp[0] + "\'", verbose=printmain)
+		e = problem.experiments[exp[0]]
+		sstep = problem.fixpoints.get(exp[0])
+		## The steps after the fix point share one state ##
+		q = [BoolVec([Bool(getState(stateStep(n, sstep), exp[0]) + "_%d" % g) for g in range(ngenes)]) for n in range(length+1)]
+		stateVar += [[getState(n, exp[0]), q[n]] for n in range(length+1)]
+		## Perturbations for each gene          ##
+		ko_e = [ko[e][chiDOWN.get(g)] if (g in chiDOWN.keys()) else False for g in range(ngenes)]
+		fe_e = [fe[e][chiUP.get(g)] if (g in chiUP.keys()) else False for g in range(ngenes)]
+		applyKO = bool(KO and DOWN)
+		applyFE = bool(FE and UP)
+		res = lambda x, g : mkOr(mkAnd(x, mkNot(ifthenelse(applyKO, ko_e[g], False))),
+			ifthenelse(applyFE, fe_e[g], False))
+		args = [slices, prepreComputation, regulators, grf, res]
+		s = to_next_state_bool(s, 0, ifthenelse(sstep == None, length, sstep), q, typeT, args)
+		if (sstep != None and sstep < length+1):
+			s = to_next_state_bool(s, sstep, sstep, q, "fixpoint", args)
+		for [_, n, g, value] in problem.experimentObservations(k).tolist():
+			x = q[n].bits[g]
+			s.add(ifthenelse(value, x, Not(x)))
+	#____________________________________________________#
+	#  Solution processing                               #
+	#____________________________________________________#
+	koSol = getPerturbedGenes(C, chiDOWN, "KO")
+	feSol = getPerturbedGenes(C, chiUP, "FE")
+	resList = []
+	sol = 1
+	while (sol <= solmax):
+		verboseIt("\nTIME = %.2f" % (time()-t) + " sec\n", printSolutions)
+		t = time()
+		checkRes = s.check()
+		verboseIt("CHECKING TIME = %.2f" % (time()-t) + " sec\n", printSolutions)
+		if (checkRes != sat):
+			verboseIt(ifthenelse(resList, "No other model found.\n", "No model found.\n"), printSolutions or not resList)
+			return([resList, s, regInt])
+		M = s.model()
+		value = lambda x : is_true(M.eval(toZ3(x), model_completion=True))
+		IsM = [value(x) for x in Is]
+		grfM = [[r for r, x in grf[c].items() if (value(x))][0] for c in range(ngenes)]
+		stateM = [[name, [value(x) for x in qn.bits]] for [name, qn] in stateVar]
+		present = lambda terms, c : [C[slices[c][k]] for k in range(len(terms)) if (slices[c][k] != None and value(terms[k]))]
+		intSol = [["selected_interactions", boolList2Str(IsM)]] if (Iopt) else []
+		regSol = [["grf_" + C[c], grfM[c]] for c in range(ngenes)]
+		stateSol = [[name, boolList2Str(v)] for [name, v] in stateM]
+		actSol = [["activators_" + C[c], present(regulators[c][0], c)] for c in range(ngenes)]
+		repSol = [["repressors_" + C[c], present(regulators[c][1], c)] for c in range(ngenes)]
+		resList.append(intSol + regSol + stateSol + actSol + repSol + koSol + feSol)
+		verboseIt("Model no. " + str(sol) + " found:", printSolutions)
+		if (Iopt and printSolutions):
+			verboseIt("> Interaction vector: ", True)
+			printPretty(intSol)
+		if (printSolutions):
+			verboseIt("> GRFs: ", True)
+			printPretty(regSol)
+		verboseIt("____________________________________\n", printSolutions)
+		if (sol == solmax):
+			break
+		## Uniqueness of models (see getSolution)   ##
+		cond1 = toZ3(mkOrList([ifthenelse(v, Not(x), x) for x, v in zip(Is, IsM)]))
+		if (uniqueness == "interactions"):
+			s.add(cond1)
+		elif (uniqueness in ["full", "paths"]):
+			cond2 = Or([Not(grf[c][grfM[c]]) for c in range(ngenes)])
+			if (uniqueness == "full"):
+				s.add(Or(cond1, cond2))
+			else:
+				cond3 = Or([ifthenelse(v, Not(x), x) for [_, qn], [_, vn] in zip(stateVar, stateM) for x, v in zip(qn.bits, vn)])
+				s.add(Or(cond1, cond2, cond3))
+		else:
+			verboseIt("MSG: Warning! No correct uniqueness condition detected.", True)
+			return([resList, s, regInt])
+		sol += 1
+	verboseIt("Maximum number of solutions reached.\n", printSolutions)
+	return([resList, s, regInt])
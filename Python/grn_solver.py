@@ -1,7 +1,10 @@
 # -*- coding: utf-8 -*-
  
 from grn_inference import *
+from problem import Problem, nameIndex
 from utils import *
+from portfolio import portfolio_check, startPortfolio, stopPortfolio
+from profiler import newProfile, startPhase, endPhase, checkPhase, dumpProfile
 from time import time 
 
 #######################
@@ -15,7 +18,8 @@ from time import time
 #' @param M model returned by the solver
 #' @return res list of pairs (bit-vector variable, value in model @M)
 def getPresentRegulators(C, regulatorsVar, M):
-    return([[v, filterNone([ifthenelse(simplify(testValue(M[v], i, true)), C[i]) for i in range(len(C))])] for v in regulatorsVar])
+    ## Bit i of the value of v is set iff C[i] is present ##
+    return([[v, [C[i] for i in bitIndices(M[v].as_long())]] for v in regulatorsVar])
  
 #' Give the list of perturbed genes in the experiments
 #'
@@ -41,6 +45,9 @@ def getPerturbedGenes(C, chi, typeP):
 #' @param regVar list of #nodes Rs_v, Rs_v is the bit-vector variable
 #' associated with the selected regulation condition for node v
 #' @param stateVar list of list of state variables at each step for each experiment 
+#' @param expNames list of the names of the experiments in @stateVar: the state of
+#' each step is named after its step (see getState), even if the steps after a fix
+#' point share the same variable (see stateStep)
 #' @param regulators list of present regulator bit-vector for each gene
 #' @param chiDOWN dictionary associated with KO perturbations
 #' @param chiUP dictionary associated with FE perturbations
@@ -52,18 +59,42 @@ def getPerturbedGenes(C, chi, typeP):
 #' @param solNB number of the currently processed solution
 #' @param stopSol logical for not applying the uniqueness condition at the end of the processing
 #' @param printSolutions logical for printing message about the processed solution
+#' @param portfolio portfolio of differently-configured solvers to race for the 
+#' satisfiability check (see startPortfolio), or None
+#' @param checkTimes if not None, list to which the checking time is appended
+#' @param profile if not None, profile in which the check is recorded (see profiler.py)
+#' @param deepen if not None, function deepen(s, M) returning [s, extended], which extends
+#' the trajectories of the experiments when the model M cannot be completed up to their
+#' maximal length (iterative deepening): the check is then performed again
+#' @param onSolution if not None, function called on the solution as soon as it is
+#' found: @resList then only contains the last solution
 #' @return res list of updated solution list, new timestamp, updated solver with uniqueness
 #' condition, logical indicating if the solver should stop looking for conditions
-def getSolution(C, length, Iopt, ngenes, t, s, intVar, regVar, stateVar, regulators, chiDOWN, chiUP, R, uniqueness, verbose, resList=[], solNB=1, stopSol=False, printSolutions=True):
+def getSolution(C, length, Iopt, ngenes, t, s, intVar, regVar, stateVar, expNames, regulators, chiDOWN, chiUP, R, uniqueness, verbose, resList=[], solNB=1, stopSol=False, printSolutions=True, portfolio=None, checkTimes=None, profile=None, deepen=None, onSolution=None):
     lenIopt = len(Iopt)
     verboseIt("\nTIME = %.2f" % (time()-t) + " sec\n", printSolutions)
     t = time()
-    s.check()
-    verboseIt("CHECKING TIME = %.2f" % (time()-t) + " sec\n", printSolutions)
+    check = lambda s : portfolio_check(s, portfolio) if (portfolio != None) else s.check()
+    checkRes = check(s)
+    extended, checkedModel = True, None
+    while (deepen and checkRes == sat and extended):
+        ## The checks in deepen discard the model ##
+        checkedModel = s.model()
+        [s, extended] = deepen(s, checkedModel)
+        if (extended):
+            checkRes = check(s)
+    checkTime = time()-t
+    verboseIt("CHECKING TIME = %.2f" % checkTime + " sec\n", printSolutions)
+    if (checkTimes != None):
+        checkTimes.append(checkTime)
+    profile = checkPhase(profile, solNB, checkTime, checkRes)
     noMoreModel = False
     M = None
     try:
-        M = s.model()
+        ## Avoids retrieving a model from a previous check ##
+        if (checkRes != sat):
+            raise Z3Exception("No model available")
+        M = s.model() if (checkedModel == None) else checkedModel
     except:
         if (resList):
             verboseIt("No other model found.\n", printSolutions)
@@ -74,7 +105,7 @@ def getSolution(C, length, Iopt, ngenes, t, s, intVar, regVar, stateVar, regulat
     if (M):
         dec = lambda lsVar, size : [[v, getBinaryDec(M[v], size)] for v in lsVar]
         intSol = dec(intVar, lenIopt) if (lenIopt) else []
-        stateSol = dec(stateVar, ngenes)
+        stateSol = [[getState(n, name), getBinaryDec(M[v], ngenes)] for name, q in zip(expNames, stateVar) for n, v in enumerate(q)]
         regSol = dec(regVar, None)
         actVar, repVar = [x[0] for x in regulators], [x[1] for x in regulators]
         actSol = getPresentRegulators(C, actVar, M)
@@ -82,6 +113,9 @@ def getSolution(C, length, Iopt, ngenes, t, s, intVar, regVar, stateVar, regulat
         koSol = getPerturbedGenes(C, chiDOWN, "KO")
         feSol = getPerturbedGenes(C, chiUP, "FE")
         solution = intSol + regSol + stateSol + actSol + repSol + koSol + feSol
+        if (onSolution != None):
+            del resList[:]
+            onSolution(solution)
         resList.append(solution)
         verboseIt("Model no. " + str(solNB) + " found:", printSolutions)
         if (lenIopt and printSolutions):
@@ -93,10 +127,12 @@ def getSolution(C, length, Iopt, ngenes, t, s, intVar, regVar, stateVar, regulat
         	printPretty(regSol)
         if (verbose and printSolutions):
             verboseIt("> States: ", True)
-            for n in range(len(stateSol)/(length+1)):
+            k = 0
+            for q in stateVar:
                 verboseIt(">> Experiment: ", True)
                 verboseIt(reduce(lambda x,y: x+y, rev(C)), True)
-                printPretty(stateSol[n*(length+1):(n+1)*(length+1)])
+                printPretty(stateSol[k:(k+len(q))])
+                k += len(q)
         verboseIt("____________________________________\n", printSolutions)
 	if (stopSol):
 		return([resList, t, s, True])
@@ -117,7 +153,7 @@ def getSolution(C, length, Iopt, ngenes, t, s, intVar, regVar, stateVar, regulat
 		s.add(Or(cond2, cond1))
 		return([resList, t, s, noMoreModel])
 	if (uniqueness == "paths"):
-		cond3 = different(s, stateVar, M)
+		cond3 = different(s, reduce(lambda x,y: x+y, stateVar, []), M)
 		s.add(Or(cond1, Or(cond2, cond3)))
 		return([resList, t, s, noMoreModel])
 	verboseIt("MSG: Warning! No correct uniqueness condition detected.", True)
@@ -170,10 +206,71 @@ def getSolution(C, length, Iopt, ngenes, t, s, intVar, regVar, stateVar, regulat
 #' @param Fixpoint fixpoint constraints
 #'                 (list of [start step of fix point state, experiment name])
 #' @param verbose boolean: prints status messages if set to True
+#' @param portfolio number N of differently-configured solvers (random seeds, 
+#'                  tactics, bit-blasting strategies) raced in a process pool
+#'                  (created once for all the checks) for each check: the first
+#'                  answer is kept, the other solvers are interrupted (integer,
+#'                  no portfolio if N < 2)
+#' @param incremental boolean: if set to True, the solutions are enumerated with the
+#'                    incremental SAT-based solver of Z3 (SolverFor("QF_FD")), which
+#'                    bit-blasts the constraints once and keeps what it learned from
+#'                    one check to the next, instead of the default solver (which only
+#'                    bit-blasts for the first check, and then falls back to its 
+#'                    slower incremental core). The uniqueness conditions of the 
+#'                    solutions are added in a scope of the solver, which is popped 
+#'                    once the enumeration is over: the returned solver is then free
+#'                    of the conditions added during the enumeration
+#' @param checkTimes if not None, list filled with the checking time of each solution
+#' @param backend either "smt" (bit-vector encoding) or "sat" (propositional encoding 
+#'                solved by the SAT core of Z3, see grn_sat.py): a ValueError is raised
+#'                if an option only available for the "smt" backend (maximize, portfolio,
+#'                incremental, checkTimes, profile, profileFile, deepening, onSolution,
+#'                query) is set with the "sat" backend
+#' @param profile if not None, dictionary filled with the wall time, the number of 
+#'                assertions and the size of the term DAG of each phase of the 
+#'                constraint construction, and with the time of each check 
+#'                (see profiler.py, "smt" backend only)
+#' @param profileFile if not None, path to the JSON file in which the profile is written
+#' @param mergeExperiments boolean: if set to True, experiments which trajectories are
+#'                necessarily the same (same fully known initial state and perturbations, 
+#'                synchronous transitions, no threshold rules) share the same state 
+#'                variables (see mergeSyncExperiments): the states of merged experiments 
+#'                are then named after the first one
+#' @param deepening boolean: if set to True, the trajectory of each experiment is only
+#'                unrolled up to its last observed step (or to its fix point) instead 
+#'                of the maximal length: when threshold regulation conditions are
+#'                allowed, the trajectories which cannot be completed in a model are
+#'                extended one step at a time (see deepen_condition), otherwise a 
+#'                trajectory can always be completed. Not available for uniqueness 
+#'                condition "paths", and for the "sat" backend
+#' @param onSolution if not None, function called on each solution as soon as it is
+#'                found, so that solutions can be processed while the next ones are
+#'                looked for: the returned list then only contains the last solution
+#'                ("smt" backend only)
+#' @param query if not None, function called on the solver once all the constraints
+#'                are built, which returns the solver with additional constraints (see
+#'                predictionQuery in query.py, "smt" backend only)
+#' @param regInt if not None, regulator/interaction dictionaries of the genes
+#'                (see buildInteractionDicts), e.g. read from the cache (see cache.py)
 #' @return resList list of models where Is and Rs are 
 #'                 the instanciated constrained ABN
 #'                 that agree with all the experiments (+ solver)
-def grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint, verbose=False, printSolutions=True, printmain=True, maximize=False):
+def grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint, verbose=False, printSolutions=True, printmain=True, maximize=False, portfolio=0, incremental=False, checkTimes=None, backend="smt", profile=None, profileFile=None, mergeExperiments=False, deepening=False, onSolution=None, query=None, regInt=None):
+    if (mergeExperiments):
+        [E, KO, FE, Fixpoint, merged] = mergeSyncExperiments(C, E, KO, FE, P, R, typeT, Fixpoint)
+        for [name, names] in merged:
+            verboseIt("Experiments " + ", ".join(names) + " share the trajectory of \'" + name + "\'.", printmain)
+    if (backend == "sat"):
+        ## Options which are only available for the "smt" backend ##
+        options = [["maximize", maximize], ["portfolio", portfolio > 1], ["incremental", incremental], 
+            ["checkTimes", checkTimes != None], ["profile", profile != None or profileFile], ["deepening", deepening], 
+            ["onSolution", onSolution != None], ["query", query != None]]
+        unavailable = [name for [name, value] in options if (value)]
+        if (unavailable):
+            raise ValueError("Not available for the \"sat\" backend: " + ", ".join(unavailable))
+        from grn_sat import grn_solver_sat
+        return(grn_solver_sat(C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
+		limreg, P, Fixpoint, verbose=verbose, printSolutions=printSolutions, printmain=printmain, regInt=regInt))
     ## Selected interaction number limit                ##
     interaction_limit = 0
     if (not interaction_limit and Iopt):
@@ -185,6 +282,12 @@ def grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniquene
         solmax = 10
     if (maximize):
 	s = Optimize()
+	## Objectives cannot be shared with the portfolio   ##
+	if (portfolio > 1):
+	    verboseIt("Portfolio mode is not available for maximization.", printmain)
+	    portfolio = 0
+    elif (incremental):
+        s = SolverFor("QF_FD")
     else:
         s = Solver()
     ngenes = len(C)
@@ -219,44 +322,62 @@ def grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniquene
     ## Variables for perturbations                      ##
     ko = [BitVec("ko_%s" % e[0], len(DOWN)) for e in E] if (DOWN) else []
     fe = [BitVec("fe_%s" % e[0], len(UP)) for e in E] if (UP) else []
-    regInt = []
+    if (regInt == None):
+        regInt = buildInteractionDicts(C, Idef, Iopt)
     stateVar = []
-    exp_names = [e[0] for e in E]
+    ## Genes and experiments are looked up by index     ##
+    problem = Problem(C, E, Fixpoint)
+    ## The transition relations are built once, on     ##
+    ## fresh state and perturbation variables, and     ##
+    ## instantiated at each step of each experiment    ##
+    templates = dict()
+    ko_t, fe_t = BitVec("ko_template", ngenes), BitVec("fe_template", ngenes)
+    ## Trajectories are compared in "paths" uniqueness  ##
+    if (deepening and uniqueness == "paths"):
+        verboseIt("Iterative deepening is not available for uniqueness condition \'paths\'.", printmain)
+        deepening = False
+    ## Unrolled trajectory of each experiment           ##
+    tails = []
+    if (profileFile and profile == None):
+        profile = dict()
+    if (profile != None):
+        profile.update(newProfile())
+    ## Identifiers of the terms counted in the profile  ##
+    seen = set()
     t = time()
     #____________________________________________________#
     #  Conditions on regulation functions                #
     #____________________________________________________#
     verboseIt("Conditions on regulation functions", verbose)
+    start = startPhase(profile, s)
     s = regulation_condition(s, Rs, R, ngenes)
+    profile = endPhase(profile, seen, s, "regulation_condition", start)
     #____________________________________________________#
     #  Conditions on perturbations                       #
     #____________________________________________________#
-    s = perturbation_condition(s, KO, ko, exp_names, DOWN, "KO") if (ko and KO) else s
-    s = perturbation_condition(s, FE, fe, exp_names, UP, "FE") if (fe and FE) else s
+    start = startPhase(profile, s)
+    s = perturbation_condition(s, KO, ko, problem.experiments, nameIndex(DOWN), "KO") if (ko and KO) else s
+    s = perturbation_condition(s, FE, fe, problem.experiments, nameIndex(UP), "FE") if (fe and FE) else s
+    profile = endPhase(profile, seen, s, "perturbation_condition", start)
     #____________________________________________________#
     #  Conditions on regulators                          #
     #____________________________________________________#
     verboseIt("Computation of interactions", verbose)
     if (any([len(c) > 0 for c in CRM])):
-	s = crmInteractions_condition(s, Is, Idef, Iopt, CRM, C)
+	start = startPhase(profile, s)
+	s = crmInteractions_condition(s, Is, Idef, Iopt, CRM, problem.genes)
+	profile = endPhase(profile, seen, s, "crmInteractions_condition", start)
     if (Iopt):
+        start = startPhase(profile, s)
         s = interaction_condition(s, interaction_limit, Iopt, Is)
-    for gene in C:
-        idx = C.index(gene)
-        ## Build lists of (indices of)    ##
+        profile = endPhase(profile, seen, s, "interaction_condition", start)
+    start = startPhase(profile, s)
+    for idx, gene in enumerate(C):
+        ## Lists of (indices of)          ##
         ## activators and                 ##
         ## repressors for input gene      ##
-        ## For interaction edges in Iopt  ##
-        ## Keep track of the regulatory   ##
-        ## interactions for the gene      ##
-        regIntActivators, regIntRepressors = None, None
-        if (Iopt):
-            [regIntActivators, regIntRepressors] = buildInteractionDict(Iopt, gene, C, opt=True)
-        ## For interaction edges in Idef  ##
-        if (Idef):
-            [regIntActivators, regIntRepressors] = buildInteractionDict(Idef, gene, C, 
-            regIntActivators=regIntActivators, regIntRepressors=regIntRepressors)
-        regInt.append([regIntActivators, regIntRepressors])
+        ## (see buildInteractionDicts)    ##
+        [regIntActivators, regIntRepressors] = regInt[idx]
         ## Potential regulator is a       ##
         ## regulator iff. the interaction ##
         ## where it is involved is        ##
@@ -271,77 +392,122 @@ def grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniquene
             + str(regInt[i]) + "; " for i in regInt.keys()]
         verboseIt(strList2Str(regulatorList("ACTIVATORS", regIntActivators)), verbose)
         verboseIt(strList2Str(regulatorList("REPRESSORS", regIntRepressors)), verbose)
+    profile = endPhase(profile, seen, s, "regulators_condition", start)
     verboseIt("Computation of GRFs", verbose)
-    prepreComputation = [prepreCompute(regulators[ci][0], regulators[ci][1]) for ci in range(len(C))]
+    start = startPhase(profile, s)
+    ## The transition condition of a gene ##
+    ## only depends on the coordinates of ##
+    ## its potential regulators           ##
+    slices = [regulatorSlice(ci, regInt[ci], ngenes) for ci in range(len(C))]
+    slicedRegulators = [[sliceBV(a, slices[ci]), sliceBV(r, slices[ci])] for ci, [a, r] in enumerate(regulators)]
+    prepreComputation = [prepreCompute(slicedRegulators[ci][0], slicedRegulators[ci][1]) for ci in range(len(C))]
+    profile = endPhase(profile, seen, s, "prepreCompute", start)
     #____________________________________________________#
     #  Conditions on experiments                         #
     #____________________________________________________#
     verboseIt("Conditions on experiments", verbose)
-    for exp in E:
+    for e, exp in enumerate(E):
         verboseIt("--------- EXPERIMENT \'" + exp[0] + "\'", verbose=printmain)
-        ## State variables                  ##
-        q = [BitVec(getState(n, exp[0]), ngenes) for n in range(length+1)]
-        stateVar += q
+	## Finds the starting step point    ##
+	## for fix point                    ##
+	sstep = problem.fixpoints.get(exp[0])
+        ## State variables (the steps after ##
+        ## the fix point share one state)   ##
+        depth = experimentDepth(exp, sstep, length) if (deepening) else length
+        q = [BitVec(getState(stateStep(n, sstep), exp[0]), ngenes) for n in range(depth+1)]
+        stateVar.append(q)
         ## Adding KO and FE constraints     ## 
+        start = startPhase(profile, s)
         if (KO and FE and ko and fe):
-            [ko_e, s] = pert2full(s, ko[exp_names.index(exp[0])], chiDOWN, "ko_" + exp[0] + "_f", ngenes)
-            [fe_e, s] = pert2full(s, fe[exp_names.index(exp[0])], chiUP, "fe_" + exp[0] + "_f", ngenes)
-            res = lambda x : (x & ~ko_e) | fe_e
+            [ko_e, s] = pert2full(s, ko[problem.experiments[exp[0]]], chiDOWN, "ko_" + exp[0] + "_f", ngenes)
+            [fe_e, s] = pert2full(s, fe[problem.experiments[exp[0]]], chiUP, "fe_" + exp[0] + "_f", ngenes)
+            res = lambda x, g : (x & ~extract1BV(ko_t, g)) | extract1BV(fe_t, g)
+            subst = [(ko_t, ko_e), (fe_t, fe_e)]
         elif (KO and ko):
-            [ko_e, s] = pert2full(s, ko[exp_names.index(exp[0])], chiDOWN, "ko_" + exp[0] + "_f", ngenes)
-            res = lambda x : x & ~ko_e
+            [ko_e, s] = pert2full(s, ko[problem.experiments[exp[0]]], chiDOWN, "ko_" + exp[0] + "_f", ngenes)
+            res = lambda x, g : x & ~extract1BV(ko_t, g)
+            subst = [(ko_t, ko_e)]
         elif (FE and fe):
-            [fe_e, s] = pert2full(s, fe[exp_names.index(exp[0])], chiUP, "fe_" + exp[0] + "_f", ngenes)
-            res = lambda x : x | fe_e
+            [fe_e, s] = pert2full(s, fe[problem.experiments[exp[0]]], chiUP, "fe_" + exp[0] + "_f", ngenes)
+            res = lambda x, g : x | extract1BV(fe_t, g)
+            subst = [(fe_t, fe_e)]
         else:
-            res = lambda x : x
+            res = lambda x, g : x
+            subst = []
+        profile = endPhase(profile, seen, s, "pert2full", start, experiment=exp[0])
         #____________________________________#
         ## States must define a trajectory  ##
         ## in the search space              ##
         #____________________________________#
-	existsFixpoint = filter(lambda x : x[1] == exp[0], Fixpoint)
-	## Finds the starting step point    ##
-	## for fix point                    ##
-	if (existsFixpoint):
-		sstep = existsFixpoint[0][0]
-	else:
-		sstep = None
 	## Enforces constraint for all i,   ##
 	## 0 <= i < sstep, T(q[i],q[i+1])   ##
-	s = to_next_state(s, exp[0], prepreComputation, 0, ifthenelse(sstep == None, length, sstep), q, typeT, length, regulators, ngenes, R, Rs, res, verbose)
+	start = startPhase(profile, s)
+	s = to_next_state(s, exp[0], prepreComputation, 0, ifthenelse(sstep == None, depth, sstep), q, typeT, length, slicedRegulators, slices, ngenes, R, Rs, res, verbose, templates=templates, subst=subst)
+	profile = endPhase(profile, seen, s, "to_next_state", start, experiment=exp[0])
         ## Fixpoint constraint              ##
-	## for all i, sstep <= i <= length  ##
-	## T(q[i], q[i+1]) (synchronous) and##
-	## q[i] = q[i+1]                    ##
-        s = fixpoint_condition(s, exp[0], prepreComputation, ifthenelse(sstep==None, length+1, sstep), q, typeT, length, regulators, ngenes, R, Rs, res, verbose)
+	## q[sstep] = ... = q[length] is one##
+	## state, with T(q[sstep], q[sstep])##
+	## (synchronous)                    ##
+        start = startPhase(profile, s)
+        s = fixpoint_condition(s, exp[0], prepreComputation, ifthenelse(sstep==None, length+1, sstep), q, typeT, length, slicedRegulators, slices, ngenes, R, Rs, res, verbose, templates=templates, subst=subst)
+        profile = endPhase(profile, seen, s, "fixpoint_condition", start, experiment=exp[0])
         #____________________________________#
         ## Experiment values should be      ##
         ## satisfied                        ##
         #____________________________________#
         ## For each observation in e        ##
         ## ee = { n, gene, value }          ##
-        for [n, gene, value] in exp[1]:
+        start = startPhase(profile, s)
+        for [_, n, g, value] in problem.experimentObservations(e).tolist():
             verboseIt("Experiment=\'" + exp[0] + "\', Step="
-                + str(n) + ": grf(" + gene + ")=" + str(value), verbose)
-            s = experiment_condition(s, q, n, C, gene, value)
+                + str(n) + ": grf(" + C[g] + ")=" + str(value), verbose)
+            s = experiment_condition(s, q, n, g, value)
+        profile = endPhase(profile, seen, s, "experiment_condition", start, experiment=exp[0])
+        tails.append([exp[0], q, res, subst])
     #____________________________________#
     ## Solution processing              ##
     #____________________________________#
+    if (profile != None):
+        profile["encoding_time"] = time()-t-profile["profiling_time"]
+    ## Without threshold regulation conditions, there   ##
+    ## is always a next state: the unrolled trajectories##
+    ## can always be completed                          ##
+    if (query != None):
+        s = query(s)
+    ## Scope of the uniqueness conditions               ##
+    if (incremental):
+        s.push()
+    ## Pool of the portfolio, shared by all the checks  ##
+    pool = startPortfolio(portfolio) if (portfolio > 1) else None
+    def finish(resList, s):
+        if (profileFile):
+            dumpProfile(profile, profileFile)
+        if (incremental):
+            s.pop()
+        stopPortfolio(pool)
+        return([resList, s, regInt])
+    deepen = None
+    if (deepening and any([any([i >= 18 for i in r]) for r in R])):
+        sc = dict()
+        deepen = lambda s, M : deepen_condition(s, M, sc, tails, length, [prepreComputation, typeT, 
+            slicedRegulators, slices, ngenes, R, Rs, verbose, templates])
     [resList, t, s, res] = getSolution(C, length, Iopt, ngenes, t, s, intVar, 
-        regVar, stateVar, regulators, chiDOWN, chiUP, R, uniqueness, verbose, 
-		resList=[], stopSol=(solmax==1), printSolutions=printSolutions)
+        regVar, stateVar, [exp[0] for exp in E], regulators, chiDOWN, chiUP, R, uniqueness, verbose, 
+		resList=[], stopSol=(solmax==1), printSolutions=printSolutions, portfolio=pool, 
+		checkTimes=checkTimes, profile=profile, deepen=deepen, onSolution=onSolution)
     if (not len(resList)):
-        return([resList, s, regInt])
+        return(finish(resList, s))
     sol = 2
     while (sol <= solmax and not res):
         [resList, t, s, res] = getSolution(C, length, Iopt, ngenes, t, s, intVar, 
-        	regVar, stateVar, regulators, chiDOWN, chiUP, R, uniqueness, 
-			verbose, resList=resList, solNB=sol, stopSol=(solmax == sol), printSolutions=printSolutions)
+        	regVar, stateVar, [exp[0] for exp in E], regulators, chiDOWN, chiUP, R, uniqueness, 
+			verbose, resList=resList, solNB=sol, stopSol=(solmax == sol), printSolutions=printSolutions, portfolio=pool, 
+		checkTimes=checkTimes, profile=profile, deepen=deepen, onSolution=onSolution)
         if (res):
-            return([resList, s, regInt])
+            return(finish(resList, s))
         sol += 1
     if (sol == solmax+1):
 	verboseIt("Maximum number of solutions reached.\n", printSolutions)
     if (sol > 0):
 	verboseIt("There are solutions.\n", printSolutions)
-    return([resList, s, regInt])
+    return(finish(resList, s))
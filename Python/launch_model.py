@@ -1,8 +1,9 @@
 # -*- coding: utf-8 -*-
 
 from grn_solver import grn_solver
-from grn_inference import getState
+from grn_inference import getState, knownPerturbations
 from utils import rev, verboseIt, ifthenelse
+from problem import nameIndex
 from copy import deepcopy
  
 ##############################################
@@ -70,7 +71,8 @@ def model2igraph(modelID, resList, C, Idef1, Iopt1, P, model="", addGRF=True, pl
     for i in range(len(Iopt)):
         if (int(Is[i])==1):
             I.append(Iopt[i])
-    edges = [[C.index(y) for y in x[:2]] for x in I]
+    genes = nameIndex(C)
+    edges = [[genes[y] for y in x[:2]] for x in I]
     verboseIt("Edges: " + str([[C[i] for i in e] for e in edges]), verbose)
     elabels = [x[2] for x in I]
     verboseIt("Edge signs: " + str(elabels), verbose)
@@ -139,10 +141,24 @@ def model2igraph(modelID, resList, C, Idef1, Iopt1, P, model="", addGRF=True, pl
 #' @param solmax maximum number of trajectories to return
 #' @param steadyStates boolean for obtaining the steady states
 #' @param verbose boolean for having comments
+#' @param simulator boolean: if set to True, deterministic trajectories (synchronous
+#'                  transitions, no threshold regulation condition, fully specified
+#'                  initial state and perturbations) are computed by the simulator of
+#'                  simulator.py instead of the solver
 #' @return trajectories a list of lists of pairs (state x string character) 
 #'                     (the string character elements are ordered according to the order in C)
 def launch_model(modelID, C, CRM, resList, Idef, Iopt, R, q0, nstep, typeT, KO, FE, P, 
-		solmax=10, steadyStates=False, verbose=False):
+		solmax=10, steadyStates=False, verbose=False, simulator=True):
+	return(list(iter_model(modelID, C, CRM, resList, Idef, Iopt, R, q0, nstep, typeT, KO, FE, P, 
+		solmax=solmax, steadyStates=steadyStates, verbose=verbose, simulator=simulator)))
+
+#' Generate the trajectories of launch_model one at a time, as soon as
+#' they are found by the solver (or the simulator), without keeping them
+#'
+#' See launch_model for the parameters
+#' @return trajectories generator of pairs ("Trajectory #k", trajectory)
+def iter_model(modelID, C, CRM, resList, Idef, Iopt, R, q0, nstep, typeT, KO, FE, P, 
+		solmax=10, steadyStates=False, verbose=False, simulator=True):
 	resList = resList[modelID]
 	## Computing the whole set of interactions I for the given model ##
 	Is = resList[0][1]
@@ -153,29 +169,189 @@ def launch_model(modelID, C, CRM, resList, Idef, Iopt, R, q0, nstep, typeT, KO,
 			I.append(Iopt[i])
 	## Building the constraints for the initial state                ##
 	exp_name = "Experiment"
-	if (str(type(q0)) == "<type 'str'>"):
+	if (isinstance(q0, str)):
 		E = [[exp_name, [[0, C[i], int(q0[i])] for i in range(len(C))]]]
 	else:
 		E = [[exp_name, [[0, x[1], int(x[2])] for x in q0]]]
 	Fixpoint = ifthenelse(steadyStates, [[nstep, exp_name]], [])
-	grfsres = [str(x[0]) for x in resList]
-	R = [[resList[grfsres.index("grf_" + c)][1]] for c in C]
+	grfsres = nameIndex([str(x[0]) for x in resList])
+	R = [[resList[grfsres["grf_" + c]][1]] for c in C]
 	KO = [[exp_name, x[1]] for x in KO]
 	FE = [[exp_name, x[1]] for x in FE]
+	if (simulator):
+		trajectory = simulate_model(C, I, [r[0] for r in R], E, typeT, KO, FE, P, nstep, steadyStates)
+		if (trajectory != None):
+			verboseIt("Deterministic trajectory computed by the simulator", verbose)
+			if (trajectory):
+				yield(["Trajectory #1", trajectory])
+			return
 	## Get solmax trajectories from the given initial state          ##
-	res = grn_solver(C, CRM, nstep, I, [], R, E, typeT, solmax, KO, FE, "paths", "", P, Fixpoint, 
-			verbose=verbose, printSolutions=verbose, printmain=verbose)
-	try:
-		[resList, _, _] = res
-	except:
-		verboseIt("No model has been returned", verbose=True)
-		return(res)
-	trajectories = []
-	for k in range(len(resList)):
-		res = resList[k]
-		statesnames = [getState(i, "Experiment") for i in range(nstep+1)]
+	statesnames = [getState(i, "Experiment") for i in range(nstep+1)]
+	def getTrajectory(res):
 		resnames = [str(x[0]) for x in res]
-		statesIDX = [resnames.index(sn) for sn in statesnames]
-		trajectory = [[resnames[i], rev(res[i][1])] for i in statesIDX]
-		trajectories.append(["Trajectory #" + str(k+1), trajectory])
-	return(trajectories)
+		index = nameIndex(resnames)
+		statesIDX = [index[sn] for sn in statesnames]
+		return([[resnames[i], rev(res[i][1])] for i in statesIDX])
+	solve = lambda onSolution : grn_solver(C, CRM, nstep, I, [], R, E, typeT, solmax, KO, FE, "paths", "", P, 
+			Fixpoint, verbose=verbose, printSolutions=verbose, printmain=verbose, onSolution=onSolution)
+	k = 0
+	for trajectory in iter_solutions(solve, getTrajectory):
+		k += 1
+		yield(["Trajectory #" + str(k), trajectory])
+
+#' Run a solver call in a separate thread, and generate its solutions
+#' as soon as they are found: the solver thread waits for each solution
+#' to be consumed before looking for the next one
+#'
+#' @param solve function solve(onSolution) calling the solver (see the
+#'              argument onSolution of grn_solver)
+#' @param convert function applied to each solution in the solver thread,
+#'                which should return values independent from the solver
+#' @return solutions generator of converted solutions: if it is closed before
+#'                   all solutions are consumed, the solver call is aborted as
+#'                   soon as the next solution is found
+def iter_solutions(solve, convert):
+	from threading import Thread
+	from Queue import Queue, Empty
+	queue = Queue(1)
+	done, stop = [], []
+	def onSolution(solution):
+		if (stop):
+			raise RuntimeError("Solutions are not consumed anymore")
+		queue.put([None, convert(solution)])
+	def worker():
+		try:
+			solve(onSolution)
+			queue.put([done, None])
+		except Exception as e:
+			queue.put([e, None])
+	thread = Thread(target=worker)
+	thread.daemon = True
+	thread.start()
+	try:
+		while (True):
+			[flag, x] = queue.get()
+			if (flag is done):
+				break
+			if (flag != None):
+				raise flag
+			yield(x)
+	finally:
+		## Unblocks the solver thread until it stops ##
+		stop.append(True)
+		while (thread.is_alive()):
+			try:
+				queue.get(timeout=0.1)
+			except Empty:
+				pass
+		thread.join()
+
+#' Compile conditions on the genes into bit masks and values: the 
+#' states are packed in 64-bit words (gene g in bit g%64 of word g/64)
+#'
+#' @param C the list of nodes in the model
+#' @param conditions list of (condition name x list of (_ x gene x value)) pairs
+#'                   (as in the conditions returned by getConditionsExp)
+#' @return compiled list [names, masks, values] where masks and values are arrays
+#'                  (number of conditions x number of words): a packed state x satisfies
+#'                  condition k iff x & masks[k] == values[k]
+def compile_conditions(C, conditions):
+	import numpy as np
+	nwords = (len(C)+63)//64
+	genes = nameIndex(C)
+	masks = np.zeros((len(conditions), nwords), dtype=np.uint64)
+	values = np.zeros((len(conditions), nwords), dtype=np.uint64)
+	for k in range(len(conditions)):
+		for x in conditions[k][1]:
+			g = genes[x[1]]
+			masks[k, g//64] |= np.uint64(1 << (g%64))
+			values[k, g//64] |= np.uint64(int(x[2]) << (g%64))
+	return([[c[0] for c in conditions], masks, values])
+
+#' Check compiled conditions on all steps of all trajectories at once
+#'
+#' @param trajectories list of pairs (name x trajectory) of the same length (see launch_model)
+#' @param C the list of nodes in the model
+#' @param compiled compiled conditions (see compile_conditions)
+#' @return hits Boolean array (number of trajectories x number of conditions x number of steps)
+#'              of the steps where each condition holds in each trajectory
+def condition_hits(trajectories, C, compiled):
+	import numpy as np
+	[_, masks, values] = compiled
+	if (not trajectories):
+		return(np.zeros((0, len(masks), 0), dtype=bool))
+	nsteps = len(trajectories[0][1])
+	states = "".join(["".join(state) for [_, trajectory] in trajectories for [_, state] in trajectory])
+	states = (np.frombuffer(states, dtype=np.uint8) == ord("1")).reshape((len(trajectories), nsteps, len(C)))
+	packed = np.zeros(states.shape[:2] + (masks.shape[1],), dtype=np.uint64)
+	for g in range(len(C)):
+		packed[:, :, g//64] |= states[:, :, g].astype(np.uint64) << np.uint64(g%64)
+	return(((packed[:, None, :, :] & masks[None, :, None, :]) == values[None, :, None, :]).all(axis=3))
+
+#' Write trajectories in JSON lines format (one line per trajectory),
+#' as they are generated
+#'
+#' @param trajectories iterable of pairs (name x trajectory) (see launch_model)
+#' @param f file object
+#' @param C the list of nodes in the model
+#' @param conditions list of (condition name x list of (_ x gene x value)) pairs:
+#'                   the steps where each condition holds are written in the record
+#' @return n number of written trajectories
+def write_trajectories(trajectories, f, C, conditions=[]):
+	import json
+	compiled = compile_conditions(C, conditions)
+	n = 0
+	for [name, trajectory] in trajectories:
+		states = ["".join(state) for [_, state] in trajectory]
+		record = {"trajectory": name, "states": states}
+		if (conditions):
+			hits = condition_hits([[name, trajectory]], C, compiled)[0]
+			record["conditions"] = dict([[compiled[0][k], [int(j) for j in hits[k].nonzero()[0]]]
+				for k in range(len(conditions))])
+		f.write(json.dumps(record, sort_keys=True) + "\n")
+		f.flush()
+		n += 1
+	return(n)
+
+#' Compute the trajectory of a model with the simulator when it is
+#' deterministic: synchronous transitions, no threshold regulation condition,
+#' fully specified initial state and fully known (applied) perturbations
+#'
+#' @param C the list of nodes in the model
+#' @param I the list of interactions of the model
+#' @param grfs the list of regulation conditions of the model for each node
+#' @param E the experiment (see launch_model) with the initial state
+#' @param typeT type of transition
+#' @param KO list of KO experiments
+#' @param FE list of FE experiments
+#' @param P list of possible perturbations for every gene
+#' @param nstep number of steps to perform
+#' @param steadyStates boolean: the last state must be a steady state
+#' @return trajectory None if the trajectory is not deterministic, else
+#'                    list of pairs (state x string character) as in launch_model
+#'                    (empty list if the last state is not a steady state)
+def simulate_model(C, I, grfs, E, typeT, KO, FE, P, nstep, steadyStates):
+	[exp_name, obs] = E[0]
+	initial = dict([[gene, value] for [_, gene, value] in obs])
+	if (typeT != "synchronous" or len(initial) != len(C) or len(obs) != len(C)):
+		return(None)
+	grfs = [int(grf) for grf in grfs]
+	## Perturbations are applied as in grn_solver ##
+	perturbations = []
+	for [SETP, typeP, sign] in [[KO, "KO", "-"], [FE, "FE", "+"]]:
+		genes = [C[i] for i in range(len(C)) if (sign in P[i])]
+		values = dict(knownPerturbations(SETP, typeP, genes, exp_name) or []) if (SETP and genes) else dict()
+		if (SETP and genes and not values):
+			return(None)
+		perturbations.append([values.get(c, 0) == 1 for c in C])
+	import numpy as np
+	from simulator import deterministic, buildNetwork, simulate, isSteadyState
+	if (not deterministic(grfs)):
+		return(None)
+	network = buildNetwork(C, I, grfs)
+	[ko, fe] = [np.array(x, dtype=bool) for x in perturbations]
+	Q0 = np.array([[initial.get(c) == 1 for c in C]], dtype=bool)
+	states = simulate(network, Q0, nstep, ko=ko, fe=fe)
+	if (steadyStates and not isSteadyState(network, states[-1], ko=ko, fe=fe)[0]):
+		return([])
+	return([[getState(i, exp_name), [str(int(x)) for x in states[i][0]]] for i in range(nstep+1)])
@@ -1,40 +1,86 @@
 # -*- coding: utf-8 -*-
 
+import re
+from codecs import BOM_UTF8
 from global_paths import *
 
 ##########################
 ## Read full REIN file  ##
 ##########################
 
+## RE:IN files are sequences of statements ended by ";" (which    ##
+## may span several lines), and comments starting with "//": both  ##
+## files are streamed line by line, and each statement is parsed   ##
+## once by the regular expressions below                           ##
+
+## Directive: "directive name value"                                      ##
+DIRECTIVE = re.compile(r"directive\s+(\w+)\s+(\S+)$")
+## Node: "name[perturbations]{regulated gene}(regulation conditions)"     ##
+NODE = re.compile(r"([^\s\[\]]+)\[([-+]*)\](?:\{([^{}]*)\})?\(([^()]*)\)$")
+## Definition: "$name := {gene = value and ...}"                          ##
+DEFINITION = re.compile(r"\$([^\s:]+)\s*:=\s*\{(.*)\}$", re.DOTALL)
+## Assignment in a definition: "gene = value"                             ##
+ASSIGNMENT = re.compile(r"([^\s=]+)\s*=\s*(\d+)$")
+## Observation "#exp[step] |= $name" (with an optional description)    ##
+## or fix point "fixpoint(#exp[step])", followed by "and" or the end    ##
+## of the statement                                                      ##
+TERM = re.compile(r"""\s*(?:#([^\s\[\]]+)\[\s*(\d+)\s*\]\s*\|=\s*\$([^\s";]+)(?:\s*"[^"]*")?"""
+	+ r"""|fixpoint\(\s*#([^\s\[\]]+)\[\s*(\d+)\s*\]\s*\))\s*(?:and\b\s*|$)""")
+
 #________________#
 #   Tools        #
 #________________#
 
-#' Get directive markers in RE:IN file
+#' Stream the statements of a RE:IN file
 #'
-#' @param f Python file object associated with RE:IN file
-#' @return res list of directives (with conversion to integer if possible)
-def getDirective(f):
-	x = f.readline().split(";")[0].split(" ")[2]
+#' @param f Python file object associated with RE:IN file (or any iterable of lines)
+#' @return res generator of the statements (without comments, ";" and surrounding
+#'             white spaces) in the order of the file
+def readStatements(f):
+	parts = []
+	for line in f:
+		if (line.startswith(BOM_UTF8)):
+			line = line[len(BOM_UTF8):]
+		line = line.split("//")[0].split(";")
+		for part in line[:-1]:
+			parts.append(part)
+			statement = "".join(parts).strip()
+			parts = []
+			if (statement):
+				yield(statement)
+		parts.append(line[-1])
+	statement = "".join(parts).strip()
+	if (statement):
+		yield(statement)
+
+#' Convert a directive value into an integer if possible
+#'
+#' @param x character string
+#' @return res integer or character string
+def getDirective(x):
 	try:
 		return(int(x))
 	except:
 		return(x)
 
-## Convert a well-formatted string into a list of integers                ##
-getRegularList = lambda r : map(int, r.split(","))
-## Convert a well-formatted string into a list of integers                ##
-getRange = lambda l : range(int(l[0]), int(l[1])+1)
+#' Parse regulation conditions such as "1,3,5" or "0..8" (or a mix of both)
+#'
+#' @param x character string
+#' @return res list of integers
+def getRegulation(x):
+	res = []
+	for r in x.split(","):
+		l = r.split("..")
+		if (len(l) == 1):
+			res.append(int(r))
+		else:
+			res += range(int(l[0]), int(l[1])+1)
+	return(res)
+
 ## Convert a well-formatted string into string x string x "+" or "-"      ##
 getInteraction = lambda x : x[:2] + ["+" if (x[2]=="positive") else "-"]
-## Implement custom grep                                                  ##
-grep = lambda x, pattern : len(x.split(pattern)) > 1
-## Sanitize strings using starting and ending characters                  ##
-getIt = lambda x, b, e : reduce(lambda a, b : a + b, x.split(b)[1].split(e)[0].split(" "))
 ## Append an integer n to each list element of a list x                   ##
 updateStep = lambda x, n : [[n]+v[1:] for v in x]
-## Sanitize strings using pattern                                         ##
-splitNclean = lambda x, pattern : filter(lambda x : x != "", x.split(pattern))
 
 #________________#
 #   Model        #
@@ -59,39 +105,26 @@ splitNclean = lambda x, pattern : filter(lambda x : x != "", x.split(pattern))
 #' - limreg (not used) limitation on the set of regulation conditions used
 #' - P set of known perturbations for each node
 def getModel(f, verbose):
-	## Parameters      ##
-	typeT = getDirective(f) + "hronous"
-	length, uniqueness, solmax, limreg = [getDirective(f) for i in range(4)]
-	x = [v.split("[") for v in f.readline().split("; ")][:-1]
-	## Genes           ##
-	C = [r[0] for r in x]
-	P = [list(r[1].split("]")[0]) for r in x]
-	CRM = [getIt(r[1], "]{", "}") for r in x]
-	RR = [getIt(r[1], "}(", ")") for r in x]
-	## Regulation      ##
-	R = []
-	for r in RR:
-		l = r.split("..")
-		if (len(l) == 1):
-			R.append(getRegularList(r))
-		else:
-			ll = r.split(",")
-			if (len(ll) == 1):
-				R.append(getRange(l))
-			else:
-				rls = []
-				for rl in ll:
-					rll = rl.split("..")
-					if (len(rll) == 1):
-						rls.append(int(rl))
-					else:
-						rls += getRange(rll)
-				R.append(rls)
-	## Interactions    ##
-	x = f.readline()
+	directives = {"updates": "sync", "length": 20, "uniqueness": "interactions", "limit": 1, "regulation": "default"}
+	C, CRM, R, P = [], [], [], []
 	Idef, Iopt = [], []
-	while (x):
-		x = x.split(";")[0].split("\t")
+	for statement in readStatements(f):
+		## Parameters      ##
+		m = DIRECTIVE.match(statement)
+		if (m):
+			directives[m.group(1)] = getDirective(m.group(2))
+			continue
+		## Genes           ##
+		m = NODE.match(statement)
+		if (m):
+			C.append(m.group(1))
+			P.append(list(m.group(2)))
+			CRM.append("".join((m.group(3) or "").split()))
+			## Regulation      ##
+			R.append(getRegulation("".join(m.group(4).split())))
+			continue
+		## Interactions    ##
+		x = [v.strip() for v in statement.split("\t")]
 		if (len(x) == 4):
 			Iopt.append(getInteraction(x))
 		elif (len(x) == 3):
@@ -99,8 +132,10 @@ def getModel(f, verbose):
 		else:
 			print("ERROR PARSING: length(interaction) = " + str(len(x)) + " != 3, 4.")
 			return(None)
-		x = f.readline()
-	## Debugging            ##
+	typeT = directives["updates"] + "hronous"
+	length, uniqueness = directives["length"], directives["uniqueness"]
+	solmax, limreg = directives["limit"], directives["regulation"]
+	## Debugging            ##
 	if (verbose):
 		print("---- MODEL       ----")
 		for k, v in {"C": C, "length": length, "Idef": Idef, "Iopt": Iopt, "R": R, 
@@ -115,7 +150,8 @@ def getModel(f, verbose):
 
 #' Parse experimental conditions
 #' 
-#' @param x string associated with RE:IN experiments file
+#' @param f Python file object associated with RE:IN experiments file
+#'        (or any iterable of lines)
 #' @return res list [Fixpoint, summary, condexp]
 #' - Fixpoint is a list that contains the step of a fix point, 
 #' and the associated experimental condition
@@ -123,42 +159,36 @@ def getModel(f, verbose):
 #' in each experiment
 #' - condexp is a dictionary with keys: condition names, values: list of (node name, value)
 #' in the associated condition
-def readConditions(x):
+def readConditions(f):
 	Fixpoint = []
 	summary = []
 	condexp = dict()
-	for line in x:
-		line = splitNclean(line, "\r\n")
-		m = len(line)
+	for statement in readStatements(f):
+		## Condition definition  ##
+		if (statement.startswith("$")):
+			m = DEFINITION.match(statement)
+			if (not m):
+				raise ValueError("Cannot parse definition: " + statement)
+			value = []
+			for e in re.split(r"\s+and\s+", m.group(2).strip()):
+				a = ASSIGNMENT.match(e)
+				if (not a):
+					raise ValueError("Cannot parse condition \"" + e + "\" in definition: " + statement)
+				value.append([0, a.group(1), int(a.group(2))])
+			condexp.setdefault(m.group(1), value)
+			continue
+		## Conjunction of experiment and fix point definitions ##
 		i = 0
-		while (i < m):
-			sub = line[i]
-			## Experiment definition ##
-			if (grep(sub, "|=")):
-				sb = sub.split("|=")
-				n = int(getIt(sb[0], "[", "]"))
-				exp = getIt(sb[0], "#", "[")
-				expr = getIt(sb[1], "$", " ")
-				summary.append([n, exp, expr])
-			## Condition definition  ##
-			if (grep(sub, ":=")):
-				if (i < m-1):
-					sb = reduce(lambda x, y : x + y, line[i:])
-				else:
-					sb = sub
-				li = getIt(sb, "$", ";").split(":=")
-				key = li[0]
-				value = getIt(li[1], "{", "}").split("and")			
-				value = [e.split("=") for e in value]
-				value = [[0]+[e[0], int(e[1])] for e in value]
-				condexp.setdefault(key, value)
-			## Fixpoint definition   ##
-			if (grep(sub, "fixpoint")):
-				n = int(getIt(sub, "[", "]"))
-				exp = getIt(sb[0], "#", "[")
-				Fixpoint.append([n, exp])
-			## Other: comments       ##		
-			i += 1
+		while (i < len(statement)):
+			m = TERM.match(statement, i)
+			if (not m or m.end() == i):
+				raise ValueError("Cannot parse statement: " + statement)
+			[exp, n, expr, fexp, fn] = m.groups()
+			if (exp):
+				summary.append([int(n), exp, expr])
+			else:
+				Fixpoint.append([int(fn), fexp])
+			i = m.end()
 	return([Fixpoint, summary, condexp])
 
 #' Parse RE:IN experiments file
@@ -174,13 +204,10 @@ def readConditions(x):
 #' - FE is a set describing FE perturbations
 #' - Fixpoint is a set describing fix point/steady state constraints
 def getExperiments(f, C, length, verbose):
-	x = splitNclean(f.read(), ";")
-	## Remove last empty line ##
-	y = [splitNclean(v, "\r\n") for v in x][:-1]
 	E = []
 	KO = []
 	FE = []
-	[Fixpoint, summary, condexp] = readConditions(x)
+	[Fixpoint, summary, condexp] = readConditions(f)
 	cond = None
 	stack = []
 	e = None
@@ -190,9 +217,7 @@ def getExperiments(f, C, length, verbose):
 		if (exp != e):
 			## Empty stack          ##
 			## If no condition seen ##
-			if (stack):
-				ee += reduce(lambda x, y : x + y, [ex for ex in stack])
-				stack = []
+			ee += stack
 			## Push previous exp. ##
 			if (ee and e):
 				E.append([e, ee])
@@ -202,33 +227,30 @@ def getExperiments(f, C, length, verbose):
 			e = exp
 			ee = []
 		## Knock Down expression ##
-		if (grep(expr, "KnockDown")):
+		if ("KnockDown" in expr):
 			KO.append([exp, condexp.get(expr)])
 			continue
-		## Over Expression expr. ##
-		if (grep(expr, "OverExpression")):
+		## Over Expression expr. ##
+		if ("OverExpression" in expr):
 			FE.append([exp, condexp.get(expr)])
 			continue
-		## Condition expression  ##
-		if (grep(expr, "Conditions")):
+		## Condition expression  ##
+		if ("Conditions" in expr):
 			cond = condexp.get(expr)
 		else:
 			if (cond):
 				ee += updateStep(condexp.get(expr), n)
 				ee += updateStep(cond, n)
-				if (stack):
-					ee += reduce(lambda x, y : x + y, [ex for ex in stack])
-					stack = []
+				ee += stack
+				stack = []
 			else:
-				stack.append(updateStep(condexp.get(expr), n))
+				stack += updateStep(condexp.get(expr), n)
 	## Empty stack          ##
 	## If no condition seen ##
-	if (stack):
-		ee += reduce(lambda x, y : x + y, [ex for ex in stack])
-		stack = []
+	ee += stack
 	if (ee and e):
 		E.append([e, ee])
-	## Debugging            ##
+	## Debugging            ##
 	if (verbose):
 		print("---- EXPERIMENTS ----")
 		print("No. of experiments: " + str(len(E)))
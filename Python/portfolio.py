@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+from z3 import *
+from multiprocessing import Pool, Value
+from threading import Thread
+from time import sleep
+
+##############################################
+## PORTFOLIO SOLVING                        ##
+##############################################
+
+## Solver configurations raced against each other: each   ##
+## configuration is [name, tactic (or None for the default ##
+## solver), logic (or None)]; they are cycled through with ##
+## a different random seed for each worker. The parameters ##
+## are set on each solver (and not globally), as a worker  ##
+## process may be reused for another job                   ##
+configurations = [
+	["default", None, None],
+	["qfbv", None, "QF_BV"],
+	["bit-blast", ["simplify", "propagate-values", "solve-eqs", "bit-blast", "sat"], None],
+	["smt-random-phase", None, None],
+]
+
+#' Build a solver according to a portfolio configuration
+#'
+#' @param config configuration [name, tactic, logic] (see @configurations)
+#' @param seed random seed for the solver
+#' @param ctx Z3 context in which the solver should be built
+#' @return s solver
+def buildPortfolioSolver(config, seed, ctx):
+	[name, tactic, logic] = config
+	if (tactic):
+		tactics = [Tactic(t, ctx=ctx) for t in tactic[:-1]] + [With(Tactic(tactic[-1], ctx=ctx), random_seed=seed)]
+		return(Then(*tactics, ctx=ctx).solver())
+	s = SolverFor(logic, ctx=ctx) if (logic) else Solver(ctx=ctx)
+	s.set("random_seed", seed)
+	if (name == "smt-random-phase"):
+		s.set("phase_selection", 5)
+	return(s)
+
+## The process pool is created once for all the checks of  ##
+## an enumeration: the workers cannot be terminated once an  ##
+## answer is found, so the number of the last answered check ##
+## is shared with them, and the losing solvers interrupt     ##
+## themselves as soon as their check has been answered       ##
+
+#' Start a portfolio of solvers
+#'
+#' @param nworkers number of solvers to race (in a process pool)
+#' @return portfolio list [pool, answered, nworkers] where answered is
+#' the number of the last answered check (shared with the workers)
+def startPortfolio(nworkers):
+	answered = Value("i", 0)
+	pool = Pool(nworkers, initializer=initWorker, initargs=(answered,))
+	return([pool, answered, nworkers])
+
+#' Stop a portfolio of solvers
+#'
+#' @param portfolio portfolio (see startPortfolio) or None
+#' @return None
+def stopPortfolio(portfolio):
+	if (portfolio != None):
+		pool = portfolio[0]
+		pool.terminate()
+		pool.join()
+	return(None)
+
+#' Store the number of the last answered check in a worker process
+#'
+#' @param answered shared number of the last answered check
+#' @return None
+def initWorker(answered):
+	global lastAnswered
+	lastAnswered = answered
+	return(None)
+
+#' Interrupt a solver once its check has been answered by another
+#' solver of the portfolio (runs in a thread of a worker process)
+#'
+#' @param ctx Z3 context of the solver
+#' @param check number of the check
+#' @param done list which is not empty once the check is over
+#' @return None
+def watchCheck(ctx, check, done):
+	while (not done):
+		if (lastAnswered.value >= check):
+			ctx.interrupt()
+		sleep(0.01)
+	return(None)
+
+#' Check the satisfiability of a set of assertions with one
+#' portfolio configuration (runs in a worker process)
+#'
+#' @param args list [smt2, assumptions, config, seed, check] where smt2 is
+#' the SMT-LIB string of the assertions, assumptions the list of names
+#' of Boolean literals to assume, config the solver configuration,
+#' seed the random seed and check the number of the check
+#' @return res list [check result as a string, model values] where model
+#' values is a list of [variable name, size (None for Booleans), value]
+def portfolio_worker(args):
+	[smt2, assumptions, config, seed, check] = args
+	ctx = Context()
+	s = buildPortfolioSolver(config, seed, ctx)
+	done = []
+	watcher = Thread(target=watchCheck, args=(ctx, check, done))
+	watcher.daemon = True
+	watcher.start()
+	try:
+		s.from_string(smt2)
+		for a in assumptions:
+			s.add(Bool(a, ctx))
+		r = s.check()
+	except Z3Exception:
+		return(["unknown", None])
+	finally:
+		done.append(True)
+		watcher.join()
+	if (r != sat):
+		return([str(r), None])
+	M = s.model()
+	values = []
+	for d in M.decls():
+		if (d.arity() > 0):
+			continue
+		v = M[d]
+		if (is_bv_value(v)):
+			values.append([d.name(), v.size(), v.as_long()])
+		elif (is_true(v) or is_false(v)):
+			values.append([d.name(), None, int(is_true(v))])
+	return(["sat", values])
+
+#' Race differently-configured solvers on the assertions of a solver,
+#' keep the first answer and cancel the other solvers
+#'
+#' If an answer "sat" is returned, the values of the winning model
+#' are assumed in a call to the input solver, so that its model can
+#' be retrieved as usual with s.model()
+#'
+#' @param s solver
+#' @param portfolio portfolio of solvers (see startPortfolio)
+#' @param assumptions list of Boolean literals to assume
+#' @return res check result (sat, unsat or unknown)
+def portfolio_check(s, portfolio, assumptions=[]):
+	[pool, answered, nworkers] = portfolio
+	smt2 = s.sexpr()
+	names = [str(a) for a in assumptions]
+	check = answered.value+1
+	jobs = [[smt2, names, configurations[k % len(configurations)], k, check] for k in range(nworkers)]
+	r, values = "unknown", None
+	results = pool.imap_unordered(portfolio_worker, jobs)
+	try:
+		for [r, values] in results:
+			if (r != "unknown"):
+				break
+	finally:
+		## The other solvers are interrupted, and their (unknown) ##
+		## answers are discarded before the next check            ##
+		answered.value = check
+		for _ in results:
+			pass
+	if (r == "unsat"):
+		return(unsat)
+	if (r != "sat"):
+		return(unknown)
+	pinned = [pinValue(name, size, value) for [name, size, value] in values]
+	return(s.check(*(list(assumptions) + pinned)))
+
+#' Build the condition pinning a variable to its value
+#' in the winning model
+#'
+#' @param name variable name
+#' @param size size of the bit-vector variable (None for Booleans)
+#' @param value value of the variable
+#' @return cond condition variable == value
+def pinValue(name, size, value):
+	if (size == None):
+		return(Bool(name) if (value) else Not(Bool(name)))
+	return(BitVec(name, size) == BitVecVal(value, size))
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+
+##############################################
+## INTERNED PROBLEM INSTANCE                ##
+##############################################
+
+## Genes and experiments are identified by their index (of   ##
+## their first occurrence in C and E): their names are only  ##
+## looked up once, in dictionaries, and the observations are ##
+## stored in an array of integers. The interactions are      ##
+## grouped by regulated gene in one pass (see                ##
+## buildInteractionDicts)                                    ##
+
+#' Dictionary of the indices of names
+#'
+#' @param names list of names
+#' @return index dictionary name -> index of its first occurrence in names
+#'               (as names.index(name))
+def nameIndex(names):
+	index = dict()
+	for i in range(len(names)):
+		index.setdefault(names[i], i)
+	return(index)
+
+#' Interned, index-based representation of the genes and of the
+#' experiments of an instance of the GRN inference problem (see readREINfile)
+#'
+#' - genes, experiments dictionaries name -> index (see nameIndex)
+#' - observations array of integers (#observations x 4): [experiment
+#' index, step, gene index, value], grouped by experiment in the order of E
+#' - spans list of [start, end] rows of observations of each experiment
+#' - fixpoints dictionary experiment name -> first fix point step
+class Problem(object):
+	__slots__ = ["genes", "experiments", "observations", "spans", "fixpoints"]
+
+	#' @param C the list of nodes
+	#' @param E set of experiments (see readREINfile)
+	#' @param Fixpoint fix point constraints (see readREINfile)
+	def __init__(self, C, E, Fixpoint):
+		self.genes = nameIndex(C)
+		self.experiments = nameIndex([e[0] for e in E])
+		observations, self.spans = [], []
+		for e in range(len(E)):
+			start = len(observations)
+			observations += [[e, n, self.genes[gene], value] for [n, gene, value] in E[e][1]]
+			self.spans.append([start, len(observations)])
+		self.observations = np.array(observations, dtype=np.int64).reshape((len(observations), 4))
+		self.fixpoints = dict()
+		for [n, name] in Fixpoint:
+			self.fixpoints.setdefault(name, n)
+
+	#' @param e index of an experiment in E
+	#' @return observations rows of the observations of the experiment
+	def experimentObservations(self, e):
+		[start, end] = self.spans[e]
+		return(self.observations[start:end])
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+
+from z3 import *
+from time import time
+
+##############################################
+## PROFILING OF THE CONSTRAINT CONSTRUCTION ##
+##############################################
+
+## A profile is a dictionary with keys:                  ##
+## "phases": list of records {phase, experiment, time,   ##
+## assertions, terms} for each phase of the constraint   ##
+## construction, where assertions is the number of       ##
+## assertions added to the solver during the phase, and  ##
+## terms is the number of new nodes in the term DAG      ##
+## "checks": list of records {solution, time, result}    ##
+## for each satisfiability check                         ##
+## "summary": phase records summed over experiments      ##
+## "encoding_time": total time of the construction       ##
+## "profiling_time": time spent in counting terms (not   ##
+## included in the other times)                          ##
+
+#' Initialize a profile
+#'
+#' @return profile empty profile
+def newProfile():
+	return({"phases": [], "checks": [], "summary": dict(), "profiling_time": 0.})
+
+#' Count the nodes of the term DAG of a list of assertions
+#' which have not been counted yet
+#'
+#' @param exprs list of Z3 expressions
+#' @param seen set of identifiers of the nodes already counted
+#' (updated)
+#' @return size number of new nodes
+def dagSize(exprs, seen):
+	size = 0
+	stack = list(exprs)
+	while (stack):
+		e = stack.pop()
+		i = e.get_id()
+		if (i in seen):
+			continue
+		seen.add(i)
+		size += 1
+		stack += e.children()
+	return(size)
+
+#' Start recording a phase of the constraint construction
+#'
+#' @param profile profile or None (no profiling)
+#' @param s solver
+#' @return start None if @profile is None, else [timestamp, number of assertions]
+def startPhase(profile, s):
+	if (profile == None):
+		return(None)
+	return([time(), len(s.assertions())])
+
+#' Record a phase of the constraint construction in a profile
+#'
+#' @param profile profile or None (no profiling)
+#' @param seen set of identifiers of the nodes of the term DAG
+#' counted in the previous phases
+#' @param s solver
+#' @param phase name of the phase
+#' @param start value returned by startPhase at the start of the phase
+#' @param experiment name of the experiment (if the phase is
+#' specific to an experiment)
+#' @return profile updated profile
+def endPhase(profile, seen, s, phase, start, experiment=None):
+	if (profile == None):
+		return(profile)
+	t0 = time()
+	t = t0-start[0]
+	assertions = s.assertions()
+	new = [assertions[i] for i in range(start[1], len(assertions))]
+	record = {"phase": phase, "experiment": experiment, "time": t,
+		"assertions": len(new), "terms": dagSize(new, seen)}
+	profile["phases"].append(record)
+	total = profile["summary"].setdefault(phase, {"time": 0., "assertions": 0, "terms": 0})
+	for key in ["time", "assertions", "terms"]:
+		total[key] += record[key]
+	profile["profiling_time"] += time()-t0
+	return(profile)
+
+#' Record a satisfiability check in a profile
+#'
+#' @param profile profile or None (no profiling)
+#' @param solNB number of the solution looked for
+#' @param t checking time
+#' @param result result of the check
+#' @return profile updated profile
+def checkPhase(profile, solNB, t, result):
+	if (profile == None):
+		return(profile)
+	profile["checks"].append({"solution": solNB, "time": t, "result": str(result)})
+	return(profile)
+
+#' Write a profile in a JSON file
+#'
+#' @param profile profile
+#' @param filename path to the file
+#' @return None
+def dumpProfile(profile, filename):
+	import json
+	with open(filename, "w") as f:
+		json.dump(profile, f, indent=2, sort_keys=True)
+	return(None)
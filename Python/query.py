@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+from z3 import Not, And, BitVec, BitVecVal, BoolVal, unsat
+from grn_inference import getState, stateStep
+from utils import testValue, rev, ifthenelse
+from problem import nameIndex
+
+##############################################
+## UNIVERSAL PREDICTION QUERIES             ##
+##############################################
+
+## A prediction holds in every model which agrees with the   ##
+## experiments iff there is no such model where it does not  ##
+## hold: the prediction is checked on a new, hypothetical,   ##
+## experiment, which negation is added to the constraints of ##
+## grn_solver before a single check. If there is no model    ##
+## which agrees with the experiments and the hypothetical    ##
+## experiment (e.g. the fix point of the hypothetical        ##
+## experiment cannot be reached from its initial state), the ##
+## prediction holds vacuously: the constraints are checked   ##
+## once without the negation to tell this case apart         ##
+
+#' Build the perturbations of the hypothetical experiment
+#'
+#' @param SETP list of (associated experiment, known perturbations) pairs
+#' @param typeP type of perturbation (KO or FE)
+#' @param perturbable list of perturbable genes for this type of perturbation
+#' @param genes list of perturbed genes in the hypothetical experiment
+#' @param E set of experiments
+#' @param name name of the hypothetical experiment
+#' @return SETP list of perturbations where the value of every perturbable gene
+#'              is known in the hypothetical experiment (if there is any perturbation
+#'              of this type), and the other experiments are unchanged
+def queryPerturbations(SETP, typeP, perturbable, genes, E, name):
+	for g in genes:
+		if (not (g in perturbable)):
+			raise ValueError("Gene " + g + " cannot be perturbed (" + typeP + ")")
+	if (not genes and not SETP):
+		return(SETP)
+	## Perturbations were not applied to the other experiments (see grn_solver) ##
+	if (not SETP):
+		SETP = [[e[0], [[0, typeP + "(" + g + ")", 0] for g in perturbable]] for e in E]
+	return(SETP + [[name, [[0, typeP + "(" + g + ")", int(g in genes)] for g in perturbable]]])
+
+#' Check whether a prediction holds in every model which agrees with the experiments
+#'
+#' @param C the list of nodes
+#' @param CRM, length, Idef, Iopt, R, E, typeT, KO, FE, uniqueness, limreg, P,
+#'        Fixpoint abstract model and experiments (see grn_solver)
+#' @param q0 initial state of the hypothetical experiment (character string of 0's and
+#'           1's in the order of C, or list of [_, gene, value] where the missing genes
+#'           can take any value)
+#' @param prediction list of [step, gene, value] which should all hold in the trajectory
+#'                   of the hypothetical experiment
+#' @param KOq list of knocked-down genes in the hypothetical experiment
+#' @param FEq list of forced expressed genes in the hypothetical experiment
+#' @param fixpoint step from which the trajectory of the hypothetical experiment should
+#'                 be in a fix point, or None
+#' @param name name of the hypothetical experiment
+#' @param verbose boolean for having comments
+#' @return res list [holds, counterexample] where holds is True iff the prediction holds
+#'             in every model (the solver returned UNSAT), None if there is no model which
+#'             agrees with the experiments and the hypothetical experiment (the prediction
+#'             holds vacuously), and False otherwise; counterexample is None if holds is not
+#'             False, else a model where the prediction does not hold (see grn_solver)
+def predictionQuery(C, CRM, length, Idef, Iopt, R, E, typeT, KO, FE, uniqueness, limreg, P, Fixpoint,
+		q0, prediction, KOq=[], FEq=[], fixpoint=None, name="Prediction", verbose=False):
+	from grn_solver import grn_solver
+	ngenes = len(C)
+	if (name in [e[0] for e in E]):
+		raise ValueError("Experiment " + name + " already exists")
+	if (any([n > length for [n, _, _] in prediction])):
+		raise ValueError("Predictions should be at most at step " + str(length))
+	if (isinstance(q0, str)):
+		q0 = [[0, C[i], int(q0[i])] for i in range(ngenes)]
+	exp = [name, [[0, x[1], int(x[2])] for x in q0]]
+	DOWN = [C[i] for i in range(ngenes) if ("-" in P[i])]
+	UP = [C[i] for i in range(ngenes) if ("+" in P[i])]
+	KO = queryPerturbations(KO, "KO", DOWN, KOq, E, name)
+	FE = queryPerturbations(FE, "FE", UP, FEq, E, name)
+	Fixpoint = Fixpoint + ifthenelse(fixpoint == None, [], [[fixpoint, name]])
+	## Negation of the prediction on the states of the hypothetical experiment ##
+	q = lambda n : BitVec(getState(stateStep(n, fixpoint), name), ngenes)
+	genes = nameIndex(C)
+	negation = Not(And([testValue(q(n), genes[gene], BitVecVal(int(value), 1)) for [n, gene, value] in prediction]))
+	consistent = []
+	def query(s):
+		s.push()
+		consistent.append(s.check() != unsat)
+		## Nothing left to check if there is no model at all ##
+		s.add(negation if (consistent[0]) else BoolVal(False))
+		return(s)
+	[resList, _, _] = grn_solver(C, CRM, length, Idef, Iopt, R, E + [exp], typeT, 1, KO, FE, uniqueness,
+		limreg, P, Fixpoint, verbose=verbose, printSolutions=verbose, printmain=verbose, query=query)
+	if (not consistent[0]):
+		return([None, None])
+	if (not resList):
+		return([True, None])
+	return([False, resList[0]])
+
+#' Get the trajectory of the hypothetical experiment in a counterexample
+#'
+#' @param counterexample model returned by predictionQuery
+#' @param length maximum length of experiments
+#' @param name name of the hypothetical experiment
+#' @return trajectory list of [state name, state] where state is the
+#'                    character string of the values of genes in the order of C
+def counterexampleTrajectory(counterexample, length, name="Prediction"):
+	values = dict([[str(x[0]), x[1]] for x in counterexample])
+	statesnames = filter(lambda sn : sn in values.keys(), [getState(n, name) for n in range(length+1)])
+	return([[sn, "".join(rev(values[sn]))] for sn in statesnames])
@@ -0,0 +1,136 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from simulator import modelNetwork, nextStates, geneMask, indexStates, stateIndex
+from utils import ifthenelse
+from problem import nameIndex
+
+##############################################
+## EXPLICIT-STATE REACHABILITY              ##
+##############################################
+
+## States are packed in integers (first gene of C on the most    ##
+## significant bit, see allStates) and explored in breadth-first ##
+## order: the visited states are stored in a dictionary (state,  ##
+## predecessor), so that each state is expanded at most once and ##
+## the first states found satisfying the condition are reached   ##
+## by shortest paths                                             ##
+## Asynchronous transitions update one gene which value changes  ##
+## (see transition_condition_async), synchronous transitions     ##
+## update all genes at once                                      ##
+
+## Largest number of genes of packed states ##
+maxGenes = 62
+## Default maximum number of visited states ##
+maxStates = 2**22
+
+## Character string of a packed state ##
+stateString = lambda x, ngenes : "".join([str((x >> (ngenes-1-g)) & 1) for g in range(ngenes)])
+
+#' Mask and value of a (partial) condition on the genes
+#'
+#' @param C the list of nodes
+#' @param condition list of [_, gene, value] (as in the experiment
+#'                  conditions returned by getConditionsExp), or
+#'                  character string of 0's and 1's in the order of C
+#' @return res list [mask, value] of packed integers: a state x satisfies
+#'             the condition iff x & mask == value
+def conditionMask(C, condition):
+	ngenes = len(C)
+	if (isinstance(condition, str)):
+		condition = [[None, C[g], int(condition[g])] for g in range(ngenes)]
+	genes = nameIndex(C)
+	mask, value = 0, 0
+	for [_, gene, v] in condition:
+		bit = 1 << (ngenes-1-genes[gene])
+		mask |= bit
+		value |= ifthenelse(int(v), bit, 0)
+	return([mask, value])
+
+#' Successors of states
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param x array of packed states
+#' @param ngenes number of genes
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param ko Boolean array of knocked-down genes
+#' @param fe Boolean array of forced expressed genes
+#' @return res list [successors, predecessors] of arrays of packed states
+def successors(network, x, ngenes, typeT, ko, fe):
+	Q = indexStates(x, ngenes)
+	Q1 = nextStates(network, Q, ko=ko, fe=fe)
+	if (typeT == "synchronous"):
+		return([stateIndex(Q1), x])
+	[idx, genes] = np.nonzero(Q1 != Q)
+	bits = np.int64(1) << (ngenes-1-genes).astype(np.int64)
+	return([x[idx] ^ bits, x[idx]])
+
+#' Find a shortest trajectory from an initial state to a state
+#' satisfying a condition, by breadth-first exploration of the states
+#' of a model found by the solver
+#'
+#' @param modelID integer identifier of model in resList
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @param q0 initial state (character string of 0's and 1's in the order of C,
+#'           or list of [_, gene, value] where the missing genes can take any value)
+#' @param condition condition to reach (see conditionMask)
+#' @param nstep maximum number of steps
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param KO list of knocked-down genes
+#' @param FE list of forced expressed genes
+#' @param verbose boolean for having comments
+#' @param maxStates maximum number of visited states: a ValueError is raised
+#'                  if the exploration goes beyond
+#' @return witness None if the condition is not reachable in at most nstep steps,
+#'                 else list of states (character strings in the order of C)
+#'                 from an initial state to a state satisfying the condition
+def reachable(modelID, C, resList, Idef, Iopt, q0, condition, nstep, typeT="asynchronous", KO=[], FE=[], verbose=False, maxStates=maxStates):
+	from utils import verboseIt
+	ngenes = len(C)
+	if (ngenes > maxGenes):
+		raise ValueError("Too many genes for packed states (at most " + str(maxGenes) + ")")
+	if (not (typeT in ["synchronous", "asynchronous"])):
+		raise ValueError("Wrong transition type: " + str(typeT))
+	network = modelNetwork(modelID, C, resList, Idef, Iopt)
+	[ko, fe] = [geneMask(C, KO), geneMask(C, FE)]
+	[mask, value] = conditionMask(C, condition)
+	## Initial states: all completions of the (partial) initial state ##
+	[mask0, value0] = conditionMask(C, q0)
+	if (2**(ngenes-bin(mask0).count("1")) > maxStates):
+		raise ValueError("Too many initial states (at most " + str(maxStates) + " visited states)")
+	frontier = np.array([value0], dtype=np.int64)
+	for b in range(ngenes):
+		if (not ((mask0 >> b) & 1)):
+			frontier = np.concatenate((frontier, frontier | np.int64(1 << b)))
+	## Visited states (state -> predecessor, -1 for initial states) ##
+	visited = dict([[x, -1] for x in frontier.tolist()])
+	step = 0
+	while (True):
+		found = np.nonzero((frontier & mask) == value)[0]
+		if (len(found)):
+			x = int(frontier[found[0]])
+			witness = [x]
+			while (visited[witness[-1]] != -1):
+				witness.append(visited[witness[-1]])
+			verboseIt("Condition reached at step " + str(step) + " (" + str(len(visited)) + " visited states)", verbose)
+			return([stateString(y, ngenes) for y in reversed(witness)])
+		if (step == nstep or not len(frontier)):
+			verboseIt("Condition not reached (" + str(len(visited)) + " visited states)", verbose)
+			return(None)
+		[succ, pred] = successors(network, frontier, ngenes, typeT, ko, fe)
+		## States reached several times at this step are looked up once ##
+		[succ, first] = np.unique(succ, return_index=True)
+		pred = pred[first]
+		new = []
+		for [y, x] in zip(succ.tolist(), pred.tolist()):
+			if (not (y in visited)):
+				visited[y] = x
+				new.append(y)
+		frontier = np.array(new, dtype=np.int64)
+		step += 1
+		if (len(visited) > maxStates):
+			raise ValueError("Condition not reached after visiting " + str(len(visited)) + " states at step " + str(step))
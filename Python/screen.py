@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+from multiprocessing import Pool, cpu_count
+from itertools import combinations
+from utils import ifthenelse
+
+##############################################
+## IN-SILICO PERTURBATION SCREENING         ##
+##############################################
+
+## Every single and pairwise perturbation allowed by the    ##
+## lists of possible perturbations P (see getModel) is      ##
+## applied to a model found by the solver: genes with "-"   ##
+## in their list can be knocked down, genes with "+" can be ##
+## forcibly expressed. The steady states of each perturbed  ##
+## model are computed in a process pool (see attractors),   ##
+## and restricted to the ones reachable from an initial     ##
+## state if one is given (see reachable)                    ##
+
+#' List the perturbations allowed for each gene
+#'
+#' @param C the list of nodes
+#' @param P list of possible perturbations for every gene
+#' @param double boolean: add the pairwise perturbations of distinct genes
+#' @return perturbations list of [KO, FE] lists of perturbed genes, starting
+#'                       with the unperturbed model
+def screenPerturbations(C, P, double=True):
+	single = [[[C[i]], []] for i in range(len(C)) if ("-" in P[i])]
+	single += [[[], [C[i]]] for i in range(len(C)) if ("+" in P[i])]
+	perturbations = [[[], []]] + single
+	if (double):
+		for [[ko1, fe1], [ko2, fe2]] in combinations(single, 2):
+			if (set(ko1+fe1) != set(ko2+fe2)):
+				perturbations.append([ko1+ko2, fe1+fe2])
+	return(perturbations)
+
+#' Compute the steady states of a perturbed model (runs in a worker process)
+#'
+#' @param args list [C, I, grfs, typeT, KO, FE, q0, nstep] where I and grfs are
+#'             the interactions and regulation conditions of the model (see
+#'             modelInteractions), KO and FE the lists of perturbed genes, and q0
+#'             the initial state (or None, see screen)
+#' @return res list of steady states (character strings in the order of C), or
+#'             the error message if they could not be computed
+def screen_worker(args):
+	from attractors import attractors
+	from reachability import reachable
+	[C, I, grfs, typeT, KO, FE, q0, nstep] = args
+	model = [[["Is", ""]] + [["grf_" + C[i], grfs[i]] for i in range(len(C))]]
+	try:
+		steadyStates = [a[0][0] for a in attractors(0, C, model, I, [], "synchronous", KO=KO, FE=FE) if (len(a[0]) == 1)]
+		if (q0 != None):
+			steadyStates = filter(lambda x : reachable(0, C, model, I, [], q0, x, nstep, typeT=typeT, KO=KO, FE=FE) != None, steadyStates)
+	except ValueError as e:
+		return(str(e))
+	return(steadyStates)
+
+#' Screen the single and pairwise perturbations of a model found by the solver
+#'
+#' @param modelID integer identifier of model in resList
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @param P list of possible perturbations for every gene
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param q0 initial state (see reachable), or None for all steady states
+#' @param nstep maximum number of steps to reach a steady state from q0
+#' @param double boolean: add the pairwise perturbations of distinct genes
+#' @param nproc number of worker processes (None for the number of CPUs)
+#' @return table list of [KO, FE, steady states] for each perturbation (see
+#'               screenPerturbations and screen_worker)
+def screen(modelID, C, resList, Idef, Iopt, P, typeT="synchronous", q0=None, nstep=20, double=True, nproc=None):
+	from simulator import modelInteractions
+	## Only lists of names and integers are sent to the workers ##
+	[I, grfs] = modelInteractions(modelID, C, resList, Idef, Iopt)
+	I = [[str(x) for x in i] for i in I]
+	perturbations = screenPerturbations(C, P, double=double)
+	jobs = [[C, I, grfs, typeT, KO, FE, q0, nstep] for [KO, FE] in perturbations]
+	if (nproc == 1):
+		results = map(screen_worker, jobs)
+	else:
+		pool = Pool(ifthenelse(nproc == None, cpu_count(), nproc))
+		try:
+			results = pool.map(screen_worker, jobs)
+		finally:
+			pool.terminate()
+			pool.join()
+	return([perturbations[i] + [results[i]] for i in range(len(perturbations))])
+
+#' Print a screening table (one tab-separated line per perturbation)
+#'
+#' @param table screening table (see screen)
+#' @param C the list of nodes
+#' @return None
+def printScreen(table, C):
+	print("KO\tFE\t#steady states\tsteady states (" + " ".join(C) + ")")
+	genes = lambda x : ifthenelse(x, ",".join(x), "-")
+	for [KO, FE, steadyStates] in table:
+		if (isinstance(steadyStates, str)):
+			print(genes(KO) + "\t" + genes(FE) + "\t?\t" + steadyStates)
+		else:
+			print(genes(KO) + "\t" + genes(FE) + "\t" + str(len(steadyStates)) + "\t" + " ".join(steadyStates))
@@ -0,0 +1,383 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from shortcuts import diCompute, nxor
+from grn_inference import addInteractions, regulatorSlice
+from utils import ifthenelse
+
+##############################################
+## SIMULATION OF A SOLVED MODEL             ##
+##############################################
+
+## States are Boolean arrays of shape (number of states, |genes|) ##
+## (genes in the order of C), updated all at once.                ##
+## The template terms of shortcuts.py for a given gene only       ##
+## depend on the coordinates of its potential regulators (see     ##
+## regulatorSlice): they are evaluated on the states restricted   ##
+## to these coordinates, packed in unsigned 64-bit integers       ##
+## (coordinate k in bit k, the phantom coordinate is zero), with  ##
+## the same bit-wise operations as in the bit-vector encoding.    ##
+## Bits beyond the slice are ignored by castNP and negNP          ##
+
+## Threshold regulation conditions (18, 19) only constrain the    ##
+## current state in the transition relation: the next value of    ##
+## the gene is not determined, and cannot be simulated            ##
+deterministic = lambda grfs : all([grf < 18 for grf in grfs])
+
+## Maximum number of coordinates in a slice (the gene, its        ##
+## potential regulators and the phantom coordinate)               ##
+maxSlice = 64
+
+## Caster packed slice -> condition (see castBVinCond)  ##
+castNP = lambda x, one : (x & one) == one
+## Negation of a condition (see neg)                    ##
+negNP = lambda x, one : np.where(((~x) & one) != 0, one, np.uint64(0))
+
+## Pre-computation of template functions knowing        ##
+## regulators (activators and repressors) of a given    ##
+## gene (see prepreCompute)                             ##
+def prepreComputeNP(a, r, one):
+	zero = np.uint64(0)
+	notInducibleG = nxor(a, zero)
+	notRepressibleG = nxor(r, zero)
+	negnotInducibleG = negNP(notInducibleG, one)
+	negnotRepressibleG = negNP(notRepressibleG, one)
+	allActivatorsG = lambda q : negnotInducibleG & nxor(q & a, a)
+	allRepressorsG = lambda q : negnotRepressibleG & nxor(q & r, r)
+	noActivatorsG = lambda q : nxor(q & a, zero)
+	noRepressorsG = lambda q : nxor(q & r, zero)
+	indRegG = negNP(negnotInducibleG & notRepressibleG, one)
+	repRegG = negnotRepressibleG & notInducibleG
+	return([allActivatorsG, allRepressorsG, noActivatorsG, noRepressorsG, indRegG, repRegG])
+
+## Pre-computation of template functions knowing        ##
+## regulators of a given gene, AND the (packed) states  ##
+## (see preCompute)                                     ##
+def preComputeNP(q, prepreComputationG, one):
+	[allActivatorsG, allRepressorsG, noActivatorsG, noRepressorsG, indRegG, repRegG] = prepreComputationG
+	allActivatorsGQ = allActivatorsG(q)
+	allRepressorsGQ = allRepressorsG(q)
+	noActivatorsGQ = noActivatorsG(q)
+	noRepressorsGQ = noRepressorsG(q)
+	negallActivatorsGQ = negNP(allActivatorsGQ, one)
+	negallRepressorsGQ = negNP(allRepressorsGQ, one)
+	negnoActivatorsGQ = negNP(noActivatorsGQ, one)
+	negnoRepressorsGQ = negNP(noRepressorsGQ, one)
+	inducibleRegulationGQ = indRegG | negnoActivatorsGQ
+	repressibleRegulationGQ = repRegG & noRepressorsGQ
+	getRegFctGQ = lambda x : castNP((x & inducibleRegulationGQ) | repressibleRegulationGQ, one)
+	return([allActivatorsGQ, allRepressorsGQ, noActivatorsGQ, noRepressorsGQ, negallActivatorsGQ, negallRepressorsGQ, negnoActivatorsGQ, negnoRepressorsGQ, getRegFctGQ])
+
+#' Regulator/interaction dictionaries of every node of a solved model
+#' (as buildInteractionDict, built in a single pass over the interactions)
+#'
+#' @param C node names
+#' @param I list of interactions of the model: regulator x output gene x sign
+#' @return regInt list of the activator and repressor dictionaries of each node
+def interactionDicts(C, I):
+	from problem import nameIndex
+	return(addInteractions([[dict(), dict()] for c in C], I, nameIndex(C)))
+
+#' Build the network of a solved model for simulation
+#'
+#' @param C node names
+#' @param I list of interactions of the model: regulator x output gene x sign
+#' @param grfs list of selected regulation conditions for each node
+#' @return network list of [coordinates, one, prepreComputation, grf] for each
+#' node, where coordinates are the indices of the genes of its slice (without
+#' the phantom coordinate) and one the packed full one vector of the slice
+def buildNetwork(C, I, grfs):
+	ngenes = len(C)
+	network = []
+	regInt = interactionDicts(C, I)
+	for g in range(ngenes):
+		[regIntActivators, regIntRepressors] = regInt[g]
+		sl = regulatorSlice(g, [regIntActivators, regIntRepressors], ngenes)
+		if (len(sl) > maxSlice):
+			raise ValueError("Too many regulators of gene " + C[g] + " for simulation (" + str(len(sl)) + " coordinates in its slice, at most " + str(maxSlice) + ")")
+		pack = lambda keys : np.uint64(sum([1 << k for k in range(len(sl)) if (sl[k] in keys)]))
+		one = np.uint64((1 << len(sl))-1)
+		prepreComputation = prepreComputeNP(pack(regIntActivators.keys()), pack(regIntRepressors.keys()), one)
+		network.append([filter(lambda i : i != None, sl), one, prepreComputation, int(grfs[g])])
+	return(network)
+
+#' Pack the values of states on a list of coordinates
+#'
+#' @param Q Boolean array of states (number of states x |genes|)
+#' @param coordinates list of gene indices
+#' @return q array of unsigned 64-bit integers (coordinate k in bit k)
+def packStates(Q, coordinates):
+	q = np.zeros(Q.shape[0], dtype=np.uint64)
+	for k in range(len(coordinates)):
+		q |= Q[:, coordinates[k]].astype(np.uint64) << np.uint64(k)
+	return(q)
+
+#' Compute the synchronous successors of states
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param Q Boolean array of states (number of states x |genes|)
+#' @param ko Boolean array of knocked-down genes (|genes|), or None
+#' @param fe Boolean array of forced expressed genes (|genes|), or None
+#' @return Q1 Boolean array of successor states
+def nextStates(network, Q, ko=None, fe=None):
+	Q1 = np.empty(Q.shape, dtype=bool)
+	for g in range(len(network)):
+		[coordinates, one, prepreComputation, grf] = network[g]
+		[aA, aR, nA, nR, naA, naR, nnA, nnR, gc] = preComputeNP(packStates(Q, coordinates), prepreComputation, one)
+		Q1[:, g] = diCompute.get(grf)(aA, aR, nA, nR, naA, naR, nnA, nnR, gc)
+	if (ko is not None):
+		Q1 &= ~ko
+	if (fe is not None):
+		Q1 |= fe
+	return(Q1)
+
+#' Simulate synchronous trajectories
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param Q0 Boolean array of initial states (number of states x |genes|)
+#' @param nstep number of steps to perform
+#' @param ko Boolean array of knocked-down genes (|genes|), or None
+#' @param fe Boolean array of forced expressed genes (|genes|), or None
+#' @return trajectories Boolean array of states (nstep+1 x number of states x |genes|)
+def simulate(network, Q0, nstep, ko=None, fe=None):
+	trajectories = np.empty((nstep+1,) + Q0.shape, dtype=bool)
+	trajectories[0] = Q0
+	for n in range(nstep):
+		trajectories[n+1] = nextStates(network, trajectories[n], ko=ko, fe=fe)
+	return(trajectories)
+
+#' Test whether states are steady states
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param Q Boolean array of states (number of states x |genes|)
+#' @param ko Boolean array of knocked-down genes (|genes|), or None
+#' @param fe Boolean array of forced expressed genes (|genes|), or None
+#' @return res Boolean array (number of states)
+def isSteadyState(network, Q, ko=None, fe=None):
+	return((nextStates(network, Q, ko=ko, fe=fe) == Q).all(axis=1))
+
+##############################################
+## BATCH SIMULATION                         ##
+##############################################
+
+#' Get the interactions and regulation conditions of a model found by the solver
+#'
+#' @param modelID integer identifier of model in resList
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @return res list [I, grfs] of the interactions of the model and
+#'                  of the selected regulation condition for each node
+def modelInteractions(modelID, C, resList, Idef, Iopt):
+	from utils import rev
+	from problem import nameIndex
+	res = resList[modelID]
+	Is = res[0][1]
+	Iopt = rev(Iopt)
+	I = list(Idef) + [Iopt[i] for i in range(len(Iopt)) if (int(Is[i]))]
+	index = nameIndex([str(x[0]) for x in res])
+	grfs = [int(str(res[index["grf_" + c]][1])) for c in C]
+	return([I, grfs])
+
+#' Build the network of a model found by the solver
+#'
+#' @param modelID integer identifier of model in resList
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @return network network of the model (see buildNetwork)
+def modelNetwork(modelID, C, resList, Idef, Iopt):
+	[I, grfs] = modelInteractions(modelID, C, resList, Idef, Iopt)
+	if (not deterministic(grfs)):
+		raise ValueError("Threshold regulation conditions (18, 19) cannot be simulated")
+	return(buildNetwork(C, I, grfs))
+
+#' Boolean array of the genes in a list
+#'
+#' @param C the list of nodes
+#' @param genes list of gene names
+#' @return mask Boolean array (|genes in C|)
+def geneMask(C, genes):
+	return(np.array([c in genes for c in C], dtype=bool))
+
+#' All states of a set of genes (for basin of attraction sweeps)
+#'
+#' @param ngenes number of genes
+#' @param start index of the first state
+#' @param stop index after the last state (None for 2^ngenes)
+#' @return Q Boolean array (stop-start x ngenes), the k^th state being
+#' the binary representation of k (first gene on the most significant bit)
+def allStates(ngenes, start=0, stop=None):
+	return(indexStates(np.arange(start, ifthenelse(stop == None, 2**ngenes, stop), dtype=np.int64), ngenes))
+
+#' States of indices (see allStates)
+#'
+#' @param k array of state indices
+#' @param ngenes number of genes
+#' @return Q Boolean array of states (number of states x ngenes)
+def indexStates(k, ngenes):
+	k = np.asarray(k, dtype=np.uint64)
+	return(np.array([(k >> np.uint64(ngenes-1-g)) & np.uint64(1) for g in range(ngenes)], dtype=bool).T)
+
+#' Index of states (inverse of allStates)
+#'
+#' @param Q Boolean array of states (number of states x |genes|)
+#' @return k array of indices
+def stateIndex(Q):
+	ngenes = Q.shape[1]
+	return(np.dot(Q.astype(np.int64), np.int64(1) << np.arange(ngenes-1, -1, -1, dtype=np.int64)))
+
+#' Simulate synchronous trajectories from many initial states
+#' of a model found by the solver, in lock-step
+#'
+#' @param modelID integer identifier of model in resList
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @param Q0 array of initial states (number of states x |genes|) of 0's
+#'           and 1's (or Booleans), or bit-packed along the genes (as returned
+#'           by numpy.packbits(Q0, axis=1)) if packed is set to True
+#' @param nstep number of steps to perform
+#' @param KO list of knocked-down genes
+#' @param FE list of forced expressed genes
+#' @param packed boolean: Q0 and the returned trajectories are bit-packed
+#' @return trajectories array of states (number of states x nstep+1 x |genes|),
+#'                      of Booleans, or of bit-packed unsigned 8-bit integers
+#'                      along the genes if packed is set to True
+def simulateBatch(modelID, C, resList, Idef, Iopt, Q0, nstep, KO=[], FE=[], packed=False):
+	network = modelNetwork(modelID, C, resList, Idef, Iopt)
+	if (packed):
+		Q0 = np.unpackbits(np.asarray(Q0, dtype=np.uint8), axis=1)[:, :len(C)]
+	Q0 = np.asarray(Q0).astype(bool)
+	if (Q0.ndim != 2 or Q0.shape[1] != len(C)):
+		raise ValueError("Initial states should be an array of shape (number of states, " + str(len(C)) + ")")
+	trajectories = np.swapaxes(simulate(network, Q0, nstep, ko=geneMask(C, KO), fe=geneMask(C, FE)), 0, 1)
+	if (packed):
+		return(np.packbits(trajectories, axis=2))
+	return(trajectories)
+
+##############################################
+## ENSEMBLE SIMULATION                      ##
+##############################################
+
+## All models in resList are simulated at once: the template   ##
+## terms of a gene are evaluated on the slice of the abstract  ##
+## model (all definite and optional interactions, as in the    ##
+## encoding of grn_solver), with the activators and repressors ##
+## of each model packed in one row of unsigned 64-bit integers ##
+
+#' Build the networks of all models found by the solver
+#'
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @return ensemble list of [coordinates, one, a, r, grfs] for each node, where
+#' a (resp. r, grfs) is the array of the packed activators (resp. repressors,
+#' selected regulation condition) of the node in each model
+def buildEnsemble(C, resList, Idef, Iopt):
+	ngenes = len(C)
+	models = [modelInteractions(k, C, resList, Idef, Iopt) for k in range(len(resList))]
+	if (not all([deterministic(grfs) for [_, grfs] in models])):
+		raise ValueError("Threshold regulation conditions (18, 19) cannot be simulated")
+	ensemble = []
+	regIntAll = interactionDicts(C, list(Idef) + list(Iopt))
+	regIntModels = [interactionDicts(C, I) for [I, _] in models]
+	for g in range(ngenes):
+		sl = regulatorSlice(g, regIntAll[g], ngenes)
+		if (len(sl) > maxSlice):
+			raise ValueError("Too many regulators of gene " + C[g] + " for simulation (" + str(len(sl)) + " coordinates in its slice, at most " + str(maxSlice) + ")")
+		pack = lambda keys : sum([1 << k for k in range(len(sl)) if (sl[k] in keys)])
+		regInt = [x[g] for x in regIntModels]
+		a = np.array([pack(x[0].keys()) for x in regInt], dtype=np.uint64)
+		r = np.array([pack(x[1].keys()) for x in regInt], dtype=np.uint64)
+		grfs = np.array([grfs[g] for [_, grfs] in models], dtype=np.int64)
+		ensemble.append([filter(lambda i : i != None, sl), np.uint64((1 << len(sl))-1), a, r, grfs])
+	return(ensemble)
+
+#' Compute the synchronous successors of states in every model
+#'
+#' @param ensemble networks of the models (see buildEnsemble)
+#' @param Q Boolean array of states (number of models x number of states x |genes|)
+#' @param ko Boolean array of knocked-down genes (|genes|), or None
+#' @param fe Boolean array of forced expressed genes (|genes|), or None
+#' @return Q1 Boolean array of successor states
+def ensembleNextStates(ensemble, Q, ko=None, fe=None):
+	[nmodels, nstates, ngenes] = Q.shape
+	Q = Q.reshape((nmodels*nstates, ngenes))
+	Q1 = np.empty(Q.shape, dtype=bool)
+	for g in range(ngenes):
+		[coordinates, one, a, r, grfs] = ensemble[g]
+		rows = lambda x : np.repeat(x, nstates)
+		terms = preComputeNP(packStates(Q, coordinates), prepreComputeNP(rows(a), rows(r), one), one)
+		grfRows = rows(grfs)
+		for grf in np.unique(grfs):
+			selected = grfRows == grf
+			Q1[selected, g] = diCompute.get(int(grf))(*terms)[selected]
+	if (ko is not None):
+		Q1 &= ~ko
+	if (fe is not None):
+		Q1 |= fe
+	return(Q1.reshape((nmodels, nstates, ngenes)))
+
+#' Simulate synchronous trajectories from the same initial states
+#' in all models found by the solver, in lock-step
+#'
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @param Q0 array of initial states (number of states x |genes|) of 0's and 1's
+#' @param nstep number of steps to perform
+#' @param KO list of knocked-down genes
+#' @param FE list of forced expressed genes
+#' @return trajectories Boolean array of states (number of models x
+#'                      number of states x nstep+1 x |genes|)
+def simulateEnsemble(C, resList, Idef, Iopt, Q0, nstep, KO=[], FE=[]):
+	ensemble = buildEnsemble(C, resList, Idef, Iopt)
+	Q0 = np.asarray(Q0).astype(bool)
+	if (Q0.ndim != 2 or Q0.shape[1] != len(C)):
+		raise ValueError("Initial states should be an array of shape (number of states, " + str(len(C)) + ")")
+	[ko, fe] = [geneMask(C, KO), geneMask(C, FE)]
+	trajectories = np.empty((len(resList), Q0.shape[0], nstep+1, len(C)), dtype=bool)
+	trajectories[:, :, 0] = Q0
+	for n in range(nstep):
+		trajectories[:, :, n+1] = ensembleNextStates(ensemble, trajectories[:, :, n], ko=ko, fe=fe)
+	return(trajectories)
+
+#' Predict the value of each gene along synchronous trajectories
+#' from an initial state, in all models found by the solver
+#'
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @param q0 initial state (character string of 0's and 1's in the order of C,
+#'           or list of [_, gene, value] where the missing genes can take any value)
+#' @param nstep number of steps to perform
+#' @param KO list of knocked-down genes
+#' @param FE list of forced expressed genes
+#' @return res list [on, off] of arrays (nstep+1 x |genes|) of the fraction of models
+#'             which predict that the gene is expressed (resp. not expressed) at each
+#'             step, from all the initial states which agree with q0
+def predictEnsemble(C, resList, Idef, Iopt, q0, nstep, KO=[], FE=[]):
+	from reachability import conditionMask
+	[mask, value] = conditionMask(C, q0)
+	free = [g for g in range(len(C)) if (not ((mask >> (len(C)-1-g)) & 1))]
+	if (len(free) > 16):
+		raise ValueError("Too many unknown genes in the initial state (at most 16)")
+	Q0 = np.repeat(indexStates([value], len(C)), 2**len(free), axis=0)
+	Q0[:, free] = allStates(len(free))
+	trajectories = simulateEnsemble(C, resList, Idef, Iopt, Q0, nstep, KO=KO, FE=FE)
+	on = trajectories.all(axis=1).mean(axis=0)
+	off = (~trajectories).all(axis=1).mean(axis=0)
+	return([on, off])
@@ -11,16 +11,16 @@ from grn_inference import getCState, regulation_condition, testRS, aux_transitio
 ## SOLVE MODEL call                         ##
 ##############################################
  
-def call_run(model=full_toy_model, experiments=full_toy_experiments, simplify=False, visualize=False):
-    from models import readREINfile
+def call_run(model=full_toy_model, experiments=full_toy_experiments, simplify=False, visualize=False, cache=True):
+    from cache import readInstance
     from grn_solver import grn_solver
     from get_grfs import get_grfs, write_grfs, simplify_grfs
     if (visualize):
     	from launch_model import model2igraph
-    [C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
-            limreg, P, Fixpoint] = readREINfile(model, experiments)
+    [[C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
+            limreg, P, Fixpoint], _, regInt] = readInstance(model, experiments, cache=cache)
     res = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, solmax, 
-            KO, FE, uniqueness, limreg, P, Fixpoint, verbose=False)
+            KO, FE, uniqueness, limreg, P, Fixpoint, verbose=False, regInt=regInt)
     try:
         [resList, s, regInt] = res
     except:
@@ -46,7 +46,7 @@ def printRunSyntaxError(c):
         return(True)
     return(False)
  
-if (len(sys.argv) > 1 and sys.argv[1] != "launch"):
+if (len(sys.argv) > 1 and not (sys.argv[1] in ["launch", "verify", "screen", "ensemble", "predict"])):
 	if (len(sys.argv) == 2):
 	    cond1 = sys.argv[1] == "run"
 	    if (not printRunSyntaxError(cond1)):
@@ -107,29 +107,16 @@ if (len(sys.argv) > 1 and sys.argv[1] != "launch"):
 ## LAUNCH MODEL call                        ##
 ##############################################
 
-def getArgument(x, argv, default):
-	xx = "--" + x
-	if (any([arg == xx for arg in argv])):
-		i = argv.index(xx)
-		if (len(argv) < i+2):
-			return(default)
-		return(argv[i+1])
-	return(default)
-
-def getTrailingArguments(x, argv, default):
-	xx = "--" + x
-	if (any([arg == xx for arg in argv])):
-		i = argv.index(xx)
-		if (len(argv) < i+2):
-			return(default)
-		return(argv[i+1:])
-	return(default)
-
 from models import *
+from cache import readInstance
+
+## Parsed instances are read from the cache (see cache.py) ##
+## unless option "nocache" is given                        ##
+useCache = not ("nocache" in sys.argv)
 
 def getConditionsExp(experiments):
 	with open(path_to_models + experiments, "r") as f:
-		[_, summary, condexp] = readConditions(splitNclean(f.read(), ";"))
+		[_, summary, condexp] = readConditions(f)
 	return(condexp)
 
 if (len(sys.argv) > 1 and sys.argv[1] == "launch"):
@@ -150,8 +137,8 @@ if (len(sys.argv) > 1 and sys.argv[1] == "launch"):
 			resList = resList_Collombet_regular if (emodel=="model_expanded") else resList_Collombet_expanded
 		else:
 			resList = []
-		[C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
-			limreg, P, Fixpoint] = readREINfile(model, experiments)
+		[[C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
+			limreg, P, Fixpoint], condexp, regInt] = readInstance(model, experiments, cache=useCache)
 		if (len(sys.argv) > 3 and "igraph" in sys.argv):
 			## Avoids adding colours to the nodes according to their perturbations      ##
 			P = [""]*len(C)
@@ -169,11 +156,10 @@ if (len(sys.argv) > 1 and sys.argv[1] == "launch"):
 			if (len(Iopt) > 0):
 				print("Solving abstract model...")
 				[resList, _, _] = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 
-					solmax, KO, FE, uniqueness, limreg, P, Fixpoint, printSolutions=False)
+					solmax, KO, FE, uniqueness, limreg, P, Fixpoint, printSolutions=False, regInt=regInt)
 				print("... done!")
 			else:
 				resList = [[['Is', []]] + [["grf_"+C[i], R[i][0]] for i in range(len(C))]]
-			condexp = getConditionsExp(experiments)
 			idm = int(getArgument("modelID", sys.argv, 0))
 			modelID = idm if (not idm) else idm-1
 			q0 = getArgument("q0", sys.argv, "1"*len(C))
@@ -194,39 +180,227 @@ if (len(sys.argv) > 1 and sys.argv[1] == "launch"):
 				FE = [[fe, condexp.get(fe)]]
 			else:
 				FE = []
-			trajectories = launch_model(modelID, C, CRM, resList, Idef, Iopt, R, 
+			reach = getArgument("reach", sys.argv, None)
+			jsonl = getArgument("jsonl", sys.argv, None)
+			if (reach and not (reach in condexp.keys())):
+				print("The condition \'" + reach + "\' does not exist.")
+			if (reach in condexp.keys()):
+				## Shortest trajectory to condition reach (explicit-state exploration) ##
+				from reachability import reachable
+				from grn_inference import getState
+				genesP = lambda SETP : [x[1][3:-1] for x in SETP[0][1] if (x[2] > 0)] if (SETP) else []
+				try:
+					witness = reachable(modelID, C, resList, Idef, Iopt, q0, condexp.get(reach), int(nstep), 
+						typeT=typeT, KO=genesP(KO), FE=genesP(FE))
+				except ValueError as e:
+					print("MSG: " + str(e))
+					witness = None
+				trajectories = [] if (witness == None) else [["Witness", [[getState(i, "Experiment"), 
+					list(witness[i])] for i in range(len(witness))]]]
+				expnames = ifthenelse(reach in expnames, expnames, expnames + [reach])
+			else:
+				## Trajectories are generated one at a time when written in a file ##
+				trajectories = ifthenelse(jsonl, iter_model, launch_model)(modelID, C, CRM, resList, Idef, Iopt, R, 
 					q0, int(nstep), typeT, KO, FE, P, int(solmax), 
 					steadyStates=bool(steadyStates))
-			print("----------------------------------------------------------------")
-			print("modelID = " + str(modelID) + "; q0 = {" + (reduce(lambda x,y : x+", "+y, list(map(lambda x: x[1]+"="+str(x[2]), q0))) if (str(type(q0)) == "<type 'list'>") else q0) + "} ; nstep = " + str(nstep))
-			if (KO):
-				print("KO perturbations = { "+reduce(lambda x,y: x+", "+y, list(filter(lambda x :x, [x[1][3:-1] if (x[2] > 0) else None for x in KO[0][1]])))+" }")
-			if (FE):
-				print("FE perturbations = { "+reduce(lambda x,y: x+", "+y, list(filter(lambda x :x, [x[1][3:-1] if (x[2] > 0) else None for x in FE[0][1]])))+" }")
-			print("")
-			npaths = len(trajectories)
-			print("#trajectories = " + str(npaths))
-			print("----------------------------------------------------------------")
-			chunksC = [C[i:i + 10] for i in xrange(0, len(C), 10)]
-			for i in range(npaths):
-				printStates(trajectories, i, C)
-				path = trajectories[i][1]
-				print("\n")
-				for exp in expnames:
-					if (exp in condexp.keys()):
-						summary = condexp.get(exp)
-						nodesIDX = [C.index(x[1]) for x in summary]
-						values = concat([str(x[2]) for x in summary])
-						appear = False
-						for j in range(len(path)):
-							valuesPath = concat([path[j][1][idx] for idx in nodesIDX])
-							if (values == valuesPath):
+			if (jsonl):
+				## Trajectories are written as soon as they are generated ##
+				conditions = [[e, condexp.get(e)] for e in expnames if (e in condexp.keys())]
+				with open(jsonl, "w") as f:
+					npaths = write_trajectories(trajectories, f, C, conditions=conditions)
+				print("MSG: Wrote " + str(npaths) + " trajectories in " + jsonl)
+			else:
+				print("----------------------------------------------------------------")
+				print("modelID = " + str(modelID) + "; q0 = {" + (reduce(lambda x,y : x+", "+y, list(map(lambda x: x[1]+"="+str(x[2]), q0))) if (isinstance(q0, list)) else q0) + "} ; nstep = " + str(nstep))
+				if (KO):
+					print("KO perturbations = { "+reduce(lambda x,y: x+", "+y, list(filter(lambda x :x, [x[1][3:-1] if (x[2] > 0) else None for x in KO[0][1]])))+" }")
+				if (FE):
+					print("FE perturbations = { "+reduce(lambda x,y: x+", "+y, list(filter(lambda x :x, [x[1][3:-1] if (x[2] > 0) else None for x in FE[0][1]])))+" }")
+				print("")
+				npaths = len(trajectories)
+				print("#trajectories = " + str(npaths))
+				print("----------------------------------------------------------------")
+				chunksC = [C[i:i + 10] for i in xrange(0, len(C), 10)]
+				## Steps where each condition appears, for all trajectories at once ##
+				conditions = [[e, condexp.get(e)] for e in expnames if (e in condexp.keys())]
+				hits = condition_hits(trajectories, C, compile_conditions(C, conditions))
+				for i in range(npaths):
+					printStates(trajectories, i, C)
+					print("\n")
+					k = 0
+					for exp in expnames:
+						if (exp in condexp.keys()):
+							steps = hits[i, k].nonzero()[0]
+							k += 1
+							for j in steps:
 								print("Condition \'" + exp 
 									+ "\' appears at step " + str(j) + ".")
-								appear = True
-						if (not appear):
-							print("Condition \'" + exp + "\' does not appear in trajectory.")
-					else:
-						print("The condition \'" + exp + "\' does not exist.")
-				print("\n_______________________________________________\n\n")
+							if (not len(steps)):
+								print("Condition \'" + exp + "\' does not appear in trajectory.")
+						else:
+							print("The condition \'" + exp + "\' does not exist.")
+					print("\n_______________________________________________\n\n")
+			print("--END")
+
+if (len(sys.argv) > 1 and sys.argv[1] == "verify"):
+	if (len(sys.argv) == 2):
+		print("MSG: If you wanted to verify a model, then you probably forgot the model name.")
+		print("MSG: Correct syntax is \'verify model_name [options]\'.")
+	else:
+		from time import time
+		from verify import verify, printReport
+		emodel = getArgument("model", sys.argv, "model_expanded")
+		model = sys.argv[2] + "/" + emodel + ".net"
+		experiments = sys.argv[2] + "/" + getArgument("experiments", sys.argv, "observations") + ".spec"
+		## Models in resList (see launch) are checked against the experiments ##
+		sys.path.insert(0, '../examples')
+		from resList_test import *
+		if (sys.argv[2]=="pluripotency"):
+			resList = resList_Dunn_regular if (emodel=="model_expanded") else resList_Dunn_expanded
+		elif (sys.argv[2]=="collombet"):
+			resList = resList_Collombet_regular if (emodel=="model_expanded") else resList_Collombet_expanded
+		else:
+			resList = []
+		[[C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
+			limreg, P, Fixpoint], condexp, regInt] = readInstance(model, experiments, cache=useCache)
+		if (not resList and len(Iopt) == 0):
+			resList = [[['Is', []]] + [["grf_"+C[i], R[i][0]] for i in range(len(C))]]
+		if (not resList):
+			print("MSG: No model to verify for \'" + sys.argv[2] + "\'.")
+		else:
+			idm = int(getArgument("modelID", sys.argv, 0))
+			modelID = idm if (not idm) else idm-1
+			start = time()
+			try:
+				passed = printReport(verify(modelID, C, resList, Idef, Iopt, E, typeT, KO, FE, P, Fixpoint), 
+					verbose=("verbose" in sys.argv))
+				print("MSG: Model " + ifthenelse(passed, "agrees", "does not agree") + " with all experiments ("
+					+ str(round((time()-start)*1000, 1)) + " ms)")
+			except ValueError as e:
+				print("MSG: " + str(e))
+
+if (len(sys.argv) > 1 and sys.argv[1] == "screen"):
+	if (len(sys.argv) == 2):
+		print("MSG: If you wanted to screen perturbations, then you probably forgot the model name.")
+		print("MSG: Correct syntax is \'screen model_name [options]\'.")
+	else:
+		from screen import screen, printScreen
+		emodel = getArgument("model", sys.argv, "model_expanded")
+		model = sys.argv[2] + "/" + emodel + ".net"
+		experiments = sys.argv[2] + "/" + getArgument("experiments", sys.argv, "observations") + ".spec"
+		## Models in resList (see launch), or else the solutions of the solver, are screened ##
+		sys.path.insert(0, '../examples')
+		from resList_test import *
+		if (sys.argv[2]=="pluripotency"):
+			resList = resList_Dunn_regular if (emodel=="model_expanded") else resList_Dunn_expanded
+		elif (sys.argv[2]=="collombet"):
+			resList = resList_Collombet_regular if (emodel=="model_expanded") else resList_Collombet_expanded
+		else:
+			resList = []
+		[[C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
+			limreg, P, Fixpoint], condexp, regInt] = readInstance(model, experiments, cache=useCache)
+		idm = int(getArgument("modelID", sys.argv, 0))
+		modelID = idm if (not idm) else idm-1
+		if (not resList and len(Iopt) > 0):
+			print("Solving abstract model...")
+			[resList, _, _] = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 
+				modelID+1, KO, FE, uniqueness, limreg, P, Fixpoint, printSolutions=False, regInt=regInt)
+			print("... done!")
+		elif (not resList):
+			resList = [[['Is', []]] + [["grf_"+C[i], R[i][0]] for i in range(len(C))]]
+		q0 = getArgument("q0", sys.argv, None)
+		if (q0 in condexp.keys()):
+			q0 = condexp.get(q0)
+		nproc = getArgument("nproc", sys.argv, None)
+		if (len(resList) <= modelID):
+			print("MSG: No model solution number " + str(modelID+1) + ".")
+		else:
+			table = screen(modelID, C, resList, Idef, Iopt, P, typeT=typeT, q0=q0, 
+				nstep=int(getArgument("nstep", sys.argv, length)), double=not ("single" in sys.argv), 
+				nproc=None if (nproc == None) else int(nproc))
+			printScreen(table, C)
+
+if (len(sys.argv) > 1 and sys.argv[1] == "ensemble"):
+	if (len(sys.argv) == 2):
+		print("MSG: If you wanted to predict with all models, then you probably forgot the model name.")
+		print("MSG: Correct syntax is \'ensemble model_name [options]\'.")
+	else:
+		from simulator import predictEnsemble
+		emodel = getArgument("model", sys.argv, "model_expanded")
+		model = sys.argv[2] + "/" + emodel + ".net"
+		experiments = sys.argv[2] + "/" + getArgument("experiments", sys.argv, "observations") + ".spec"
+		[[C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
+			limreg, P, Fixpoint], condexp, regInt] = readInstance(model, experiments, cache=useCache)
+		## Trajectories are simulated with synchronous transitions ##
+		if (typeT == "asynchronous"):
+			print("MSG: The model has asynchronous transitions, but \'ensemble\' only simulates synchronous trajectories.")
+			print("MSG: You may want to use \'predict\' instead.")
+		else:
+			solmax = int(getArgument("solmax", sys.argv, solmax))
+			print("-- START")
+			if (len(Iopt) > 0):
+				print("Solving abstract model...")
+				[resList, _, _] = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 
+					solmax, KO, FE, uniqueness, limreg, P, Fixpoint, printSolutions=False, regInt=regInt)
+				print("... done!")
+			else:
+				resList = [[['Is', []]] + [["grf_"+C[i], R[i][0]] for i in range(len(C))]]
+			q0 = getArgument("q0", sys.argv, "1"*len(C))
+			nstep = int(getArgument("nstep", sys.argv, length))
+			if (q0 in condexp.keys()):
+				q0 = condexp.get(q0)
+			## Perturbed genes of conditions (see launch) ##
+			genesP = lambda x : [p[1][3:-1] for p in condexp.get(x) if (p[2] > 0)] if (x in condexp.keys()) else []
+			[ko, fe] = [getArgument("KO", sys.argv, ""), getArgument("FE", sys.argv, "")]
+			try:
+				[on, off] = predictEnsemble(C, resList, Idef, Iopt, q0, nstep, KO=genesP(ko), FE=genesP(fe))
+				print("----------------------------------------------------------------")
+				print("#models = " + str(len(resList)) + " ; nstep = " + str(nstep))
+				print("Gene\tOn\tOff")
+				for g in range(len(C)):
+					holds = ifthenelse(on[nstep, g] == 1 or off[nstep, g] == 1, "\t(all models)", "")
+					print(C[g] + "\t" + str(round(on[nstep, g], 3)) + "\t" + str(round(off[nstep, g], 3)) + holds)
+			except ValueError as e:
+				print("MSG: " + str(e))
+			print("--END")
+
+if (len(sys.argv) > 1 and sys.argv[1] == "predict"):
+	if (len(sys.argv) < 4 or not ("--prediction" in sys.argv)):
+		print("MSG: If you wanted to check a prediction, then you probably forgot the model name or the prediction.")
+		print("MSG: Correct syntax is \'predict model_name --prediction condition [options]\'.")
+	else:
+		from query import predictionQuery, counterexampleTrajectory
+		emodel = getArgument("model", sys.argv, "model_expanded")
+		model = sys.argv[2] + "/" + emodel + ".net"
+		experiments = sys.argv[2] + "/" + getArgument("experiments", sys.argv, "observations") + ".spec"
+		[[C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, 
+			limreg, P, Fixpoint], condexp, regInt] = readInstance(model, experiments, cache=useCache)
+		q0 = getArgument("q0", sys.argv, "1"*len(C))
+		if (q0 in condexp.keys()):
+			q0 = condexp.get(q0)
+		prediction = getArgument("prediction", sys.argv, None)
+		nstep = int(getArgument("nstep", sys.argv, length))
+		fixpoint = getArgument("fixpoint", sys.argv, None)
+		## Perturbed genes of conditions (see launch) ##
+		genesP = lambda x : [p[1][3:-1] for p in condexp.get(x) if (p[2] > 0)] if (x in condexp.keys()) else []
+		[ko, fe] = [getArgument("KO", sys.argv, ""), getArgument("FE", sys.argv, "")]
+		if (not (prediction in condexp.keys())):
+			print("The condition \'" + str(prediction) + "\' does not exist.")
+		else:
+			print("-- START")
+			try:
+				[holds, counterexample] = predictionQuery(C, CRM, length, Idef, Iopt, R, E, typeT, KO, FE, 
+					uniqueness, limreg, P, Fixpoint, q0, [[nstep, x[1], int(x[2])] for x in condexp.get(prediction)], 
+					KOq=genesP(ko), FEq=genesP(fe), fixpoint=None if (fixpoint == None) else int(fixpoint))
+				if (holds == None):
+					print("No model agrees with the experiments and the initial state (or fix point) of the prediction: condition \'" + prediction + "\' holds vacuously.")
+				elif (holds):
+					print("Condition \'" + prediction + "\' at step " + str(nstep) + " holds in all models.")
+				else:
+					print("Condition \'" + prediction + "\' at step " + str(nstep) + " does not hold in all models. Counterexample:")
+					print(" ".join(C))
+					for [name, state] in counterexampleTrajectory(counterexample, length):
+						print(state + " (" + name + ")")
+			except ValueError as e:
+				print("MSG: " + str(e))
 			print("--END")
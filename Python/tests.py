@@ -198,6 +198,11 @@ def test_utils():
     print(getBinaryDec(BitVecVal(3,3), 3) + " == 011")
     print(getBinaryDec(BitVecVal(3,3), 5) + " == 00011")
     print(str(getBinaryDec(BitVecVal(3,3))) + " == 3")
+    print(getBinaryDec(BitVecVal(1,3) | BitVecVal(4,3), 3) + " == 101")
+    print(">>> Test bitIndices:")
+    print(str(bitIndices(0)) + " == []")
+    print(str(bitIndices(10)) + " == [1, 3]")
+    print(str(bitIndices(2**100 + 1)) + " == [0, 100]")
     print(">>> Test bv:")
     print(getBinaryDec(bv(0, 3), 3) + " == 001")
     print(getBinaryDec(bv(1, 3), 3) + " == 010")
@@ -228,6 +233,9 @@ def test_utils():
     print(str(simplify(extract1BV(BitVecVal(3, 3), 0))) + " == 1")
     print(str(simplify(extract1BV(BitVecVal(3, 3), 1))) + " == 1")
     print(str(simplify(extract1BV(BitVecVal(3, 3), 2))) + " == 0")
+    print(">>> Test sliceBV:")
+    print(getBinaryDec(sliceBV(BitVecVal(6, 4), [0, 2]), 2) + " == 10")
+    print(getBinaryDec(sliceBV(BitVecVal(6, 4), [1, 2, None]), 3) + " == 011")
     print(">>> Test intList2BV:")
     print(getBinaryDec(intList2BV([2, 3], 4), 4) + " == 1100")
     print(getBinaryDec(intList2BV([0], 4), 4) + " == 0001")
@@ -339,8 +347,33 @@ def testTransition(size, Rs, res, a, r, q0, q1, typeT):
     except:
         print("No model")
  
+## Checks that the transition templates instantiated by substitution ##
+## are the transitions built on the states of each step              ##
+def testTemplates():
+    from models import readREINfile
+    from grn_inference import buildInteractionDicts, regulatorSlice, prepreCompute, preCompute, to_next_state, transition_relation, getState
+    print("Test to_next_state (transition templates) on toy model with perturbations:")
+    [C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint] = readREINfile(model="toy/model_expanded_pert.net", experiments="toy/observations_pert.spec")
+    ngenes = len(C)
+    regInt = buildInteractionDicts(C, Idef, Iopt)
+    slices = [regulatorSlice(g, regInt[g], ngenes) for g in range(ngenes)]
+    regulators = [[sliceBV(BitVec(x + "_" + C[g], ngenes), slices[g]) for x in ["activators", "repressors"]] for g in range(ngenes)]
+    prepreComputation = [prepreCompute(a, r) for [a, r] in regulators]
+    Rs = [BitVec("grf_" + c, 5) for c in C]
+    [ko_t, fe_t, ko_e, fe_e] = [BitVec(x, ngenes) for x in ["ko_template", "fe_template", "ko_Experiment", "fe_Experiment"]]
+    res = lambda ko, fe : lambda x, g : (x & ~extract1BV(ko, g)) | extract1BV(fe, g)
+    q = [BitVec(getState(n, "Experiment"), ngenes) for n in range(3)]
+    for typeT in ["synchronous", "asynchronous"]:
+        s = to_next_state(Solver(), "Experiment", prepreComputation, 0, 2, q, typeT, 2, regulators, slices, ngenes, R, Rs, 
+            res(ko_t, fe_t), False, templates=dict(), subst=[(ko_t, ko_e), (fe_t, fe_e)])
+        ## Transition relation built on the states of each step ##
+        direct = [And(transition_relation(n, 2, q[n], q[n+1], [preCompute(sliceBV(q[n], slices[g]), prepreComputation[g]) for g in range(ngenes)], 
+            ngenes, R, Rs, res(ko_e, fe_e), typeT, regulators, slices)) for n in range(2)]
+        print(">>> " + typeT + ": same transitions as built on the states of each step?")
+        print(str(Solver().check(And(s.assertions()) != And(direct)) == unsat) + " == True")
+
 def test_grn_inference():
-    from grn_inference import buildInteractionDict, preCompute, prepreCompute
+    from grn_inference import buildInteractionDict, buildInteractionDicts, preCompute, prepreCompute
     from shortcuts import diCompute, rule18, rule19
     print("------ START TEST")
     size = 4
@@ -375,6 +408,14 @@ def test_grn_inference():
     print("Repressors: ")
     print(regIntRepressors)
     print("---")
+    print("Test buildInteractionDicts:")
+    regInt = buildInteractionDicts(C, Idef, Iopt)
+    print(str(regInt[idx] == [regIntActivators, regIntRepressors]) + " == True")
+    print(str(regInt[3]) + " == [{}, {2: 2}]")
+    print(str(buildInteractionDicts(C, [], [])[0]) + " == [None, None]")
+    print("---")
+    testTemplates()
+    print("---")
     print("Test testRS:")
     print(str(simplify(testRS(BitVecVal(3, 5), 3))) + " == True")
     print(str(simplify(testRS(BitVecVal(0, 5), 3))) + " == False")
@@ -475,16 +516,120 @@ def test_grn_inference():
     return(None)
     print("------ END TEST")
  
+##########################
+## GRN_SOLVER.py test   ##
+##########################
+
+def test_grn_solver():
+    from models import readREINfile, getModel, getExperiments
+    from grn_solver import grn_solver
+    from global_paths import path_to_models
+    print("------- START TEST")
+    ## The GRFs are only unique in "full" uniqueness ##
+    getModels = lambda resList, full=False : sorted([str([[str(x[0]), str(x[1])] for x in res if (str(x[0]) == "selected_interactions" or (full and str(x[0])[:4] == "grf_"))]) for res in resList])
+    solve = lambda instance, uniqueness, **kwargs : grn_solver(*(instance[:8] + [2000] + instance[9:11] + [uniqueness] + instance[12:]), 
+        printSolutions=False, printmain=False, **kwargs)[0]
+    instance = readREINfile(model="toy/model_expanded.net", experiments="toy/observations.spec")
+    models = getModels(solve(instance, "interactions"))
+    print("On toy model: " + str(len(models)) + " models")
+    print("Test portfolio:")
+    print("Same models with 2 solvers in the portfolio?")
+    print(str(getModels(solve(instance, "interactions", portfolio=2)) == models) + " == True")
+    print("Test incremental enumeration:")
+    for [modelFile, experimentsFile] in [["toy/model_expanded.net", "toy/observations.spec"], ["toy/model_expanded_pert.net", "toy/observations_pert.spec"]]:
+        instance = readREINfile(model=modelFile, experiments=experimentsFile)
+        models, checkTimes = getModels(solve(instance, "interactions")), []
+        print(">>> " + modelFile + ": same models (" + str(len(models)) + ") with incremental enumeration?")
+        print(str(getModels(solve(instance, "interactions", incremental=True, checkTimes=checkTimes)) == models) + " == True")
+        ## The last check does not find any model ##
+        print(str(len(checkTimes)) + " == " + str(len(models)+1))
+    ## Instance from the lines of a model file and of an experiments file ##
+    def readLines(model, experiments):
+        [C, CRM, length, Idef, Iopt, R, typeT, solmax, uniqueness, limreg, P] = getModel(model, False)
+        [E, KO, FE, Fixpoint] = getExperiments(experiments, C, length, False)
+        return([C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint])
+    with open(path_to_models + "toy/model_expanded.net", "r") as f:
+        model = f.readlines()
+    with open(path_to_models + "toy/observations.spec", "r") as f:
+        spec = f.readlines()
+    print("Test mergeExperiments:")
+    from grn_inference import mergeSyncExperiments
+    ## Experiment3 has the same initial state (and no perturbation) as Experiment1 ##
+    instance = readLines(model, spec + ["#Experiment3[0] |= $Conditions1 and\n", "#Experiment3[0] |= $Expression1 and\n", 
+        "#Experiment3[10] |= $Expression2 and\n", "fixpoint(#Experiment3[15]);\n"])
+    [C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint] = instance
+    print(str(mergeSyncExperiments(C, E, KO, FE, P, R, typeT, Fixpoint)[4]) + " == [['Experiment1', ['Experiment1', 'Experiment3']]]")
+    models = getModels(solve(instance, "interactions"))
+    print("Same models (" + str(len(models)) + ") with merged experiments?")
+    print(str(getModels(solve(instance, "interactions", mergeExperiments=True)) == models) + " == True")
+    print("Test deepening on toy model with threshold regulation conditions:")
+    thresholds = [l.replace("B[]{}(0..8)", "B[]{}(0..8,19)").replace("A[]{}(0..8)", "A[]{}(0..8,18,19)") for l in model]
+    ## Last observations at step 6, without fix points ##
+    instance = readLines(thresholds, [l.replace("[18]", "[6]") for l in spec if (not l.startswith("fixpoint"))])
+    resList = solve(instance, "interactions", deepening=True)
+    models = getModels(solve(instance, "interactions"))
+    print("Same models (" + str(len(models)) + ") as without deepening?")
+    print(str(getModels(resList) == models) + " == True")
+    ## Trajectories are first unrolled up to step 6 (2 x 7 states) ##
+    nstates = lambda res : len([x for x in res if (str(x[0])[:2] == "q_")])
+    print("Trajectories extended beyond step 6?")
+    print(str(max([nstates(res) for res in resList]) > 2*7) + " == True")
+    print("Test profile:")
+    import json
+    from tempfile import mkdtemp
+    ## Regulatory module A_CRM between S1 and A ##
+    crm = [l.replace("S1[]{}(0); ", "S1[]{}(0); A_CRM[]{A}(0..8); ") for l in model if (not l.startswith("S1\tA\t"))]
+    instance = readLines(crm + ["S1\tA_CRM\tpositive optional; \n", "A_CRM\tA\tpositive optional; \n"], spec)
+    profile, profileFile = dict(), mkdtemp() + "/profile.json"
+    grn_solver(*(instance[:8] + [2] + instance[9:]), printSolutions=False, printmain=False, profile=profile, profileFile=profileFile)
+    phases = ["regulation_condition", "perturbation_condition", "crmInteractions_condition", "regulators_condition", "to_next_state", "fixpoint_condition"]
+    print(str([p for p in phases if (not (p in profile["summary"].keys()))]) + " == []")
+    print(">>> Transitions of each experiment:")
+    print(str([r["experiment"] for r in profile["phases"] if (r["phase"] == "to_next_state")]) + " == ['Experiment1', 'Experiment2']")
+    print(">>> Time, number of assertions and DAG size of each phase:")
+    print(str(all([sorted(r.keys()) == ["assertions", "experiment", "phase", "terms", "time"] for r in profile["phases"]])) + " == True")
+    print(str([[p, profile["summary"][p]["assertions"] > 0, profile["summary"][p]["terms"] > 0] for p in ["regulation_condition", "to_next_state"]]) + " == [['regulation_condition', True, True], ['to_next_state', True, True]]")
+    print(str([[c["solution"], c["result"]] for c in profile["checks"]]) + " == [[1, 'sat'], [2, 'sat']]")
+    print(">>> Profile written in a JSON file:")
+    with open(profileFile, "r") as f:
+        print(str(json.load(f) == profile) + " == True")
+    print("------- END TEST")
+ 
 ##########################
 ## LAUNCH_MODEL.py test ##
 ##########################
  
 def test_launch_model():
     from models import readREINfile
-    from launch_model import model2igraph, launch_model
+    from launch_model import model2igraph, launch_model, iter_solutions, write_trajectories, compile_conditions, condition_hits
     from grn_solver import grn_solver
     from grn_inference import getState
+    from StringIO import StringIO
     print("------- START TEST")
+    print("Test iter_solutions:")
+    solve = lambda onSolution : [onSolution(x) for x in range(3)]
+    print(str(list(iter_solutions(solve, lambda x : 2*x))) + " == [0, 2, 4]")
+    print(">>> Closed after two solutions:")
+    found = []
+    def solve(onSolution):
+        for x in range(100):
+            found.append(x)
+            onSolution(x)
+    solutions = iter_solutions(solve, lambda x : x)
+    print(str([next(solutions), next(solutions)]) + " == [0, 1]")
+    solutions.close()
+    print(str(len(found) < 100) + " == True")
+    print("Test write_trajectories:")
+    f = StringIO()
+    C = ["Gene_" + str(i) for i in range(2)]
+    trajectories = iter([["Trajectory #1", [["q_step0_Experiment", ["0", "1"]], ["q_step1_Experiment", ["1", "1"]]]]])
+    print(str(write_trajectories(trajectories, f, C, conditions=[["Cond", [[None, C[0], 1]]]])) + " == 1")
+    print(f.getvalue().strip())
+    print("== " + '{"conditions": {"Cond": [1]}, "states": ["01", "11"], "trajectory": "Trajectory #1"}')
+    print("Test condition_hits:")
+    trajectories = [["Trajectory #" + str(i+1), [["q", list(x)] for x in t]] for i, t in enumerate([["01", "11", "10"], ["00", "01", "11"]])]
+    compiled = compile_conditions(C, [["A", [[None, C[0], 1]]], ["B", [[None, C[0], 0], [None, C[1], 1]]]])
+    print(str(condition_hits(trajectories, C, compiled).astype(int).tolist()) + " == [[[0, 1, 1], [1, 0, 0]], [[0, 0, 1], [0, 1, 0]]]")
     print("Test model2igraph:")
     print(">>> With non-coloured nodes:")
     C = ["Gene_" + str(i) for i in range(3)]
@@ -527,12 +672,367 @@ def test_launch_model():
 		printStates(states, i, C)
     print("------- END TEST")
  
+##########################
+## GRN_SAT.py test      ##
+##########################
+
+def test_grn_sat():
+    from models import readREINfile
+    from grn_solver import grn_solver
+    from grn_inference import constantNames
+    print("------- START TEST")
+    print("Test grn_solver_sat:")
+    print("On toy model:")
+    [C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint] = readREINfile(model="toy/model_expanded.net", experiments="toy/observations.spec")
+    getModels = lambda resList : sorted([str([[str(x[0]), str(x[1])] for x in res if (str(x[0]) == "selected_interactions" or str(x[0])[:4] == "grf_")]) for res in resList])
+    models = []
+    for backend in ["smt", "sat"]:
+        [resList, _, _] = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 2000, KO, FE, "full", limreg, P, Fixpoint, printSolutions=False, printmain=False, backend=backend)
+        print(">>> Backend " + backend + ": " + str(len(resList)) + " models")
+        models.append(getModels(resList))
+    print("Same models with both backends?")
+    print(str(models[0] == models[1]) + " == True")
+    print("Same trajectories with both backends?")
+    ## The trajectories are determined by the model (fully known initial states) ##
+    getTrajectories = lambda resList : sorted([str([[str(x[0]), str(x[1])] for x in res if (str(x[0]) == "selected_interactions" or str(x[0])[:4] == "grf_" or str(x[0])[:6] == "q_step")]) for res in resList])
+    trajectories, states = [], []
+    for backend in ["smt", "sat"]:
+        [resList, _, _] = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 2000, KO, FE, "full", limreg, P, Fixpoint, printSolutions=False, printmain=False, backend=backend)
+        trajectories.append(getTrajectories(resList))
+        ## Steps of the state variables of Experiment1 in the constraints (the ##
+        ## constraints of the "sat" backend are simplified once it is UNSAT)   ##
+        s = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 1, KO, FE, "full", limreg, P, Fixpoint, printSolutions=False, printmain=False, backend=backend)[1]
+        states.append(sorted(set([int(x[6:].split("_")[0]) for x in constantNames(s.assertions()) if (x[:6] == "q_step" and "_Experiment1" in x)])))
+    print(str(trajectories[0] == trajectories[1]) + " == True")
+    print(">>> One state per step in the models:")
+    print(str(len([x for x in resList[0] if (str(x[0])[:6] == "q_step")])) + " == " + str(len(E)*(length+1)))
+    print(">>> Steps after the fix point (18) are encoded as one state:")
+    print(str([states[0] == range(19), states[1] == range(19)]) + " == [True, True]")
+    print("Options only available for the \"smt\" backend:")
+    try:
+        grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 1, KO, FE, "full", limreg, P, Fixpoint, printSolutions=False, printmain=False, backend="sat", maximize=True, checkTimes=[])
+        print("No error == ValueError")
+    except ValueError as e:
+        print(str(e) + " == Not available for the \"sat\" backend: maximize, checkTimes")
+    print("------- END TEST")
+ 
+##########################
+## SIMULATOR.py test    ##
+##########################
+
+def test_simulator():
+    import numpy as np
+    from shortcuts import prepreCompute, preCompute, diCompute
+    from simulator import buildNetwork, nextStates, simulate, isSteadyState, deterministic
+    print("------- START TEST")
+    print("Test nextStates on random networks (rules #0 to #17):")
+    ngenes = 5
+    C = ["Gene_" + str(i) for i in range(ngenes)]
+    pack = lambda ls : BitVecVal(sum([1 << i for i in set(ls)]), ngenes)
+    agree = True
+    for i in range(18):
+        for k in range(5):
+            I = [[C[randint(0, ngenes-1)], C[g], ["+", "-"][randint(0, 1)]] for g in range(ngenes) for _ in range(randint(0, 3))]
+            network = buildNetwork(C, I, [i]*ngenes)
+            Q = np.array([[randint(0, 1) for c in C] for _ in range(8)], dtype=bool)
+            Q1 = nextStates(network, Q)
+            for n in range(Q.shape[0]):
+                q = pack([c for c in range(ngenes) if (Q[n, c])])
+                for g in range(ngenes):
+                    a = pack([C.index(x[0]) for x in I if (x[1] == C[g] and x[2] == "+")])
+                    r = pack([C.index(x[0]) for x in I if (x[1] == C[g] and x[2] == "-")])
+                    value = is_true(simplify(diCompute.get(i)(*preCompute(q, prepreCompute(a, r)))))
+                    agree = agree and (value == Q1[n, g])
+    print("Same values as the bit-vector templates?")
+    print(str(agree) + " == True")
+    print("Test simulate and isSteadyState:")
+    ## Gene_0 -> Gene_1 -| Gene_2, Gene_0 self-activated ##
+    I = [[C[0], C[0], "+"], [C[0], C[1], "+"], [C[1], C[2], "-"]]
+    network = buildNetwork(C[:3], I, [0, 0, 0])
+    Q0 = np.array([[1, 0, 1], [0, 0, 0]], dtype=bool)
+    states = simulate(network, Q0, 2)
+    print([["".join([str(int(x)) for x in q]) for q in states[:, n]] for n in range(2)])
+    print("== [['101', '111', '110'], ['000', '001', '001']]")
+    print(list(isSteadyState(network, states[-1])) + list(isSteadyState(network, Q0)))
+    print("== [True, True, False, False]")
+    ko = np.array([0, 1, 0], dtype=bool)
+    print("".join([str(int(x)) for x in simulate(network, Q0, 2, ko=ko)[-1][0]]) + " == 101")
+    print(str(deterministic([0, 17])) + " == True")
+    print(str(deterministic([0, 18])) + " == False")
+    print("Test buildNetwork with 62 and 63 regulators (slices of 64 and 65 coordinates):")
+    C70 = ["Gene_" + str(i) for i in range(70)]
+    def buildable(nregulators):
+        try:
+            buildNetwork(C70, [[C70[k], C70[0], "+"] for k in range(1, nregulators+1)], [0]*len(C70))
+            return(True)
+        except ValueError:
+            return(False)
+    print(str([buildable(62), buildable(63)]) + " == [True, False]")
+    print("Test simulateBatch on toy model:")
+    from models import readREINfile
+    from grn_solver import grn_solver
+    from launch_model import launch_model
+    from simulator import simulateBatch, allStates
+    from copy import deepcopy
+    [C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint] = readREINfile(model="toy/model_expanded.net", experiments="toy/observations.spec")
+    [resList, _, _] = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 1, KO, FE, uniqueness, limreg, P, Fixpoint, printSolutions=False, printmain=False)
+    Q0 = allStates(len(C))
+    trajectories = simulateBatch(0, C, resList, Idef, Iopt, np.packbits(Q0, axis=1), 4, packed=True)
+    print(str(trajectories.shape) + " == (32, 5, 1)")
+    trajectories = np.unpackbits(trajectories, axis=2)[:, :, :len(C)]
+    agree = True
+    for n in range(0, 32, 7):
+        q0 = "".join([str(int(x)) for x in Q0[n]])
+        states = launch_model(0, C, CRM, resList, deepcopy(Idef), deepcopy(Iopt), R, q0, 4, typeT, [], [], P, simulator=False)
+        agree = agree and all(["".join(s[1]) == "".join([str(x) for x in trajectories[n, i]]) for i, s in enumerate(states[0][1])])
+    print("Same trajectories as launch_model (solver)?")
+    print(str(agree) + " == True")
+    print("Test simulateEnsemble and predictEnsemble on toy model:")
+    from simulator import simulateEnsemble, predictEnsemble
+    [resList, _, _] = grn_solver(C, CRM, length, Idef, Iopt, R, E, typeT, 5, KO, FE, uniqueness, limreg, P, Fixpoint, printSolutions=False, printmain=False)
+    trajectories = simulateEnsemble(C, resList, Idef, Iopt, Q0, 4, KO=[C[0]])
+    print(str(trajectories.shape) + " == (" + str(len(resList)) + ", 32, 5, 5)")
+    agree = all([(trajectories[k] == simulateBatch(k, C, resList, Idef, Iopt, Q0, 4, KO=[C[0]])).all() for k in range(len(resList))])
+    print("Same trajectories as simulateBatch for each model?")
+    print(str(agree) + " == True")
+    [on, off] = predictEnsemble(C, resList, Idef, Iopt, [[None, C[1], 1]], 4, KO=[C[0]])
+    print(str(on.shape) + " == (5, 5)")
+    print(str(list(on[0]) + list(off[0])) + " == [0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]")
+    print(str(list(on[4] + off[4] <= 1)) + " == [True, True, True, True, True]")
+    print("------- END TEST")
+ 
+##########################
+## ATTRACTORS.py test   ##
+##########################
+
+def test_attractors():
+    from attractors import attractors
+    print("------- START TEST")
+    print("Test attractors:")
+    C = ["Gene_" + str(i) for i in range(3)]
+    ## Gene_0 -> Gene_1 -| Gene_2, Gene_0 self-activated ##
+    I = [[C[0], C[0], "+"], [C[0], C[1], "+"], [C[1], C[2], "-"]]
+    resList = [[["Is", ""]] + [["grf_" + c, 0] for c in C]]
+    for typeT in ["synchronous", "asynchronous"]:
+        print(">>> " + typeT + " transitions:")
+        print(str(attractors(0, C, resList, I, [], typeT)) + " == [[['001'], 4], [['110'], 4]]")
+    print(">>> With Gene_0 knocked down:")
+    print(str(attractors(0, C, resList, I, [], KO=[C[0]])) + " == [[['001'], 8]]")
+    print(">>> Fixed points with the solver:")
+    print(str(attractors(0, C, resList, I, [], method="sat")) + " == [[['001'], None], [['110'], None]]")
+    print(">>> With Gene_0 both knocked down and forced expressed (forced expression prevails):")
+    print(str([attractors(0, C, resList, I, [], KO=[C[0]], FE=[C[0]], method=m) for m in ["exhaustive", "sat"]]) + " == [[[['110'], 8]], [[['110'], None]]]")
+    ## Negative loop Gene_0 -> Gene_1 -| Gene_0 ##
+    I = [[C[0], C[1], "+"], [C[1], C[0], "-"]]
+    resList = [[["Is", ""]] + [["grf_" + c, 0] for c in C[:2]]]
+    print(">>> Cyclic attractor (synchronous):")
+    print(str(attractors(0, C[:2], resList, I, [])) + " == [[['00', '10', '11', '01'], 4]]")
+    print(">>> Cyclic attractor (asynchronous):")
+    print(str(attractors(0, C[:2], resList, I, [], "asynchronous")) + " == [[['00', '01', '10', '11'], 4]]")
+    print(str(attractors(0, C[:2], resList, I, [], method="sat")) + " == []")
+    print("------- END TEST")
+
+##########################
+## MODELS.py test       ##
+##########################
+
+def test_models():
+    from models import readStatements, getModel, readConditions, getExperiments
+    print("------- START TEST")
+    print("Test readStatements:")
+    print(str(list(readStatements(["// comment; \r\n", "$A := {\n", " G1 = 1 and\n", " G2 = 0\n", "};#E[0] |= $A;"]))) + " == ['$A := {\\n G1 = 1 and\\n G2 = 0\\n}', '#E[0] |= $A']")
+    print("Test getModel:")
+    model = ["directive updates async;\n", "directive length 5;\n", "G1[-]{}(0..2, 4); G2[](1);\n", "G1\tG2\tpositive\toptional;\n", "G2\tG1\tnegative;\n"]
+    [C, CRM, length, Idef, Iopt, R, typeT, solmax, uniqueness, limreg, P] = getModel(model, False)
+    print(str([C, CRM, length, Idef, Iopt, R, typeT, P]) + " == [['G1', 'G2'], ['', ''], 5, [['G2', 'G1', '-']], [['G1', 'G2', '+']], [[0, 1, 2, 4], [1]], 'asynchronous', [['-'], []]]")
+    print("Test readConditions:")
+    ## Observations and fix points can be joined by "and" in a single statement ##
+    spec = ["$Conditions1 := {S = 1};\n", "$KnockDown1 := {KO(G1) = 1};\n", "$Expression1 := {G1 = 0 and G2 = 1};\n",
+        "#Exp1[0] |= $Conditions1 \"initial conditions\" and\n", "#Exp1[0] |= $KnockDown1 and\n", "#Exp1[2] |= $Expression1 and\n", "fixpoint(#Exp1[2]);\n"]
+    print(str(readConditions(spec)[:2]) + " == [[[2, 'Exp1']], [[0, 'Exp1', 'Conditions1'], [0, 'Exp1', 'KnockDown1'], [2, 'Exp1', 'Expression1']]]")
+    print("Test getExperiments:")
+    print(str(getExperiments(spec, C, length, False)) + " == [[['Exp1', [[2, 'G1', 0], [2, 'G2', 1], [2, 'S', 1]]]], [['Exp1', [[0, 'KO(G1)', 1]]]], [], [[2, 'Exp1']]]")
+    print("------- END TEST")
+
+##########################
+## PROBLEM.py test      ##
+##########################
+
+def test_problem():
+    from problem import Problem, nameIndex
+    from models import readREINfile
+    print("------- START TEST")
+    print("Test nameIndex:")
+    print(str(sorted(nameIndex(["a", "b", "a"]).items())) + " == [('a', 0), ('b', 1)]")
+    print("Test Problem:")
+    instance = readREINfile(model="toy/model_expanded.net", experiments="toy/observations.spec")
+    [C, E, Fixpoint] = [instance[0], instance[6], instance[14]]
+    problem = Problem(C, E, Fixpoint)
+    print(str([problem.genes["A"], problem.experiments["Experiment2"]]) + " == [" + str(C.index("A")) + ", 1]")
+    print(">>> Observations of Experiment2:")
+    print(str([[C[g], n, v] for [_, n, g, v] in problem.experimentObservations(1).tolist()] == [[x[1], x[0], x[2]] for x in E[1][1]]) + " == True")
+    print(str(problem.fixpoints) + " == {'Experiment1': 18, 'Experiment2': 18}")
+    print("------- END TEST")
+
+##########################
+## CACHE.py test        ##
+##########################
+
+def test_cache():
+    import os, cache
+    from shutil import rmtree
+    from tempfile import mkdtemp
+    from cache import readInstance, instanceKey
+    from models import readREINfile
+    print("------- START TEST")
+    ## The cache of the test is written in a temporary folder ##
+    path_to_cache = cache.path_to_cache
+    cache.path_to_cache = mkdtemp() + "/"
+    [model, experiments] = ["toy/model_expanded.net", "toy/observations.spec"]
+    print("Test instanceKey:")
+    print(str(instanceKey(model, experiments) != instanceKey(model, "toy/observations_pert.spec")) + " == True")
+    print("Test readInstance:")
+    res = readInstance(model, experiments, cache=False)
+    print(str(res[0] == readREINfile(model, experiments)) + " == True")
+    print(">>> Written in and read from the cache:")
+    try:
+        print(str([readInstance(model, experiments) == res, os.path.exists(cache.path_to_cache + instanceKey(model, experiments) + ".pkl"),
+            readInstance(model, experiments) == res]) + " == [True, True, True]")
+    finally:
+        rmtree(cache.path_to_cache)
+        cache.path_to_cache = path_to_cache
+    print("------- END TEST")
+
+##########################
+## REACHABILITY.py test ##
+##########################
+
+def test_reachability():
+    from reachability import reachable, conditionMask
+    print("------- START TEST")
+    C = ["Gene_" + str(i) for i in range(3)]
+    print("Test conditionMask:")
+    print(str(conditionMask(C, [[None, C[0], 1], [None, C[2], 0]])) + " == [5, 4]")
+    print(str(conditionMask(C, "011")) + " == [7, 3]")
+    print("Test reachable:")
+    ## Gene_0 -> Gene_1 -| Gene_2, Gene_0 self-activated ##
+    I = [[C[0], C[0], "+"], [C[0], C[1], "+"], [C[1], C[2], "-"]]
+    resList = [[["Is", ""]] + [["grf_" + c, 0] for c in C]]
+    for typeT in ["synchronous", "asynchronous"]:
+        print(">>> " + typeT + " transitions:")
+        print(str(reachable(0, C, resList, I, [], "101", [[None, C[2], 0]], 5, typeT)) + " == ['101', '111', '110']")
+    print(">>> Not reachable in 1 step:")
+    print(str(reachable(0, C, resList, I, [], "101", [[None, C[2], 0]], 1)) + " == None")
+    print(">>> From a partial initial state:")
+    print(str(reachable(0, C, resList, I, [], [[None, C[0], 0]], [[None, C[0], 1]], 5)) + " == None")
+    print(str(reachable(0, C, resList, I, [], [[None, C[0], 0]], [[None, C[2], 1]], 5)) + " == ['001']")
+    print(">>> With Gene_1 knocked down:")
+    print(str(reachable(0, C, resList, I, [], "111", [[None, C[1], 0]], 5, KO=[C[1]])) + " == ['111', '101']")
+    print("------- END TEST")
+
+def test_verify():
+    from verify import verify
+    print("------- START TEST")
+    C = ["Gene_" + str(i) for i in range(3)]
+    ## Gene_0 -> Gene_1 -| Gene_2, Gene_0 self-activated ##
+    I = [[C[0], C[0], "+"], [C[0], C[1], "+"], [C[1], C[2], "-"]]
+    resList = [[["Is", ""]] + [["grf_" + c, 0] for c in C]]
+    E = [["Exp1", [[0, C[0], 1], [0, C[2], 1], [2, C[2], 0]]], ["Exp2", [[0, C[0], 1], [0, C[1], 0], [0, C[2], 0], [1, C[1], 1], [1, C[2], 1]]],
+        ["Exp3", [[0, C[0], 1], [0, C[1], 1], [2, C[2], 1]]]]
+    KO = [["Exp3", [[0, "KO(" + C[1] + ")", 1]]]]
+    P = [[], ["-"], []]
+    Fixpoint = [[2, "Exp1"]]
+    for typeT in ["synchronous", "asynchronous"]:
+        print(">>> " + typeT + " transitions:")
+        report = verify(0, C, resList, I, [], E, typeT, KO, [], P, Fixpoint)
+        print(str([[r[0], r[1], r[3]] for r in report]) + " == [['Exp1', True, True], ['Exp2', " + str(typeT == "synchronous") + ", None], ['Exp3', True, None]]")
+        ## Gene_1 and Gene_2 cannot be both updated at step 1 with asynchronous ##
+        ## transitions (the initial state is pruned, so step 1 is not checked)  ##
+        print(str([c[3] for c in report[1][2]]) + " == [True, True, True, " + ", ".join([str(ifthenelse(typeT == "synchronous", True, None))]*2) + "]")
+    print(">>> Without the knock-down of Gene_1:")
+    report = verify(0, C, resList, I, [], E[2:], "synchronous", [], [], P, [])
+    print(str(report[0][:2]) + " == ['Exp3', False]")
+    print("------- END TEST")
+
+def test_query():
+    from models import readREINfile
+    from query import predictionQuery, counterexampleTrajectory
+    print("------- START TEST")
+    [C, CRM, length, Idef, Iopt, R, E, typeT, solmax, KO, FE, uniqueness, limreg, P, Fixpoint] = readREINfile(model="toy/model_expanded.net", experiments="toy/observations.spec")
+    query = lambda q0, prediction, fixpoint=None : predictionQuery(C, CRM, length, Idef, Iopt, R, E, typeT, KO, FE, uniqueness, limreg, P, Fixpoint, q0, prediction, fixpoint=fixpoint)
+    print("Test predictionQuery on toy model:")
+    print(">>> Prediction on the initial state:")
+    print(str(query("10101", [[0, C[0], 1], [0, C[1], 0]])) + " == [True, None]")
+    ## Same initial conditions and fix point as Experiment1 ##
+    q0 = [[None, "S1", 0], [None, "S2", 1], [None, "A", 1], [None, "B", 1], [None, "C", 1]]
+    print(">>> Prediction which holds in all models:")
+    print(str(query(q0, [[18, "A", 0], [18, "B", 1], [18, "C", 1]], fixpoint=18)[0]) + " == True")
+    print(">>> Prediction which does not hold in all models:")
+    [holds, counterexample] = query(q0, [[3, "A", 1], [3, "B", 1], [3, "C", 1]], fixpoint=18)
+    print(str(holds) + " == False")
+    trajectory = counterexampleTrajectory(counterexample, length)
+    print(str(len(trajectory)) + " == 21")
+    print(str([[trajectory[0][1][C.index(g)] for g in ["S1", "S2", "A", "B", "C"]], 
+        "".join([trajectory[3][1][C.index(g)] for g in ["A", "B", "C"]]) != "111"]) + " == [['0', '1', '1', '1', '1'], True]")
+    print(">>> Prediction with a fix point which cannot be reached from the initial state:")
+    ## No trajectory from C=0, B=0, A=0, S2=1, S1=0 is in a fix point at step 1 ##
+    print(str(query("00010", [[length, "C", 1]], fixpoint=1)) + " == [None, None]")
+    print("------- END TEST")
+
+def test_screen():
+    from screen import screenPerturbations, screen
+    print("------- START TEST")
+    C = ["Gene_" + str(i) for i in range(3)]
+    P = [["+"], ["-", "+"], []]
+    print("Test screenPerturbations:")
+    print(str(screenPerturbations(C, P, double=False)) + " == [[[], []], [['Gene_1'], []], [[], ['Gene_0']], [[], ['Gene_1']]]")
+    print(str(len(screenPerturbations(C, P))) + " == 6")
+    print("Test screen:")
+    ## Gene_0 -> Gene_1 -| Gene_2, Gene_0 self-activated ##
+    I = [[C[0], C[0], "+"], [C[0], C[1], "+"], [C[1], C[2], "-"]]
+    resList = [[["Is", ""]] + [["grf_" + c, 0] for c in C]]
+    table = screen(0, C, resList, I, [], P, nproc=2)
+    print(str(table[:3]) + " == [[[], [], ['001', '110']], [['Gene_1'], [], ['001', '101']], [[], ['Gene_0'], ['110']]]")
+    print(str(screen(0, C, resList, I, [], P, nproc=1) == table) + " == True")
+    print(">>> From initial state 011:")
+    print(str(screen(0, C, resList, I, [], P, q0="011", nproc=1, double=False)) + " == [[[], [], ['001']], [['Gene_1'], [], ['001']], [[], ['Gene_0'], ['110']], [[], ['Gene_1'], ['010']]]")
+    print("------- END TEST")
+
+##########################
+## BENCH.py test        ##
+##########################
+
+def test_bench():
+    from bench import run_benchmarks, compare_baseline
+    print("------- START TEST")
+    print("Test compare_baseline:")
+    record = lambda name, nmodels, total_time, peak_rss : {"name": name, "solmax": 10, "nmodels": nmodels, "error": None, 
+        "encode_time": 0.1, "first_model_time": 0.2, "total_time": total_time, "peak_rss": peak_rss}
+    baseline = [record("toy", 8, 10., 20000), record("toy_pert", 16, 1., 20000)]
+    print(str(compare_baseline(baseline, baseline)) + " == []")
+    print(">>> At the tolerance threshold (+20%):")
+    print(str(compare_baseline([record("toy", 8, 12., 20000)], baseline)) + " == []")
+    print(str(compare_baseline([record("toy", 8, 12.5, 20000)], baseline)) + " == ['toy: total_time = 12.50 (baseline: 10.00, +25%)']")
+    print(str(compare_baseline([record("toy", 8, 12.5, 20000)], baseline, tolerance=0.3)) + " == []")
+    print(">>> At the minimal difference (0.5 sec, 10240 kB):")
+    print(str(compare_baseline([record("toy_pert", 16, 1.5, 30240)], baseline)) + " == []")
+    print(str(compare_baseline([record("toy_pert", 16, 1.6, 30241)], baseline)) + " == ['toy_pert: total_time = 1.60 (baseline: 1.00, +60%)', 'toy_pert: peak_rss = 30241 (baseline: 20000, +51%)']")
+    print(">>> Different number of models, benchmark without baseline, failed benchmark:")
+    failed = record("toy", None, None, None)
+    failed["error"] = "ValueError: error"
+    print(str(compare_baseline([record("toy", 7, 10., 20000), record("collombet", 1, 10., 20000), failed], baseline)) + " == ['toy: 7 models instead of 8']")
+    print("Test run_benchmarks on toy model:")
+    records = run_benchmarks(names=["toy"], solmax=2, verbose=False)
+    print(str([[r["name"], r["nmodels"], r["error"], len(r["enumeration_times"])] for r in records]) + " == [['toy', 2, None, 2]]")
+    print(str(compare_baseline(records, records)) + " == []")
+    print("------- END TEST")
+
 ##########################
 ## CALL                 ##
 ##########################
  
-tests = [test_shortcuts, test_utils, test_grn_inference, test_launch_model]
-names = ["shortcuts", "utils", "grn_inference", "launch_model"]
+tests = [test_shortcuts, test_utils, test_grn_inference, test_grn_solver, test_launch_model, test_grn_sat, test_simulator, test_attractors, test_models, test_problem, test_cache, test_reachability, test_verify, test_screen, test_query, test_bench]
+names = ["shortcuts", "utils", "grn_inference", "grn_solver", "launch_model", "grn_sat", "simulator", "attractors", "models", "problem", "cache", "reachability", "verify", "screen", "query", "bench"]
 i = 0
 lenargvC = len(sys.argv) == 2
  
@@ -544,12 +1044,12 @@ def printRunSyntaxError(c):
     return(False)
  
 done = False
-while (i < 4 and lenargvC):
+while (i < len(tests) and lenargvC):
 	if (names[i] == sys.argv[1]):
 		tests[i]()
 		done = True
 		break
 	i += 1
-if (i == 4 and lenargvC and not done):
+if (i == len(tests) and lenargvC and not done):
 	print("MSG: If you wanted to run a test on a file, maybe you mistyped the filename.")
 	print("MSG: You may want to test one of these: " + str(names))
@@ -33,6 +33,28 @@ def verboseIt(msg, verbose):
 		print("MSG: " + msg)
 	return(None)
 
+#______________#
+# Command line #
+#______________#
+
+def getArgument(x, argv, default):
+	xx = "--" + x
+	if (any([arg == xx for arg in argv])):
+		i = argv.index(xx)
+		if (len(argv) < i+2):
+			return(default)
+		return(argv[i+1])
+	return(default)
+
+def getTrailingArguments(x, argv, default):
+	xx = "--" + x
+	if (any([arg == xx for arg in argv])):
+		i = argv.index(xx)
+		if (len(argv) < i+2):
+			return(default)
+		return(argv[i+1:])
+	return(default)
+
 def f(x):
 	try:
 		return(simplify(x))
@@ -137,6 +159,19 @@ def extract1BV(b, i):
 		return(None)
 	return(Extract(i, i, b))
 
+#' Construct Bit-Vector with only the
+#' coordinates in list sl: b[sl[k]] at coordinate k
+#'
+#' @param b Z3 Bit-Vector
+#' @param sl list of indices of the coordinates to keep
+#'          (integer list, None for a coordinate set to 0)
+#' @return res Z3 Bit-Vector of size len(sl)
+def sliceBV(b, sl):
+	bits = [buildZERO(1) if (i == None) else extract1BV(b, i) for i in sl]
+	if (len(bits) == 1):
+		return(bits[0])
+	return(Concat(list(reversed(bits))))
+
 #' Construct constant vector using the list 
 #' of non-negative bit indices
 #'
@@ -262,14 +297,24 @@ def sub(q):
 ## Not Full: get integer corresponding  ##
 ## to input Bit-Vector r                ##
 def getBinaryDec(r, size=None):
-	n = r.size()
-	i = int(str(simplify(BV2Int(r))))
+	## Values (e.g. read from a model) are not simplified ##
+	i = r.as_long() if (is_bv_value(r)) else int(str(simplify(BV2Int(r))))
         if (size):
 		options = '0' + str(int(size)) + 'b'
 		return(format(i, options))
 	else:
 		return(i)
 
+## Indices of the 1-bits of a nonnegative integer x  ##
+## (from the least significant bit)                  ##
+def bitIndices(x):
+	res = []
+	while (x):
+		low = x & -x
+		res.append(low.bit_length()-1)
+		x ^= low
+	return(res)
+
 def filterNone(ls):
 	return(filter(lambda x : x != None, ls))
 
@@ -0,0 +1,326 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+from itertools import product
+from simulator import modelNetwork, geneMask, preComputeNP
+from shortcuts import diCompute
+from reachability import conditionMask, successors, maxStates, maxGenes
+from grn_inference import stateStep
+from utils import getIt, ifthenelse
+
+##############################################
+## VERIFICATION OF A SOLVED MODEL           ##
+##############################################
+
+## A model agrees with an experiment iff there is a trajectory  ##
+## of the model (with a possible value of the unknown           ##
+## perturbations) which satisfies all the observations, the     ##
+## states after the fix point step (if any) being the fix point ##
+## (see grn_solver). With synchronous transitions, the sets of  ##
+## states of such trajectories are computed step by step from   ##
+## the states which satisfy the observations at step 0 (see     ##
+## propagateStates). With asynchronous transitions, these sets  ##
+## quickly grow: such a trajectory is searched for depth-first  ##
+## instead (see searchTrajectory). Without threshold regulation ##
+## conditions, a trajectory can always be extended up to the    ##
+## maximal length of experiments                                ##
+
+## Largest number of combinations of unknown perturbations ##
+maxCombinations = 2**10
+## Largest number of regulators of a gene which regulation ##
+## condition is tabulated (see stateFunction)              ##
+maxRegulators = 20
+
+#' Perturbations of an experiment
+#'
+#' @param C the list of nodes
+#' @param SETP list of (associated experiment, known perturbations) pairs
+#' @param typeP type of perturbation (KO or FE)
+#' @param sign "-" for KO, "+" for FE
+#' @param P list of possible perturbations for every gene
+#' @param name experiment name
+#' @return res list [values, unknown] of the dictionary of known values of
+#'             perturbable genes, and of the list of perturbable genes
+#'             which value is unknown
+def experimentPerturbations(C, SETP, typeP, sign, P, name):
+	## Without perturbations of this type, no gene is perturbed (see grn_solver) ##
+	if (not SETP):
+		return([dict(), []])
+	genes = [C[i] for i in range(len(C)) if (sign in P[i])]
+	values = dict()
+	for [e, p] in SETP:
+		if (e == name):
+			values.update(dict([[getIt(pp[1], typeP + "(", ")"), int(pp[2])] for pp in p]))
+	return([values, [g for g in genes if (not (g in values.keys()))]])
+
+#' Next states of a set of states: the asynchronous transition
+#' relation only loops on fix points (see transition_condition_async)
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param S array of packed states
+#' @param ngenes number of genes
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param ko Boolean array of knocked-down genes
+#' @param fe Boolean array of forced expressed genes
+#' @return S1 sorted array of the packed successors of the states
+def nextSet(network, S, ngenes, typeT, ko, fe):
+	succ = successors(network, S, ngenes, "synchronous", ko, fe)[0]
+	if (typeT == "asynchronous"):
+		succ = np.concatenate((successors(network, S, ngenes, typeT, ko, fe)[0], S[succ == S]))
+	return(np.unique(succ))
+
+#' Conditions of the observations at each step
+#'
+#' @param C the list of nodes
+#' @param observations dictionary step -> list of [step, gene, value]
+#' @return conds dictionary step -> [mask, value] (see conditionMask),
+#'               or None if the observations at this step are inconsistent
+def stepConditions(C, observations):
+	conds = dict()
+	for n in observations.keys():
+		obs = observations[n]
+		consistent = all([not (g == gg and int(v) != int(vv)) for [_, g, v] in obs for [_, gg, vv] in obs])
+		conds[n] = ifthenelse(consistent, conditionMask(C, [[None, g, v] for [_, g, v] in obs]), None)
+	return(conds)
+
+#' Record whether the observations at a step hold (all together) in some state
+#'
+#' @param ok dictionary (step, gene, value) -> ok (see checkExperiment)
+#' @param C the list of nodes
+#' @param obs list of [step, gene, value] of the observations at this step
+#' @param S array of packed states
+#' @return hold Boolean array, True for the states which satisfy all observations
+def checkObservations(ok, C, obs, S):
+	hold = np.ones(len(S), dtype=bool)
+	for [m, gene, v] in obs:
+		[mask, value] = conditionMask(C, [[None, gene, v]])
+		hold &= (S & mask) == value
+	for [m, gene, v] in obs:
+		ok[(m, gene, v)] = bool(ok.get((m, gene, v)) or hold.any())
+	return(hold)
+
+#' Synchronous transition function on packed states: the regulation
+#' condition of each gene is tabulated on the values of its slice
+#' (see buildNetwork), so that single states are updated without numpy
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param ngenes number of genes
+#' @param ko Boolean array of knocked-down genes
+#' @param fe Boolean array of forced expressed genes
+#' @return f function which maps a packed state to its packed successor
+def stateFunction(network, ngenes, ko, fe):
+	tables = []
+	for g in range(ngenes):
+		[coordinates, one, prepreComputation, grf] = network[g]
+		if (len(coordinates) > maxRegulators):
+			raise ValueError("Too many regulators of a gene for asynchronous verification (at most " + str(maxRegulators) + ")")
+		q = np.arange(2**len(coordinates), dtype=np.uint64)
+		table = diCompute.get(grf)(*preComputeNP(q, prepreComputation, one))
+		table = np.where(fe[g], True, np.where(ko[g], False, table))
+		shifts = [[ngenes-1-coordinates[i], i] for i in range(len(coordinates))]
+		tables.append([1 << (ngenes-1-g), shifts, table.tolist()])
+	def f(x):
+		y = 0
+		for [bit, shifts, table] in tables:
+			k = 0
+			for [s, i] in shifts:
+				k |= ((x >> s) & 1) << i
+			if (table[k]):
+				y |= bit
+		return(y)
+	return(f)
+
+#' Check the observations of an experiment by propagating the set of states
+#' of the trajectories which satisfy the previous observations (a state has
+#' exactly one synchronous successor, so that this set does not grow)
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param C the list of nodes
+#' @param S array of packed initial states (which satisfy the observations at step 0)
+#' @param observations dictionary step -> list of [step, gene, value]
+#' @param sstep fix point step (None if there is no fix point)
+#' @param last last step to check
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param ko Boolean array of knocked-down genes
+#' @param fe Boolean array of forced expressed genes
+#' @param ok dictionary (step, gene, value) -> ok (see checkExperiment)
+#' @return res list [passed, fixpoint] (see checkExperiment)
+def propagateStates(network, C, S, observations, sstep, last, typeT, ko, fe, ok):
+	ngenes = len(C)
+	fixpoint = None
+	for n in range(last+1):
+		if (n > 0 and len(S)):
+			S = nextSet(network, S, ngenes, typeT, ko, fe)
+			S = S[checkObservations(ok, C, observations.get(n, []), S)]
+			if (len(S) > maxStates):
+				raise ValueError("Too many states at step " + str(n) + " (at most " + str(maxStates) + ")")
+		if (n == sstep and len(S)):
+			S = S[successors(network, S, ngenes, "synchronous", ko, fe)[0] == S]
+			fixpoint = bool(len(S))
+	return([bool(len(S)), fixpoint])
+
+#' Check the observations of an experiment by depth-first search of a trajectory
+#' which satisfies them: an asynchronous transition changes at most one gene, so
+#' that the states which differ from the observations at a later step on more genes
+#' than the number of remaining steps are pruned, and the states which have already
+#' been visited at a given step are not expanded again
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param C the list of nodes
+#' @param S array of packed initial states (which satisfy the observations at step 0)
+#' @param observations dictionary step -> list of [step, gene, value]
+#' @param sstep fix point step (None if there is no fix point)
+#' @param last last step to check
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param ko Boolean array of knocked-down genes
+#' @param fe Boolean array of forced expressed genes
+#' @param ok dictionary (step, gene, value) -> ok (see checkExperiment)
+#' @return res list [passed, fixpoint] (see checkExperiment)
+def searchTrajectory(network, C, S, observations, sstep, last, typeT, ko, fe, ok):
+	ngenes = len(C)
+	f = stateFunction(network, ngenes, ko, fe)
+	conds = stepConditions(C, observations)
+	steps = sorted(conds.keys())
+	fixpoint = [None]
+	## Number of genes on which state x differs from the observations at step m ##
+	distance = lambda x, m : bin((x ^ conds[m][1]) & conds[m][0]).count("1")
+	def admissible(n, x):
+		for m in steps:
+			if (m >= n and (conds[m] == None or distance(x, m) > m-n)):
+				return(False)
+		if (n == sstep):
+			steady = f(x) == x
+			fixpoint[0] = bool(fixpoint[0] or steady)
+			return(steady)
+		return(True)
+	## Candidate states at step n, closest to the next observations first ##
+	def candidates(n, S):
+		S = [x for x in S if (admissible(n, x))]
+		nextObs = filter(lambda m : m >= n and conds[m] != None, steps)
+		if (nextObs):
+			S = sorted(S, key=lambda x : distance(x, nextObs[0]))
+		return(iter(S))
+	visited = set()
+	stack = [[0, candidates(0, S.tolist())]]
+	while (stack):
+		[n, it] = stack[-1]
+		x = next(it, None)
+		if (x == None):
+			stack.pop()
+			continue
+		if ((n, x) in visited):
+			continue
+		visited.add((n, x))
+		if (len(visited) > maxStates):
+			raise ValueError("No trajectory found after visiting " + str(len(visited)) + " states")
+		if (n == last):
+			return([True, fixpoint[0]])
+		## Asynchronous successors (or the state itself if it is a fix point) ##
+		changed = f(x) ^ x
+		succ = np.array([x ^ (1 << b) for b in range(ngenes) if ((changed >> b) & 1)] if (changed) else [x], dtype=np.int64)
+		succ = succ[checkObservations(ok, C, observations.get(n+1, []), succ)]
+		stack.append([n+1, candidates(n+1, succ.tolist())])
+	return([False, fixpoint[0]])
+
+#' Check the observations of an experiment for given perturbations
+#'
+#' @param network network of the model (see buildNetwork)
+#' @param C the list of nodes
+#' @param exp experiment [name, list of (step x gene x value)]
+#' @param sstep fix point step (None if there is no fix point)
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param ko Boolean array of knocked-down genes
+#' @param fe Boolean array of forced expressed genes
+#' @return res list [passed, checks, fixpoint] where passed is True iff
+#'             there is a trajectory which satisfies all observations, checks
+#'             is the list of [step, gene, value, ok] for each observation, ok
+#'             being True iff the observations at its step all hold in a (visited)
+#'             trajectory satisfying the observations at the previous steps (None
+#'             if there is no such trajectory), and fixpoint is None if no such trajectory
+#'             reaches the fix point step, else True iff one of them reaches a
+#'             fix point at this step
+def checkExperiment(network, C, exp, sstep, typeT, ko, fe):
+	ngenes = len(C)
+	## Observations at each step (after the fix point, the state is the fix point) ##
+	observations = dict()
+	for [n, gene, value] in exp[1]:
+		observations.setdefault(stateStep(n, sstep), []).append([n, gene, value])
+	last = max(observations.keys() + [ifthenelse(sstep == None, 0, sstep)])
+	ok = dict()
+	## States which satisfy the observations at step 0 ##
+	obs0 = observations.get(0, [])
+	[mask, value] = conditionMask(C, [[None, g, v] for [_, g, v] in obs0])
+	if (2**(ngenes-bin(mask).count("1")) > maxStates):
+		raise ValueError("Too many initial states in experiment " + exp[0] + " (at most " + str(maxStates) + ")")
+	S = np.array([value], dtype=np.int64)
+	for b in range(ngenes):
+		if (not ((mask >> b) & 1)):
+			S = np.concatenate((S, S | np.int64(1 << b)))
+	S = S[checkObservations(ok, C, obs0, S)]
+	check = ifthenelse(typeT == "synchronous", propagateStates, searchTrajectory)
+	[passed, fixpoint] = check(network, C, S, observations, sstep, last, typeT, ko, fe, ok)
+	checks = [[n, gene, v, ok.get((n, gene, v))] for [n, gene, v] in exp[1]]
+	return([passed, checks, fixpoint])
+
+#' Check a model found by the solver against experiments, without the solver
+#'
+#' @param modelID integer identifier of model in resList
+#' @param C the list of nodes
+#' @param resList result from the solver containing
+#'                the values for each variable
+#' @param Idef the list of definite interactions
+#' @param Iopt the list of optional interactions
+#' @param E set of experiments (see grn_solver)
+#' @param typeT type of transition: either "synchronous" or "asynchronous"
+#' @param KO knock-down perturbations (see grn_solver)
+#' @param FE forced expression perturbations (see grn_solver)
+#' @param P list of possible perturbations for every gene
+#' @param Fixpoint fixpoint constraints (see grn_solver)
+#' @return report list of [experiment name, passed, checks, fixpoint] for each
+#'                experiment (see checkExperiment): for the first combination of the
+#'                unknown perturbations which agrees with the experiment or, if none
+#'                does, which agrees with the largest number of observations
+def verify(modelID, C, resList, Idef, Iopt, E, typeT, KO, FE, P, Fixpoint):
+	if (len(C) > maxGenes):
+		raise ValueError("Too many genes for packed states (at most " + str(maxGenes) + ")")
+	network = modelNetwork(modelID, C, resList, Idef, Iopt)
+	report = []
+	for exp in E:
+		existsFixpoint = filter(lambda x : x[1] == exp[0], Fixpoint)
+		sstep = existsFixpoint[0][0] if (existsFixpoint) else None
+		[valuesKO, unknownKO] = experimentPerturbations(C, KO, "KO", "-", P, exp[0])
+		[valuesFE, unknownFE] = experimentPerturbations(C, FE, "FE", "+", P, exp[0])
+		unknown = [[valuesKO, g] for g in unknownKO] + [[valuesFE, g] for g in unknownFE]
+		if (2**len(unknown) > maxCombinations):
+			raise ValueError("Too many unknown perturbations in experiment " + exp[0])
+		best = None
+		for combination in product([0, 1], repeat=len(unknown)):
+			for [[values, g], x] in zip(unknown, combination):
+				values[g] = x
+			ko = geneMask(C, [g for g in valuesKO.keys() if (valuesKO[g])])
+			fe = geneMask(C, [g for g in valuesFE.keys() if (valuesFE[g])])
+			res = checkExperiment(network, C, exp, sstep, typeT, ko, fe)
+			score = len([c for c in res[1] if (c[3])])
+			if (best == None or res[0] or score > best[0]):
+				best = [score, res]
+			if (res[0]):
+				break
+		report.append([exp[0]] + best[1])
+	return(report)
+
+#' Print a verification report
+#'
+#' @param report verification report (see verify)
+#' @param verbose boolean for printing the observations of passed experiments
+#' @return passed boolean, True iff all experiments passed
+def printReport(report, verbose=False):
+	msg = lambda ok : ifthenelse(ok == None, "not checked", ifthenelse(ok, "ok", "FAILED"))
+	for [name, passed, checks, fixpoint] in report:
+		print("Experiment \'" + name + "\': " + ifthenelse(passed, "PASSED", "FAILED"))
+		if (passed and not verbose):
+			continue
+		for [n, gene, value, ok] in checks:
+			print("  step " + str(n) + ": " + gene + " = " + str(value) + " ... " + msg(ok))
+		if (fixpoint != None):
+			print("  fix point ... " + msg(fixpoint))
+	return(all([r[1] for r in report]))